@@ -0,0 +1,212 @@
+# animate.py
+import argparse
+import shutil
+import subprocess
+from pathlib import Path
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+from draw_robot import draw_robot, draw_scene, robot_geometry
+
+"""
+Export d'animations de trajectoires, image par image, pendant la simulation.
+
+La scène (sphères, axes) est dessinée une seule fois, sur le backend Agg ;
+chaque image restaure ce fond puis ne dessine que les artistes animés
+(blitting) : robots, trace et temps. La trace complète est accumulée dans le
+fond lui-même (un segment ajouté par image), son coût ne croît donc pas avec
+la longueur de la trajectoire.
+
+Les images sont écrites au fil de l'eau, sans être gardées en mémoire :
+- vers une vidéo (.mp4, .avi, .mkv, .webm, .mov) par un processus ffmpeg qui
+  reçoit les pixels bruts sur son entrée standard ;
+- vers une suite d'images PNG (chemin contenant un motif de format, par ex.
+  'frames/frame_%05d.png', ou un dossier).
+L'animateur se branche sur une simulation comme crochet d'Instrumentation
+(animator.hook), ou rejoue des historiques (animate_histories).
+"""
+
+VIDEO_SUFFIXES = ('.mp4', '.avi', '.mkv', '.webm', '.mov')
+
+class TrajectoryAnimator:
+    """Animation d'un ou plusieurs robots dans une scène, écrite en continu
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere)
+        path: Vidéo, motif d'images ('frames/%05d.png') ou dossier
+        n_robots: Nombre de robots animés
+        fps: Images par seconde de la vidéo
+        every: Une image tous les `every` pas de simulation (crochet)
+        dpi: Résolution [points par pouce]
+        figsize: Taille de la figure en pouces
+        bounds: Demi-largeur de la zone affichée [m]
+        trail: Longueur de la trace en images (None : trace complète,
+               accumulée dans le fond)
+        electrodes: Dessine les électrodes des robots
+    """
+    def __init__(self, spheres, path, n_robots=1, fps=25, every=1, dpi=100, figsize=(8, 8),
+                 bounds=2.5, trail=None, electrodes=True):
+        self.path = Path(path)
+        self.n_robots = n_robots
+        self.fps = fps
+        self.every = every
+        self.trail = trail
+        self.frames = 0
+        self._steps = 0
+
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_aspect('equal')
+        self.ax.set_xlim(-bounds, bounds)
+        self.ax.set_ylim(-bounds, bounds)
+        self.ax.grid(True)
+        self.ax.set_xlabel('X (m)')
+        self.ax.set_ylabel('Y (m)')
+        draw_scene(self.ax, spheres)
+
+        # Artistes animés (exclus du dessin du fond)
+        self.robots = [draw_robot(self.ax, np.zeros(3), 0.0) for _ in range(n_robots)]
+        for triangle, robot_electrodes in self.robots:
+            triangle.set_animated(True)
+            for electrode in robot_electrodes:
+                electrode.set_animated(True)
+                electrode.set_visible(electrodes)
+        self.trails = [self.ax.plot([], [], 'b-', linewidth=1, animated=True)[0] for _ in range(n_robots)]
+        self.time_text = self.ax.text(0.02, 0.97, '', transform=self.ax.transAxes, va='top', animated=True)
+
+        self.fig.tight_layout()
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.width, self.height = (int(v) for v in self.canvas.get_width_height())
+        self.last = None
+        self.history = [[] for _ in range(n_robots)]
+        self._pose = np.zeros((3, n_robots))
+        self._open()
+
+    def _open(self):
+        self._ffmpeg = None
+        if self.path.suffix.lower() in VIDEO_SUFFIXES:
+            ffmpeg = shutil.which('ffmpeg')
+            if ffmpeg is None:
+                raise RuntimeError("ffmpeg est nécessaire pour l'export vidéo "
+                                   "(ou utiliser une suite d'images, par ex. 'frames/%05d.png')")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._ffmpeg = subprocess.Popen(
+                [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                 '-s', f'{self.width}x{self.height}', '-r', str(self.fps), '-i', '-',
+                 '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', str(self.path)],
+                stdin=subprocess.PIPE)
+        elif '%' in self.path.name:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._pattern = str(self.path)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._pattern = str(self.path / 'frame_%05d.png')
+
+    def add_frame(self, x, y, theta, t=None):
+        """Ajoute une image : poses (M,) des robots (scalaires pour un robot)"""
+        x, y, theta = (np.broadcast_to(np.asarray(v, dtype=float), (self.n_robots,)) for v in (x, y, theta))
+
+        # Trace : segment ajouté au fond, ou dernières positions
+        self.canvas.restore_region(self.background)
+        if self.trail is None:
+            if self.last is not None:
+                for m, line in enumerate(self.trails):
+                    line.set_data([self.last[0][m], x[m]], [self.last[1][m], y[m]])
+                    self.ax.draw_artist(line)
+                self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        else:
+            for m, line in enumerate(self.trails):
+                self.history[m].append((x[m], y[m]))
+                del self.history[m][:-self.trail]
+                line.set_data(*zip(*self.history[m]))
+                self.ax.draw_artist(line)
+        self.last = (x.copy(), y.copy())
+
+        for m, (triangle, robot_electrodes) in enumerate(self.robots):
+            points, electrode_positions = robot_geometry([x[m], y[m]], theta[m])
+            triangle.set_xy(points)
+            self.ax.draw_artist(triangle)
+            for electrode, (ex, ey) in zip(robot_electrodes, electrode_positions):
+                if electrode.get_visible():
+                    electrode.set_data([ex], [ey])
+                    self.ax.draw_artist(electrode)
+        if t is not None:
+            self.time_text.set_text(f't = {t:.1f} s')
+            self.ax.draw_artist(self.time_text)
+        self._write(np.asarray(self.canvas.buffer_rgba()))
+        self.frames += 1
+
+    def _write(self, frame):
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.write(frame.tobytes())
+        else:
+            # Compression PNG rapide : l'encodage domine le coût d'une image
+            Image.fromarray(frame[..., :3]).save(self._pattern % self.frames, compress_level=1)
+
+    def hook(self, state):
+        """Crochet d'Instrumentation : une image tous les `every` pas
+
+        Pour un ensemble, seuls les robots actifs ('robots') sont mis à jour ;
+        les robots arrêtés restent à leur dernière pose.
+        """
+        robots = state.get('robots', slice(None))
+        for row, name in enumerate(('x', 'y', 'theta')):
+            self._pose[row, robots] = state[name]
+        self._steps += 1
+        if (self._steps - 1) % self.every == 0:
+            self.add_frame(*self._pose, t=state['time'])
+
+    def close(self):
+        """Termine l'écriture (attend la fin de l'encodage vidéo)"""
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            self._ffmpeg.wait()
+            self._ffmpeg = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def animate_histories(spheres, histories, path, every=1, **animator_kwargs):
+    """Rejoue des historiques (format de simulate_behavior) en animation
+
+    Les robots arrêtés avant la fin restent à leur dernière pose.
+    """
+    histories = list(histories)
+    n = max(len(h['x']) for h in histories)
+    with TrajectoryAnimator(spheres, path, n_robots=len(histories), **animator_kwargs) as animator:
+        for k in range(0, n, every):
+            index = [min(k, len(h['x']) - 1) for h in histories]
+            animator.add_frame([h['x'][i] for h, i in zip(histories, index)],
+                               [h['y'][i] for h, i in zip(histories, index)],
+                               [h['theta'][i] for h, i in zip(histories, index)],
+                               t=max(h['time'][i] for h, i in zip(histories, index)))
+    return animator.frames
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Animation des trajectoires d'une scène")
+    parser.add_argument('output', help="Vidéo (.mp4, ...) ou motif d'images ('frames/%%05d.png')")
+    parser.add_argument('--seed', type=int, default=0, help="Seed de la scène")
+    parser.add_argument('--behaviors', type=int, nargs='+', default=[1, 2, 3, 4])
+    parser.add_argument('--every', type=int, default=1, help="Une image tous les N pas")
+    parser.add_argument('--fps', type=int, default=25)
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+
+    from command import ElectricBehavior
+    from ensemble import simulate_ensemble
+    from instrumentation import Instrumentation
+    from sweep import generate_scenes
+
+    spheres = generate_scenes([args.seed])[0]
+    behaviors = [ElectricBehavior(behavior_type=bt) for bt in args.behaviors]
+    with TrajectoryAnimator(spheres, args.output, n_robots=len(behaviors), fps=args.fps,
+                            every=args.every, dpi=args.dpi, electrodes=False) as animator:
+        simulate_ensemble(behaviors, [spheres] * len(behaviors),
+                          instrumentation=Instrumentation(hooks=[animator.hook]))
+    print(f"{animator.frames} images écrites dans {args.output}")
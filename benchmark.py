@@ -0,0 +1,281 @@
+# benchmark.py
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+import numpy as np
+from constants import DT
+from electric_sense import (compute_K_sphere, compute_electric_sense,
+                            compute_electric_sense_reference, cutoff_error_bound)
+from command import ElectricBehavior, compute_commands
+from scene import Scene
+
+"""
+Banc d'essai des performances : perception, commande, collisions et
+simulation complète, en fonction du nombre de sphères, du nombre de robots
+simulés ensemble et du nombre de pas.
+
+Chaque mesure est un enregistrement {benchmark, mode, paramètres, temps} ;
+les modes approchés (rayon de coupure, champ lointain, table, carte de
+scène) sont aussi évalués en précision par rapport au calcul exact, sur des
+poses tirées au hasard. Les résultats sont écrits en JSON avec la version
+du code (commit git) et la machine, et peuvent être comparés à un fichier
+précédent (--compare) pour repérer les régressions.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --compare bench.json
+"""
+
+SCENE_SIZES = (1, 10, 100, 1000, 10000, 100000)
+ENSEMBLE_SIZES = (1, 16, 256)
+STEP_COUNTS = (10, 100, 600)
+# Au-delà, les chemins en boucle Python (référence, listes) ne sont pas mesurés
+MAX_LOOP_SIZE = 1000
+
+def benchmark_scene(n_spheres, rng, max_near=256, arena_size=2.0, inner=2.6, outer=4.0):
+    """Scène de n sphères : en champ proche dans la zone, le reste au loin
+
+    La moitié des sphères (au plus max_near) est placée sans recouvrement
+    dans la zone de simulation (±arena_size, hors du départ du robot) : le
+    robot passe près d'elles, avec des réponses de champ proche et des
+    collisions. Les autres sont dans la couronne inner < r < outer, hors de
+    la zone (±2.5 m) : elles ne font qu'ajouter au coût de la perception.
+    """
+    from scene_generator import generate_scene
+    n_near = min(max_near, (n_spheres + 1) // 2)
+    n_far = n_spheres - n_near
+    near = generate_scene(n_near, rng, arena_size=arena_size, radius_range=(0.03, 0.1))
+    r = np.sqrt(rng.uniform(inner**2, outer**2, n_far))
+    phi = rng.uniform(0, 2*np.pi, n_far)
+    positions = np.column_stack([r*np.cos(phi), r*np.sin(phi), np.zeros(n_far)])
+    radii = rng.uniform(0.01, 0.05, n_far)
+    chis = np.where(rng.random(n_far) < 0.5, 1.0, -0.5)
+    return Scene(np.concatenate([near.positions, positions]), np.concatenate([near.radii, radii]),
+                 np.concatenate([near.chis, chis]))
+
+def random_poses(n_poses, rng, scene=None, extent=2.0, margin=0.05):
+    """Poses tirées dans ±extent, hors des sphères de la scène (à margin près)"""
+    positions = np.zeros((0, 3))
+    while len(positions) < n_poses:
+        candidates = np.column_stack([rng.uniform(-extent, extent, (n_poses, 2)), np.zeros(n_poses)])
+        if scene is not None and len(scene):
+            d = np.linalg.norm(candidates[:, None, :2] - scene.positions[None, :, :2], axis=-1)
+            candidates = candidates[(d > scene.radii + margin).all(axis=1)]
+        positions = np.concatenate([positions, candidates])[:n_poses]
+    return positions, rng.uniform(0, 2*np.pi, n_poses)
+
+def measure(fn, min_time=0.2, max_calls=10000):
+    """Temps moyen d'un appel de fn() [s] (appels répétés pendant min_time au moins)"""
+    fn()  # préchauffage (caches, imports)
+    calls, start = 0, time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time and calls < max_calls:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / calls, calls
+
+def sense_error(sense, scene, poses):
+    """Erreurs absolue et relative maximales d'une perception approchée"""
+    positions, orientations = poses
+    exact = np.array([compute_electric_sense(scene, p, t) for p, t in zip(positions, orientations)])
+    approx = np.array([sense(scene, p, t) for p, t in zip(positions, orientations)])
+    error = np.abs(approx - exact).max()
+    return {'max_abs_error': float(error), 'rel_error': float(error / max(np.abs(exact).max(), 1e-300))}
+
+def record(benchmark, mode, seconds, calls, **fields):
+    return dict(benchmark=benchmark, mode=mode, seconds_per_call=seconds, calls=calls, **fields)
+
+def bench_sensing(sizes, rng, n_poses=20, min_time=0.2):
+    """compute_K_sphere, compute_electric_sense et ses modes approchés"""
+    from far_field import compute_electric_sense_far_field
+    from sense_table import SenseTable
+    from sense_cache import SenseMap
+
+    # La table couvre toute la scène (couronne r < 4 m) vue de toute pose (±2 m)
+    table_extent = 7.0
+    table = SenseTable.build(extent=table_extent, resolution=0.02)
+    records = []
+    for n in sizes:
+        scene = benchmark_scene(n, rng)
+        poses = random_poses(n_poses, rng, scene)
+        position, orientation = poses[0][0], poses[1][0]
+
+        if n <= MAX_LOOP_SIZE:
+            seconds, calls = measure(lambda: compute_K_sphere(scene[0], position, orientation), min_time)
+            records.append(record('compute_K_sphere', 'reference', seconds, calls, n_spheres=1))
+            seconds, calls = measure(lambda: compute_electric_sense_reference(scene, position, orientation), min_time)
+            records.append(record('compute_electric_sense', 'reference', seconds, calls, n_spheres=n))
+
+        seconds, calls = measure(lambda: compute_electric_sense(scene, position, orientation), min_time)
+        records.append(record('compute_electric_sense', 'exact', seconds, calls, n_spheres=n,
+                              max_abs_error=0.0, rel_error=0.0))
+
+        cutoff = 1.0
+        sense = lambda s, p, t: compute_electric_sense(s, p, t, cutoff=cutoff)
+        seconds, calls = measure(lambda: sense(scene, position, orientation), min_time)
+        records.append(record('compute_electric_sense', 'cutoff', seconds, calls, n_spheres=n, cutoff=cutoff,
+                              error_bound=float(np.max(cutoff_error_bound(scene, cutoff))),
+                              **sense_error(sense, scene, poses)))
+
+        opening_angle = 0.5
+        sense = lambda s, p, t: compute_electric_sense_far_field(s, p, t, opening_angle)
+        seconds, calls = measure(lambda: sense(scene, position, orientation), min_time)
+        records.append(record('compute_electric_sense', 'far_field', seconds, calls, n_spheres=n,
+                              opening_angle=opening_angle, **sense_error(sense, scene, poses)))
+
+        seconds, calls = measure(lambda: table.compute_electric_sense(scene, position, orientation), min_time)
+        records.append(record('compute_electric_sense', 'sense_table', seconds, calls, n_spheres=n,
+                              resolution=0.02, extent=table_extent,
+                              **sense_error(table.compute_electric_sense, scene, poses)))
+
+        if n <= MAX_LOOP_SIZE:
+            sense_map = SenseMap(scene)
+            sense_map.compute_electric_sense(scene, position, orientation)  # tuile calculée
+            seconds, calls = measure(lambda: sense_map.compute_electric_sense(scene, position, orientation),
+                                     min_time)
+            records.append(record('compute_electric_sense', 'sense_cache', seconds, calls, n_spheres=n,
+                                  resolution=sense_map.resolution, near_distance=sense_map.near_distance,
+                                  error_bound=float(np.max(sense_map.error_bound())),
+                                  **sense_error(sense_map.compute_electric_sense, scene, poses)))
+    return records
+
+def bench_control(ensemble_sizes, rng, min_time=0.2):
+    """ElectricBehavior.compute_command et sa version vectorisée"""
+    records = []
+    behavior = ElectricBehavior(behavior_type=1)
+    seconds, calls = measure(lambda: behavior.compute_command(1e-3, 2e-4), min_time)
+    records.append(record('compute_command', 'scalar', seconds, calls, n_robots=1))
+    for m in ensemble_sizes:
+        types = rng.integers(1, 5, m)
+        gains, speeds = np.full(m, 0.5), np.full(m, 0.1)
+        I_ax, I_lat = rng.normal(size=m) * 1e-3, rng.normal(size=m) * 1e-4
+        seconds, calls = measure(lambda: compute_commands(types, gains, speeds, I_ax, I_lat), min_time)
+        records.append(record('compute_command', 'batch', seconds, calls, n_robots=m))
+    return records
+
+def bench_collision(sizes, rng, min_time=0.2):
+    """check_collision : parcours de la liste et index spatial"""
+    from simulation import check_collision
+    records = []
+    for n in sizes:
+        scene = benchmark_scene(n, rng)
+        position = np.zeros(3)
+        if n <= MAX_LOOP_SIZE:
+            spheres = list(scene)
+            seconds, calls = measure(lambda: check_collision(position, spheres), min_time)
+            records.append(record('check_collision', 'list', seconds, calls, n_spheres=n))
+        seconds, calls = measure(lambda: check_collision(position, scene), min_time)
+        records.append(record('check_collision', 'grid', seconds, calls, n_spheres=n))
+    return records
+
+def bench_simulation(sizes, step_counts, ensemble_sizes, rng, min_time=0.2):
+    """simulate_behavior (temps par pas) et simulate_ensemble (temps par robot et par pas)"""
+    from simulation import simulate_behavior, create_random_scene
+    from ensemble import simulate_ensemble
+    records = []
+    behavior = ElectricBehavior(behavior_type=2)
+    for n in sizes:
+        scene = benchmark_scene(n, rng)
+        for steps in step_counts:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                history = simulate_behavior(behavior, scene, steps * DT)
+                seconds = time.perf_counter() - start
+            done = len(history['time']) - 1
+            records.append(record('simulate_behavior', 'euler', seconds / max(done, 1), done,
+                                  n_spheres=n, n_steps=steps))
+
+    steps = min(step_counts)
+    for m in ensemble_sizes:
+        scenes = [create_random_scene(rng=rng) for _ in range(m)]
+        behaviors = [ElectricBehavior(behavior_type=1 + i % 4) for i in range(m)]
+        seconds, calls = measure(lambda: simulate_ensemble(behaviors, scenes, steps * DT), min_time)
+        records.append(record('simulate_ensemble', 'euler', seconds / (m * steps), calls,
+                              n_robots=m, n_steps=steps))
+    return records
+
+def environment():
+    """Version du code et description de la machine"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(),
+            'system': platform.platform()}
+
+def run_benchmarks(sizes=SCENE_SIZES, ensemble_sizes=ENSEMBLE_SIZES, step_counts=STEP_COUNTS,
+                   seed=0, min_time=0.2):
+    """Exécute toutes les mesures
+
+    Returns:
+        Dictionnaire {'environment': ..., 'results': [enregistrements]}
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    results += bench_sensing(sizes, rng, min_time=min_time)
+    results += bench_control(ensemble_sizes, rng, min_time=min_time)
+    results += bench_collision(sizes, rng, min_time=min_time)
+    results += bench_simulation(sizes, step_counts, ensemble_sizes, rng, min_time=min_time)
+    return {'environment': environment(), 'results': results}
+
+def result_key(result):
+    """Identifiant d'une mesure : benchmark, mode et paramètres de taille"""
+    params = tuple(sorted((k, v) for k, v in result.items() if k in ('n_spheres', 'n_robots', 'n_steps')))
+    return (result['benchmark'], result['mode']) + params
+
+def compare(results, baseline, threshold=1.2):
+    """Rapports de temps (actuel / référence) des mesures communes
+
+    Returns:
+        Liste de (clé, rapport, régression) où régression signale un
+        rapport supérieur à threshold
+    """
+    previous = {result_key(r): r for r in baseline['results']}
+    comparison = []
+    for r in results['results']:
+        key = result_key(r)
+        if key in previous:
+            ratio = r['seconds_per_call'] / previous[key]['seconds_per_call']
+            comparison.append((key, ratio, ratio > threshold))
+    return comparison
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai des performances")
+    parser.add_argument('--output', default='benchmark.json', help="Fichier de résultats (JSON)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SCENE_SIZES, help="Nombres de sphères")
+    parser.add_argument('--ensemble-sizes', type=int, nargs='+', default=ENSEMBLE_SIZES)
+    parser.add_argument('--steps', type=int, nargs='+', default=STEP_COUNTS)
+    parser.add_argument('--quick', action='store_true', help="Tailles réduites (1 à 1000 sphères)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Durée minimale par mesure [s]")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', default=None, help="Résultats de référence (JSON)")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Seuil de régression (rapport de temps)")
+    args = parser.parse_args()
+
+    sizes = [n for n in args.sizes if n <= 1000] if args.quick else args.sizes
+    ensemble_sizes = args.ensemble_sizes[:2] if args.quick else args.ensemble_sizes
+    steps = args.steps[:2] if args.quick else args.steps
+    results = run_benchmarks(sizes, ensemble_sizes, steps, args.seed, args.min_time)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    for r in results['results']:
+        params = ', '.join(f"{k}={v}" for k, v in r.items()
+                           if k not in ('benchmark', 'mode', 'seconds_per_call', 'calls'))
+        print(f"{r['benchmark']:24s} {r['mode']:12s} {r['seconds_per_call']*1e6:12.1f} µs  {params}")
+    print(f"Résultats enregistrés dans {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key, ratio, regression in compare(results, baseline, args.threshold):
+            flag = '  <-- régression' if regression else ''
+            print(f"{' '.join(map(str, key)):60s} x{ratio:.2f}{flag}")
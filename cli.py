@@ -0,0 +1,44 @@
+# cli.py
+import argparse
+import importlib
+import sys
+
+"""
+Point d'entrée en ligne de commande, sans interaction.
+
+    python cli.py sweep --seeds 1000 --workers 8
+    python cli.py simulate --seed 3 7
+    python cli.py debug front conductrice --output mesures.png
+
+Seul le module de la sous-commande choisie est importé (avec ses arguments,
+voir build_parser et main de chaque module). Les modules de perception, de
+commande et de simulation n'importent pas matplotlib : il n'est chargé qu'au
+moment de tracer (render.py, debug.run_simulation, physics.plot_fields), si
+bien que les processus de calcul démarrent sans lui.
+"""
+
+# Sous-commande : (module, description)
+COMMANDS = {
+    'sweep': ('sweep', "Balayage parallèle seeds × comportements"),
+    'simulate': ('simulation', "Simulation des 4 comportements par seed, avec figures"),
+    'debug': ('debug', "Test du capteur : passage d'une sphère devant le capteur fixe"),
+}
+
+def build_parser(command=None):
+    """Parseur des sous-commandes ; seuls les arguments de `command` sont chargés"""
+    parser = argparse.ArgumentParser(description="Simulation du robot à sens électrique")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (module, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        if name == command:
+            importlib.import_module(module).build_parser(subparser)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    command = argv[0] if argv and argv[0] in COMMANDS else None
+    args = build_parser(command).parse_args(argv)
+    importlib.import_module(COMMANDS[args.command][0]).main(args)
+
+if __name__ == "__main__":
+    main()
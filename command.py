@@ -84,3 +84,38 @@ class ElectricBehavior:
     def get_name(self):
         """Retourne le nom du comportement actuel"""
         return self.behavior_names.get(self.behavior_type, "Comportement inconnu")
+
+def compute_commands(behavior_types, k_gains, forward_speeds, I_ax, I_lat):
+    """Version vectorisée de ElectricBehavior.compute_command pour M robots
+
+    Chaque robot a son propre comportement, gain et vitesse. Les lois sont
+    identiques à compute_command :
+    - B1/B3 : signe +, B2/B4 : signe -
+    - B1/B2 : K = ±k/(I_ax + ε), B3/B4 : K = ±k/|I_ax|
+
+    Args:
+        behavior_types: Types de comportement (M,)
+        k_gains: Gains (M,)
+        forward_speeds: Vitesses linéaires (M,)
+        I_ax: Courants axiaux mesurés (M,)
+        I_lat: Courants latéraux mesurés (M,)
+
+    Returns:
+        Tuple (v, ω) de tableaux (M,)
+    """
+    behavior_types = np.asarray(behavior_types)
+    I_ax = np.asarray(I_ax, dtype=float)
+    epsilon = 1e-10  # Valeur minimale pour eviter division par 0
+
+    unknown = ~np.isin(behavior_types, [1, 2, 3, 4])
+    if unknown.any():
+        raise ValueError(f"Comportement {behavior_types[unknown][0]} non implémenté")
+
+    sign = np.where((behavior_types == 1) | (behavior_types == 3), 1.0, -1.0)
+    denominator = np.where(behavior_types <= 2, I_ax + epsilon, np.abs(I_ax))
+    valid = np.abs(I_ax) > epsilon
+    K = np.where(valid, sign * np.asarray(k_gains, dtype=float) / np.where(valid, denominator, 1.0), 0.0)
+
+    v = np.broadcast_to(np.asarray(forward_speeds, dtype=float), I_ax.shape)
+    w = K * np.asarray(I_lat, dtype=float)
+    return v, w
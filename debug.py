@@ -1,15 +1,27 @@
 # debug.py
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('TkAgg')
-import os
-from constants import *
 from electric_sense import Sphere, compute_electric_sense
-from draw_robot import draw_robot, draw_sphere, draw_trajectory, setup_plot
 
-def run_simulation(movement_type, sphere_type):
-    """Fonction principale de simulation selon les paramètres choisis"""
+MOVEMENT_TYPES = ('front', 'side')
+SPHERE_TYPES = ('conductrice', 'isolante')
+
+def measure_passage(movement_type, sphere_type, n_points=100):
+    """Courants mesurés par le capteur fixe pendant le passage d'une sphère
+
+    Args:
+        movement_type: 'front' (passage devant le capteur, selon Y) ou
+                       'side' (passage à côté, selon X)
+        sphere_type: 'conductrice' (χ > 0) ou 'isolante' (χ < 0)
+
+    Returns:
+        Tuple (sphère, positions (n_points, 3), dimension ('x' ou 'y'),
+        courants (n_points, 3) (I_ax, I_lat, I_vert))
+    """
+    if movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f"Type de mouvement inconnu : {movement_type}")
+    if sphere_type not in SPHERE_TYPES:
+        raise ValueError(f"Type de sphère inconnu : {sphere_type}")
     # Capteur fixe à l'origine
     sensor_pos = np.array([0, 0, 0])
     sensor_orientation = 0
@@ -18,19 +30,17 @@ def run_simulation(movement_type, sphere_type):
     if movement_type == 'front':
         # Sphère se déplaçant latéralement devant le capteur
         positions = []
-        y_positions = np.linspace(-0.5, 0.5, 100)
+        y_positions = np.linspace(-0.5, 0.5, n_points)
         x_position = 0.3
         dimension = 'y'
-        xlabel = 'Position Y de la sphère (m)'
         for y in y_positions:
             positions.append([x_position, y, 0])
     else:  # 'side'
         # Sphère se déplaçant d'avant en arrière à côté du capteur
         positions = []
-        x_positions = np.linspace(0.7, -0.7, 100)
+        x_positions = np.linspace(0.7, -0.7, n_points)
         y_position = 0.3
         dimension = 'x'
-        xlabel = 'Position X de la sphère (m)'
         for x in x_positions:
             positions.append([x, y_position, 0])
     
@@ -40,20 +50,30 @@ def run_simulation(movement_type, sphere_type):
     # Création de la sphère
     sphere = Sphere(positions[0], 0.03, chi)
     
-    # Stockage des mesures
-    I_ax_values = []
-    I_lat_values = []
-    I_vert_values = []
-    
     # Calcul pour chaque position
+    currents = []
     for pos in positions:
         sphere.position = np.array(pos)
-        I_ax, I_lat, I_vert = compute_electric_sense([sphere], sensor_pos, sensor_orientation)
-        I_ax_values.append(I_ax)
-        I_lat_values.append(I_lat)
-        I_vert_values.append(I_vert)
-    
-    # Visualisation
+        currents.append(compute_electric_sense([sphere], sensor_pos, sensor_orientation))
+    return sphere, np.array(positions, dtype=float), dimension, np.array(currents)
+
+def run_simulation(movement_type, sphere_type, filename=None, show=True):
+    """Fonction principale de simulation selon les paramètres choisis
+
+    Args:
+        filename: Figure de sortie (par défaut
+                  'mesures_sphere_{movement_type}_{sphere_type}.png')
+        show: Affiche la figure (sinon, elle est seulement enregistrée)
+    """
+    sphere, positions, dimension, currents = measure_passage(movement_type, sphere_type)
+    I_ax_values, I_lat_values, I_vert_values = currents.T
+    xlabel = f'Position {dimension.upper()} de la sphère (m)'
+
+    # Visualisation (matplotlib n'est chargé que pour le tracé)
+    import matplotlib.pyplot as plt
+    from draw_robot import draw_robot, draw_sphere, draw_trajectory, setup_plot
+    sensor_pos = np.array([0, 0, 0])
+    sensor_orientation = 0
     fig = plt.figure(figsize=(12, 8))
     
     # Plot de la scène
@@ -66,7 +86,7 @@ def run_simulation(movement_type, sphere_type):
     
     # Plot des mesures
     plt.subplot(122)
-    x_axis = [pos[1] if dimension == 'y' else pos[0] for pos in positions]
+    x_axis = positions[:, 1] if dimension == 'y' else positions[:, 0]
     plt.plot(x_axis, I_ax_values, 'b-', label='I axial')
     plt.plot(x_axis, I_lat_values, 'r-', label='I latéral')
     plt.plot(x_axis, I_vert_values, 'g-', label='I vertical')
@@ -76,38 +96,29 @@ def run_simulation(movement_type, sphere_type):
     plt.legend()
     
     plt.tight_layout()
-    filename = f'mesures_sphere_{movement_type}_{sphere_type}.png'
+    filename = filename or f'mesures_sphere_{movement_type}_{sphere_type}.png'
     plt.savefig(filename, dpi=300, bbox_inches='tight')
     print(f"Figure enregistrée sous '{filename}'")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
-def menu():
-    """Affiche un menu pour choisir les paramètres de simulation"""
-    print("\n=== TEST DU CAPTEUR ÉLECTRIQUE ===")
-    print("Choisissez le type de mouvement de la sphère:")
-    print("1. Mouvement frontal (gauche-droite)")
-    print("2. Mouvement latéral (avant-arrière)")
-    
-    while True:
-        choice = input("Votre choix (1/2): ")
-        if choice in ['1', '2']:
-            movement_type = 'front' if choice == '1' else 'side'
-            break
-        print("Choix invalide, veuillez réessayer.")
-    
-    print("\nChoisissez le type de sphère:")
-    print("1. Conductrice (χ > 0)")
-    print("2. Isolante (χ < 0)")
-    
-    while True:
-        choice = input("Votre choix (1/2): ")
-        if choice in ['1', '2']:
-            sphere_type = 'conductrice' if choice == '1' else 'isolante'
-            break
-        print("Choix invalide, veuillez réessayer.")
-    
-    return movement_type, sphere_type
+def build_parser(parser=None):
+    """Arguments du scénario de test (aussi utilisés par cli.py)"""
+    parser = parser or argparse.ArgumentParser(description="Test du capteur électrique : passage d'une sphère")
+    parser.add_argument('movement', choices=MOVEMENT_TYPES,
+                        help="front : passage devant le capteur (gauche-droite), "
+                             "side : passage à côté (avant-arrière)")
+    parser.add_argument('sphere', choices=SPHERE_TYPES, help="conductrice (χ > 0) ou isolante (χ < 0)")
+    parser.add_argument('--output', default=None, help="Figure de sortie")
+    parser.add_argument('--show', action='store_true', help="Affiche la figure")
+    return parser
+
+def main(args=None):
+    """Lance le scénario (args : liste d'arguments ou argparse.Namespace)"""
+    if not isinstance(args, argparse.Namespace):
+        args = build_parser().parse_args(args)
+    run_simulation(args.movement, args.sphere, args.output, args.show)
 
 if __name__ == "__main__":
-    movement_type, sphere_type = menu()
-    run_simulation(movement_type, sphere_type)
+    main()
@@ -1,31 +1,38 @@
 # draw_robot.py
 import numpy as np
-import matplotlib.pyplot as plt
 from matplotlib.patches import Circle, Polygon
-from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES
+from matplotlib.collections import PatchCollection
+from constants import X_ELECTRODES, Y_ELECTRODES
+from electric_sense import sphere_arrays
 
-def draw_robot(ax, sensor_pos, sensor_orientation, robot_size=0.1, color='black'):
-    """Dessine le robot avec ses électrodes sur l'axe donné"""
-    # Robot (triangle pour montrer l'orientation)
+def robot_geometry(sensor_pos, sensor_orientation, robot_size=0.1):
+    """Sommets du triangle du robot (3, 2) et positions XY des électrodes (5, 2)"""
     angle = sensor_orientation
+    c, s = np.cos(angle), np.sin(angle)
     triangle_points = np.array([
-        [sensor_pos[0] + robot_size*np.cos(angle), sensor_pos[1] + robot_size*np.sin(angle)],  # pointe
-        [sensor_pos[0] - robot_size*np.cos(angle) + robot_size/2*np.sin(angle), 
-         sensor_pos[1] - robot_size*np.sin(angle) - robot_size/2*np.cos(angle)],  # coin droit
-        [sensor_pos[0] - robot_size*np.cos(angle) - robot_size/2*np.sin(angle),
-         sensor_pos[1] - robot_size*np.sin(angle) + robot_size/2*np.cos(angle)]   # coin gauche
+        [sensor_pos[0] + robot_size*c, sensor_pos[1] + robot_size*s],  # pointe
+        [sensor_pos[0] - robot_size*c + robot_size/2*s,
+         sensor_pos[1] - robot_size*s - robot_size/2*c],  # coin droit
+        [sensor_pos[0] - robot_size*c - robot_size/2*s,
+         sensor_pos[1] - robot_size*s + robot_size/2*c]   # coin gauche
     ])
+    # Rotation des coordonnées des électrodes
+    electrodes = np.column_stack([
+        sensor_pos[0] + c*X_ELECTRODES - s*Y_ELECTRODES,
+        sensor_pos[1] + s*X_ELECTRODES + c*Y_ELECTRODES
+    ])
+    return triangle_points, electrodes
+
+def draw_robot(ax, sensor_pos, sensor_orientation, robot_size=0.1, color='black'):
+    """Dessine le robot avec ses électrodes sur l'axe donné"""
+    # Robot (triangle pour montrer l'orientation)
+    triangle_points, positions = robot_geometry(sensor_pos, sensor_orientation, robot_size)
     triangle = Polygon(triangle_points, color=color)
     ax.add_patch(triangle)
     
     # Électrodes
     electrodes = []
-    for i in range(5):
-        # Rotation des coordonnées des électrodes
-        R = np.array([[np.cos(angle), -np.sin(angle), 0],
-                     [np.sin(angle), np.cos(angle), 0],
-                     [0, 0, 1]])
-        pos = sensor_pos + R @ np.array([X_ELECTRODES[i], Y_ELECTRODES[i], Z_ELECTRODES[i]])
+    for pos in positions:
         electrode = ax.plot(pos[0], pos[1], 'ko', markersize=5)[0]
         electrodes.append(electrode)
     
@@ -40,6 +47,23 @@ def draw_sphere(ax, sphere):
     ax.add_patch(sphere_plot)
     return sphere_plot
 
+def scene_patches(spheres):
+    """Cercles et couleurs (rouge: conducteur, bleu: isolant) d'une scène"""
+    positions, radii, chis = sphere_arrays(spheres)
+    circles = [Circle((x, y), r) for (x, y, _), r in zip(positions, radii)]
+    colors = np.where(chis[:, None] > 0, [[1.0, 0, 0, 0.5]], [[0, 0, 1.0, 0.5]])
+    return circles, colors
+
+def draw_scene(ax, spheres):
+    """Dessine toutes les sphères d'une scène en une seule collection
+
+    Accepte une Scene ou une liste de Sphere ; même rendu que draw_sphere.
+    """
+    circles, colors = scene_patches(spheres)
+    collection = PatchCollection(circles, facecolors=colors, edgecolors=colors)
+    ax.add_collection(collection)
+    return collection
+
 def draw_trajectory(ax, positions, dimension='y'):
     """Dessine la trajectoire de la sphère"""
     if dimension == 'y':
@@ -1,6 +1,6 @@
 # electric_sense.py
 import numpy as np
-from constants import *
+from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES, GAMMA, C0, U
 
 class Sphere:
     """Représente une sphère dans la scène
@@ -21,7 +21,8 @@ def compute_K_sphere(sphere, sensor_position, sensor_orientation):
     Kαβ = 1/(4πγ) * (rα.P.rβ)/(||rα||³||rβ||³)
     
     où:
-    - P = χa³I est le tenseur de polarisation (I matrice identité 3x3)
+    - P = χa³I est le tenseur de polarisation (I matrice identité 3x3) ;
+      pour d'autres formes, voir polarization.py
     - rα est le vecteur position_electrode_α - position_sphere
     - rβ est le vecteur position_electrode_β - position_sphere
     """
@@ -60,7 +61,189 @@ def compute_K_sphere(sphere, sensor_position, sensor_orientation):
     
     return K
 
-def compute_electric_sense(spheres, sensor_position, sensor_orientation):
+def electrode_positions(sensor_position, sensor_orientation):
+    """Positions des 5 électrodes dans le repère global
+
+    Accepte aussi des lots de capteurs : sensor_position (..., 3) et
+    sensor_orientation (...).
+
+    Returns:
+        np.array (..., 5, 3): position de chaque électrode [m]
+    """
+    sensor_position = np.asarray(sensor_position, dtype=float)
+    theta = np.asarray(sensor_orientation, dtype=float)[..., None]
+    c, s = np.cos(theta), np.sin(theta)
+    x = sensor_position[..., 0, None] + c * X_ELECTRODES - s * Y_ELECTRODES
+    y = sensor_position[..., 1, None] + s * X_ELECTRODES + c * Y_ELECTRODES
+    z = sensor_position[..., 2, None] + np.zeros_like(theta) + Z_ELECTRODES
+    return np.stack([x, y, z], axis=-1)
+
+def sphere_arrays(spheres):
+    """Convertit une liste de sphères en tableaux (positions, rayons, χ)
+
+    Une Scene (scene.py) fournit directement ses tableaux, sans copie.
+
+    Returns:
+        Tuple (positions (N, 3), radii (N,), chis (N,))
+    """
+    if hasattr(spheres, 'positions'):
+        return spheres.positions, spheres.radii, spheres.chis
+    positions = np.array([sphere.position for sphere in spheres], dtype=float).reshape(-1, 3)
+    radii = np.array([sphere.radius for sphere in spheres], dtype=float)
+    chis = np.array([sphere.chi for sphere in spheres], dtype=float)
+    return positions, radii, chis
+
+def compute_K_dipoles(positions, strengths, sensor_position, sensor_orientation):
+    """Calcule K_total (5x5) pour N sources de polarisation isotropes en une passe
+
+    Même équation que compute_K_sphere, avec P = s·I où s = χa³ est
+    l'intensité de polarisation de chaque source. Les vecteurs
+    électrode-source sont calculés une seule fois pour toutes les sources :
+    K = 1/(4πγ) Σn sn·Fn·Fnᵀ avec Fn[α] = rα/||rα||³
+
+    Args:
+        positions: Positions des sources (N, 3) [m]
+        strengths: Intensités de polarisation s = χa³ (N,) [m³]
+        sensor_position: Position du capteur [x,y,z]
+        sensor_orientation: Orientation du capteur [rad]
+
+    Returns:
+        np.array (5, 5): somme des matrices K
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    strengths = np.asarray(strengths, dtype=float)
+    electrodes = electrode_positions(sensor_position, sensor_orientation)
+
+    # Vecteurs rα pour chaque source (N, 5, 3)
+    r = electrodes[None, :, :] - positions[:, None, :]
+    r_norm = np.sqrt(np.einsum('nai,nai->na', r, r))
+    F = r / r_norm[:, :, None]**3
+
+    # Somme des produits extérieurs pondérés, via un seul produit matriciel
+    F_flat = F.transpose(1, 0, 2).reshape(5, -1)
+    G_flat = (F * strengths[:, None, None]).transpose(1, 0, 2).reshape(5, -1)
+    return G_flat @ F_flat.T / (4*np.pi*GAMMA)
+
+def compute_K_spheres(positions, radii, chis, sensor_position, sensor_orientation):
+    """Version vectorisée de compute_K_sphere : K_total pour N sphères
+
+    Args:
+        positions: Positions des sphères (N, 3) [m]
+        radii: Rayons (N,) [m]
+        chis: Contrastes électriques (N,)
+
+    Returns:
+        np.array (5, 5): somme des matrices K de toutes les sphères
+    """
+    strengths = np.asarray(chis, dtype=float) * np.asarray(radii, dtype=float)**3
+    return compute_K_dipoles(positions, strengths, sensor_position, sensor_orientation)
+
+def compute_K_polarized(positions, strengths, tensors, anisotropic, sensor_position, sensor_orientation):
+    """K_total (5x5) pour des sources isotropes et anisotropes en une passe
+
+    Kαβ = 1/(4πγ) Σn Fn[α]·Pn·Fn[β] : les vecteurs Fn sont calculés une seule
+    fois pour toutes les sources ; Pn·Fn vaut sn·Fn pour les sources isotropes
+    et n'est un produit matriciel que pour les sources anisotropes.
+
+    Args:
+        positions: Positions des sources (N, 3) [m]
+        strengths: Intensités s des sources isotropes, P = s·I (N,) [m³]
+        tensors: Tenseurs de polarisation dans le repère global (N, 3, 3) [m³]
+                 (seules les lignes `anisotropic` sont lues)
+        anisotropic: Indices des sources anisotropes
+
+    Returns:
+        np.array (5, 5): somme des matrices K
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    electrodes = electrode_positions(sensor_position, sensor_orientation)
+
+    r = electrodes[None, :, :] - positions[:, None, :]
+    r_norm = np.sqrt(np.einsum('nai,nai->na', r, r))
+    F = r / r_norm[:, :, None]**3
+
+    G = F * np.asarray(strengths, dtype=float)[:, None, None]
+    if len(anisotropic):
+        G[anisotropic] = np.einsum('nij,naj->nai', tensors[anisotropic], F[anisotropic])
+    F_flat = F.transpose(1, 0, 2).reshape(5, -1)
+    G_flat = G.transpose(1, 0, 2).reshape(5, -1)
+    return G_flat @ F_flat.T / (4*np.pi*GAMMA)
+
+# Combinaisons linéaires de δI donnant (I_ax, I_lat, I_vert)
+READOUT = np.array([
+    [0, 0.25, 0.25, 0.25, 0.25],  # axial : moyenne des 4 électrodes avant
+    [0, 1, 0, -1, 0],             # latéral : gauche - droite
+    [0, 0, 1, 0, -1]              # vertical : haut - bas
+])
+
+def currents_from_K(K_total):
+    """Courants perturbés δI = -C0·K·C0·U et extraction (I_ax, I_lat, I_vert)
+
+    K_total peut être une matrice (5, 5) ou un lot (M, 5, 5).
+    """
+    delta_I = -C0 @ K_total @ C0 @ U
+
+    I_ax = (delta_I[..., 1] + delta_I[..., 2] + delta_I[..., 3] + delta_I[..., 4])/4  # moyenne des 4 électrodes avant
+    I_lat = delta_I[..., 1] - delta_I[..., 3]  # gauche - droite 
+    I_vert = delta_I[..., 2] - delta_I[..., 4]  # haut - bas
+
+    return I_ax, I_lat, I_vert
+
+# Lecture directe : I = -READOUT·C0·K·C0·U = -1/(4πγ)·A·Σn sn·Fn·(Fnᵀ·w), avec
+# w = C0·U et A = READOUT·C0 / (4πγ), calculés une fois
+READOUT_W = C0 @ U
+READOUT_A = READOUT @ C0 / (4*np.pi*GAMMA)
+
+def readout_dipoles(positions, strengths, sensor_position, sensor_orientation):
+    """(I_ax, I_lat, I_vert) de N sources isotropes, sans former K
+
+    Pour chaque source, un seul vecteur un = sn·Fnᵀ·w (3,) est formé ; le
+    vecteur v = Σn Fn·un (5,) donne les courants I = -A·v. Même résultat que
+    currents_from_K(compute_K_dipoles(...)) aux arrondis près, sans
+    matrices 5x5 par source.
+
+    Args:
+        positions: Positions des sources (N, 3) [m]
+        strengths: Intensités de polarisation s = χa³ (N,) [m³]
+
+    Returns:
+        Tuple (I_ax, I_lat, I_vert)
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    electrodes = electrode_positions(sensor_position, sensor_orientation)
+    r = electrodes[None, :, :] - positions[:, None, :]  # (N, 5, 3)
+    inv_r3 = np.einsum('nai,nai->na', r, r)**-1.5       # (N, 5)
+    u = np.einsum('na,nai->ni', inv_r3 * READOUT_W, r) * np.asarray(strengths, dtype=float)[:, None]
+    v = np.einsum('na,na->a', inv_r3, np.einsum('nai,ni->na', r, u))
+    return tuple(-READOUT_A @ v)
+
+def readout_dipoles_batch(positions, strengths, sensor_positions, sensor_orientations):
+    """Version par lot de readout_dipoles pour M capteurs
+
+    Args:
+        positions: Positions des sources (M, N, 3) [m]
+        strengths: Intensités de polarisation (M, N) [m³]
+
+    Returns:
+        Tuple (I_ax, I_lat, I_vert) de tableaux (M,)
+    """
+    positions = np.asarray(positions, dtype=float)
+    electrodes = electrode_positions(sensor_positions, sensor_orientations)
+    r = electrodes[:, None, :, :] - positions[:, :, None, :]  # (M, N, 5, 3)
+    inv_r3 = np.einsum('mnai,mnai->mna', r, r)**-1.5
+    u = np.einsum('mna,mnai->mni', inv_r3 * READOUT_W, r) * np.asarray(strengths, dtype=float)[..., None]
+    v = np.einsum('mna,mna->ma', inv_r3, np.einsum('mnai,mni->mna', r, u))
+    return tuple((-v @ READOUT_A.T).T)
+
+def compute_electric_sense_batch(positions, strengths, sensor_positions, sensor_orientations):
+    """Version par lot de compute_electric_sense pour M capteurs
+
+    Returns:
+        Tuple (I_ax, I_lat, I_vert) de tableaux (M,)
+    """
+    return readout_dipoles_batch(positions, strengths, sensor_positions, sensor_orientations)
+
+def compute_electric_sense(spheres, sensor_position, sensor_orientation, cutoff=None, grid=None):
     """Calcule I_ax, I_lat et I_vert selon la méthodologie:
     1. Somme des matrices K de toutes les sphères
     2. Calcul courants perturbés δI = -C0KtotalC0U
@@ -72,21 +255,73 @@ def compute_electric_sense(spheres, sensor_position, sensor_orientation):
     2: haut (0.2, 0, 0.06)
     3: droite (0.2, -0.06, 0)
     4: bas (0.2, 0, -0.06)
+
+    Args:
+        cutoff: Rayon de perception [m] : seules les sphères à moins de
+                cutoff du capteur sont sommées (voir cutoff_error_bound)
+        grid: Index spatial (spatial_index.SphereGrid) construit sur les
+              mêmes sphères, utilisé à la place de la liste si fourni
+              (par défaut, celui de la Scene)
     """
-    # 1. Somme des K
-    K_total = np.zeros((5,5))
-    for sphere in spheres:
-        K_total += compute_K_sphere(sphere, sensor_position, sensor_orientation)
-        
-    # 2. Calcul courants perturbés
-    delta_I = -C0 @ K_total @ C0 @ U
-    
-    # 3. Extraction composantes
-    I_ax = (delta_I[1] + delta_I[2] + delta_I[3] + delta_I[4])/4  # moyenne des 4 électrodes avant
-    I_lat = delta_I[1] - delta_I[3]  # gauche - droite 
-    I_vert = delta_I[2] - delta_I[4]  # haut - bas
-    
-    return I_ax, I_lat, I_vert
+    if hasattr(spheres, 'tensors'):
+        # Scène mixte d'objets polarisables (polarization.ObjectScene)
+        from polarization import compute_electric_sense as compute_electric_sense_objects
+        return compute_electric_sense_objects(spheres, sensor_position, sensor_orientation, cutoff)
+
+    if grid is None and cutoff is not None and hasattr(spheres, 'grid'):
+        grid = spheres.grid
+
+    # Sphères à sommer (toutes, ou celles à moins de cutoff)
+    if grid is not None:
+        positions, radii, chis = grid.positions, grid.radii, grid.chis
+    else:
+        positions, radii, chis = sphere_arrays(spheres)
 
+    if cutoff is not None:
+        if grid is not None:
+            near = grid.query_radius(sensor_position, cutoff)
+        else:
+            d = positions - np.asarray(sensor_position, dtype=float)
+            near = np.einsum('ij,ij->i', d, d) <= cutoff**2
+        positions, radii, chis = positions[near], radii[near], chis[near]
 
+    # 1. à 3. en une passe, sans former K_total (voir readout_dipoles)
+    return readout_dipoles(positions, chis * radii**3, sensor_position, sensor_orientation)
 
+def cutoff_error_bound(spheres, cutoff, sensor_position=None):
+    """Borne de l'erreur de troncature de compute_electric_sense(cutoff=...)
+
+    Pour une sphère à une distance d > ℓ du capteur (ℓ : distance maximale
+    capteur-électrode), ||Kn|| ≤ |sn|/(4πγ)·Σα 1/||rα||⁴ ≤ 5|sn|/(4πγ(d-ℓ)⁴),
+    d'où |I_i| ≤ ||Ri·C0||·||C0·U||·||Kn|| pour chaque composante i.
+
+    Sans pose, la borne vaut pour toute position du capteur (d ≥ cutoff pour
+    toutes les sphères ignorées) et ne coûte qu'une somme. Avec la pose,
+    elle est calculée sur les sphères effectivement ignorées.
+
+    Returns:
+        np.array (3,): bornes sur (I_ax, I_lat, I_vert)
+    """
+    positions, radii, chis = sphere_arrays(spheres)
+    strengths = np.abs(chis * radii**3)
+    ell = np.sqrt(X_ELECTRODES**2 + Y_ELECTRODES**2 + Z_ELECTRODES**2).max()
+    if cutoff <= ell:
+        raise ValueError(f"Le rayon de perception doit dépasser {ell:.3f} m")
+    gain = np.linalg.norm(READOUT @ C0, axis=1) * np.linalg.norm(C0 @ U) / (4*np.pi*GAMMA)
+
+    if sensor_position is None:
+        return gain * 5 * strengths.sum() / (cutoff - ell)**4
+
+    d = np.linalg.norm(positions - np.asarray(sensor_position, dtype=float), axis=-1)
+    far = d > cutoff
+    return gain * 5 * np.sum(strengths[far] / (d[far] - ell)**4)
+
+def compute_electric_sense_reference(spheres, sensor_position, sensor_orientation):
+    """Chemin de référence : somme sphère par sphère avec compute_K_sphere
+
+    Conservé pour valider les versions vectorisées/approchées.
+    """
+    K_total = np.zeros((5,5))
+    for sphere in spheres:
+        K_total += compute_K_sphere(sphere, sensor_position, sensor_orientation)
+    return currents_from_K(K_total)
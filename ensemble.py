@@ -0,0 +1,172 @@
+# ensemble.py
+import numpy as np
+from constants import SIMULATION_TIME, DT
+from electric_sense import sphere_arrays, compute_electric_sense_batch
+from command import compute_commands
+from recorder import TrajectoryRecorder
+from instrumentation import NULL_INSTRUMENTATION
+
+# Position des sphères fictives utilisées pour compléter les scènes
+# (assez loin pour ne jamais perturber le capteur)
+PAD_POSITION = 1e6
+
+def pack_scenes(scenes):
+    """Regroupe plusieurs scènes de tailles différentes dans des tableaux
+
+    Les scènes plus petites sont complétées par des sphères fictives de
+    contraste nul (aucune contribution à K) et de rayon -inf (jamais de
+    collision).
+
+    Args:
+        scenes: Liste de S scènes (listes de Sphere)
+
+    Returns:
+        Tuple (positions (S, N, 3), radii (S, N), chis (S, N))
+    """
+    n_max = max([len(scene) for scene in scenes] + [1])
+    positions = np.full((len(scenes), n_max, 3), PAD_POSITION)
+    radii = np.full((len(scenes), n_max), -np.inf)
+    chis = np.zeros((len(scenes), n_max))
+
+    for i, scene in enumerate(scenes):
+        p, r, c = sphere_arrays(scene)
+        positions[i, :len(r)] = p
+        radii[i, :len(r)] = r
+        chis[i, :len(r)] = c
+
+    return positions, radii, chis
+
+def count_steps(simulation_time=SIMULATION_TIME, dt=DT):
+    """Nombre de pas effectués par simulate_behavior (même accumulation de t)"""
+    n, t = 0, 0
+    while t < simulation_time:
+        n += 1
+        t += dt
+    return n
+
+def simulate_ensemble(behaviors, scenes, simulation_time=SIMULATION_TIME, dt=DT,
+                      bounds=2.5, collision_margin=0.05, sense=compute_electric_sense_batch,
+                      recorder=None, instrumentation=None):
+    """Simule M robots en parallèle, pas à pas, sous forme de tableaux
+
+    Chaque robot a sa propre scène et son propre comportement (type, gain,
+    vitesse). Un masque "alive" gèle les robots entrés en collision ou sortis
+    de la scène ; les autres continuent. La dynamique est celle de
+    simulate_behavior (Euler explicite, départ en (0, 0, 0)).
+
+    Args:
+        behaviors: Liste de M ElectricBehavior
+        scenes: Liste de M scènes (une même scène peut être partagée)
+        simulation_time: Durée de simulation [s]
+        dt: Pas de temps [s]
+        bounds: Demi-taille de la scène [m]
+        collision_margin: Marge de collision [m]
+        sense: Fonction de perception par lot, de même signature que
+               compute_electric_sense_batch
+        recorder: TrajectoryRecorder à M robots (par ex. avec courants,
+                  commandes, décimation ou écriture sur disque). Par défaut,
+                  un enregistreur en mémoire dimensionné pour la simulation.
+        instrumentation: Instrumentation (instrumentation.py) ; les pas et
+                         évaluations de perception sont comptés par robot
+
+    Returns:
+        Liste de M historiques au format de simulate_behavior (les données
+        complètes restent accessibles dans le recorder)
+    """
+    M = len(behaviors)
+    if len(scenes) != M:
+        raise ValueError("Il faut une scène par robot")
+
+    # Scènes uniques (évite de dupliquer une scène partagée)
+    scene_ids = {}
+    unique_scenes = []
+    scene_index = np.empty(M, dtype=int)
+    for m, scene in enumerate(scenes):
+        if id(scene) not in scene_ids:
+            scene_ids[id(scene)] = len(unique_scenes)
+            unique_scenes.append(scene)
+        scene_index[m] = scene_ids[id(scene)]
+    positions, radii, chis = pack_scenes(unique_scenes)
+    strengths = chis * np.where(np.isfinite(radii), radii, 0.0)**3
+
+    behavior_types = np.array([b.behavior_type for b in behaviors])
+    k_gains = np.array([b.k_gain for b in behaviors], dtype=float)
+    forward_speeds = np.array([b.forward_speed for b in behaviors], dtype=float)
+
+    x = np.zeros(M)
+    y = np.zeros(M)
+    theta = np.zeros(M)
+
+    # Historique préalloué (n_steps + 1, M)
+    if recorder is None:
+        recorder = TrajectoryRecorder(M, capacity=count_steps(simulation_time, dt) + 1)
+    recorder.record(0, x, y, theta)
+    alive = np.ones(M, dtype=bool)
+    collision = np.zeros(M, dtype=bool)
+    out_of_bounds = np.zeros(M, dtype=bool)
+
+    inst = NULL_INSTRUMENTATION if instrumentation is None else instrumentation
+    n_spheres = np.array([len(scene) for scene in unique_scenes])[scene_index]
+
+    t = 0
+    inst.start()
+    while t < simulation_time and alive.any():
+        idx = np.flatnonzero(alive)
+        s_idx = scene_index[idx]
+
+        # Vérification de collision
+        dx = x[idx, None] - positions[s_idx, :, 0]
+        dy = y[idx, None] - positions[s_idx, :, 1]
+        hit = (np.sqrt(dx*dx + dy*dy) < radii[s_idx] + collision_margin).any(axis=1)
+        collision[idx[hit]] = True
+
+        # Vérification si hors limites
+        out = ~hit & ((np.abs(x[idx]) > bounds) | (np.abs(y[idx]) > bounds))
+        out_of_bounds[idx[out]] = True
+
+        stopped = hit | out
+        alive[idx[stopped]] = False
+        idx = idx[~stopped]
+        s_idx = s_idx[~stopped]
+        inst.lap('collision')
+
+        if len(idx):
+            # Calcul des courants électriques
+            sensor_positions = np.stack([x[idx], y[idx], np.zeros(len(idx))], axis=-1)
+            I_ax, I_lat, I_vert = sense(
+                positions[s_idx], strengths[s_idx], sensor_positions, theta[idx])
+            inst.lap('sense')
+
+            # Calcul des commandes
+            v, w = compute_commands(behavior_types[idx], k_gains[idx],
+                                    forward_speeds[idx], I_ax, I_lat)
+            inst.lap('control')
+
+            # Mise à jour de la position et orientation (intégration simple)
+            theta[idx] += w * dt
+            x[idx] += v * np.cos(theta[idx]) * dt
+            y[idx] += v * np.sin(theta[idx]) * dt
+            inst.lap('integration')
+
+            # Enregistrement dans l'historique
+            measured = np.full((5, M), np.nan)
+            measured[:, idx] = I_ax, I_lat, I_vert, v, w
+            recorder.record(t, x, y, theta, alive=alive,
+                            sense=measured[:3], command=measured[3:])
+            inst.lap('record')
+
+            if inst.enabled:
+                inst.count('steps', len(idx))
+                inst.count('sense_calls', len(idx))
+                inst.count('spheres_evaluated', int(n_spheres[idx].sum()))
+                if inst.hooks:
+                    inst.step({'time': t, 'robots': idx, 'x': x[idx], 'y': y[idx], 'theta': theta[idx],
+                               'I_ax': I_ax, 'I_lat': I_lat, 'I_vert': I_vert, 'v': v, 'w': w})
+                inst.lap('overhead')
+
+        # Incrémentation du temps
+        t += dt
+
+    inst.end_run(collision.sum(), out_of_bounds.sum(), runs=M)
+    recorder.finish(collision=collision, out_of_bounds=out_of_bounds)
+    return recorder.histories()
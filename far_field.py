@@ -0,0 +1,169 @@
+# far_field.py
+import numpy as np
+from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES
+from electric_sense import sphere_arrays, compute_K_dipoles, currents_from_K
+
+"""
+Approximation hiérarchique du champ lointain (type Barnes-Hut).
+
+Les sphères sont rangées dans un quadtree du plan XY. Vu du capteur, un groupe
+de sphères lointain (taille du nœud < θ·distance) est remplacé par deux sources
+agrégées : une pour les conducteurs (s > 0) et une pour les isolants (s < 0),
+chacune d'intensité Σs placée au barycentre pondéré par s. Les signes étant
+séparés, le terme d'ordre 1 du développement s'annule et l'erreur relative de
+chaque nœud accepté est d'ordre θ². Les nœuds proches sont ouverts, jusqu'aux
+feuilles dont les sphères sont sommées exactement.
+
+Le parcours est vectorisé niveau par niveau : son coût est proportionnel au
+nombre de nœuds ouverts, soit O(log N) pour θ fixé.
+"""
+
+# Distance maximale entre le centre du capteur et une électrode [m]
+ELECTRODE_SPAN = np.sqrt(X_ELECTRODES**2 + Y_ELECTRODES**2 + Z_ELECTRODES**2).max()
+
+class FarFieldTree:
+    """Quadtree des sphères avec sources agrégées par nœud
+
+    Attributes:
+        positions: Positions des sphères, triées par feuille (N, 3)
+        strengths: Intensités de polarisation s = χa³ (N,)
+        leaf_size: Nombre maximal de sphères par feuille
+    """
+    def __init__(self, positions, strengths, leaf_size=16):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        strengths = np.asarray(strengths, dtype=float)
+        self.leaf_size = leaf_size
+
+        order = np.arange(len(strengths))
+        nodes = []  # [start, end, center, size, children]
+        self._build(positions, order, 0, len(order), nodes)
+
+        self.positions = positions[order]
+        self.strengths = strengths[order]
+        self._flatten(nodes)
+
+    @classmethod
+    def from_spheres(cls, spheres, leaf_size=16):
+        """Construit l'arbre à partir d'une liste de sphères"""
+        positions, radii, chis = sphere_arrays(spheres)
+        return cls(positions, chis * radii**3, leaf_size)
+
+    def _build(self, positions, order, start, end, nodes):
+        """Découpe récursive de order[start:end] en quadrants (en place)"""
+        node = len(nodes)
+        xy = positions[order[start:end], :2]
+        lo = xy.min(axis=0) if end > start else np.zeros(2)
+        hi = xy.max(axis=0) if end > start else np.zeros(2)
+        size = (hi - lo).max()
+        nodes.append([start, end, (lo + hi) / 2, size, []])
+
+        if end - start <= self.leaf_size or size == 0:
+            return node
+
+        mid = (lo + hi) / 2
+        quadrant = (xy[:, 0] > mid[0]) * 2 + (xy[:, 1] > mid[1])
+        sort = np.argsort(quadrant, kind='stable')
+        order[start:end] = order[start:end][sort]
+        bounds = start + np.searchsorted(quadrant[sort], np.arange(5))
+        for q in range(4):
+            if bounds[q+1] > bounds[q]:
+                nodes[node][4].append(self._build(positions, order, bounds[q], bounds[q+1], nodes))
+        return node
+
+    def _flatten(self, nodes):
+        """Tableaux par nœud : plages, tailles, enfants et sources agrégées"""
+        n = len(nodes)
+        self.start = np.array([node[0] for node in nodes], dtype=np.int64)
+        self.end = np.array([node[1] for node in nodes], dtype=np.int64)
+        self.center = np.array([node[2] for node in nodes]).reshape(n, 2)
+        self.size = np.array([node[3] for node in nodes])
+        self.children = np.full((n, 4), -1, dtype=np.int64)
+        for i, node in enumerate(nodes):
+            self.children[i, :len(node[4])] = node[4]
+        self.is_leaf = self.children[:, 0] < 0
+
+        # Sommes cumulées pour agréger chaque plage en O(1)
+        pos = np.clip(self.strengths, 0, None)
+        neg = np.clip(self.strengths, None, 0)
+        def cumsum(a):
+            return np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+        S_pos, S_neg = cumsum(pos), cumsum(neg)
+        M_pos = cumsum(pos[:, None] * self.positions)
+        M_neg = cumsum(neg[:, None] * self.positions)
+
+        self.s_pos = S_pos[self.end] - S_pos[self.start]
+        self.s_neg = S_neg[self.end] - S_neg[self.start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.c_pos = (M_pos[self.end] - M_pos[self.start]) / self.s_pos[:, None]
+            self.c_neg = (M_neg[self.end] - M_neg[self.start]) / self.s_neg[:, None]
+        self.c_pos[self.s_pos == 0] = 0
+        self.c_neg[self.s_neg == 0] = 0
+
+    def sources(self, sensor_position, opening_angle=0.5):
+        """Sources (positions, intensités) vues depuis sensor_position
+
+        Un nœud est accepté si size < θ·(d - ℓ), avec d la distance (dans le
+        plan XY) du capteur au centre du nœud et ℓ l'envergure des électrodes.
+        """
+        sensor_position = np.asarray(sensor_position, dtype=float)
+        if len(self.strengths) == 0:
+            return np.zeros((0, 3)), np.zeros(0)
+
+        accepted = []
+        leaves = []
+        frontier = np.array([0])
+        while frontier.size:
+            d = np.linalg.norm(self.center[frontier] - sensor_position[:2], axis=-1) - ELECTRODE_SPAN
+            accept = (d > 0) & (self.size[frontier] < opening_angle * d)
+            accepted.append(frontier[accept])
+            opened = frontier[~accept]
+            leaves.append(opened[self.is_leaf[opened]])
+            frontier = self.children[opened[~self.is_leaf[opened]]].ravel()
+            frontier = frontier[frontier >= 0]
+
+        accepted = np.concatenate(accepted)
+        leaves = np.concatenate(leaves)
+
+        # Sphères des feuilles ouvertes (concaténation des plages)
+        counts = self.end[leaves] - self.start[leaves]
+        total = counts.sum()
+        exact = np.repeat(self.start[leaves] - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+        positions = np.concatenate([self.c_pos[accepted], self.c_neg[accepted], self.positions[exact]])
+        strengths = np.concatenate([self.s_pos[accepted], self.s_neg[accepted], self.strengths[exact]])
+        keep = strengths != 0
+        return positions[keep], strengths[keep]
+
+    def compute_electric_sense(self, sensor_position, sensor_orientation, opening_angle=0.5):
+        """(I_ax, I_lat, I_vert) approchés ; θ = 0 redonne le calcul exact"""
+        positions, strengths = self.sources(sensor_position, opening_angle)
+        K_total = compute_K_dipoles(positions, strengths, sensor_position, sensor_orientation)
+        return currents_from_K(K_total)
+
+    def error(self, sensor_position, sensor_orientation, opening_angle=0.5):
+        """Écart |approché - exact| sur (I_ax, I_lat, I_vert) pour une pose"""
+        approx = self.compute_electric_sense(sensor_position, sensor_orientation, opening_angle)
+        K_total = compute_K_dipoles(self.positions, self.strengths, sensor_position, sensor_orientation)
+        return np.abs(np.array(approx) - np.array(currents_from_K(K_total)))
+
+    def sense(self, opening_angle=0.5):
+        """Fonction de perception pour simulate_behavior(sense=...)
+
+        L'arbre doit avoir été construit sur la scène simulée : l'argument
+        spheres de la fonction renvoyée est ignoré.
+        """
+        def sense(spheres, sensor_position, sensor_orientation):
+            return self.compute_electric_sense(sensor_position, sensor_orientation, opening_angle)
+        return sense
+
+def compute_electric_sense_far_field(spheres, sensor_position, sensor_orientation, opening_angle=0.5):
+    """Remplace compute_electric_sense par l'approximation de champ lointain
+
+    Pour une Scene, l'arbre est mis en cache et reconstruit seulement après
+    une modification ; pour une liste, il est reconstruit à chaque appel.
+    """
+    if hasattr(spheres, 'far_field_tree'):
+        tree = spheres.far_field_tree()
+    else:
+        tree = FarFieldTree.from_spheres(spheres)
+    return tree.compute_electric_sense(sensor_position, sensor_orientation, opening_angle)
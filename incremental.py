@@ -0,0 +1,157 @@
+# incremental.py
+import numpy as np
+from constants import GAMMA
+from electric_sense import sphere_arrays, electrode_positions, currents_from_K, readout_dipoles
+
+"""
+Perception incrémentale pour les scènes dont quelques objets bougent.
+
+Pour une pose du capteur fixée, K_total = Σn Kn est une somme de
+contributions indépendantes. IncrementalSense garde les Kn (N, 5, 5) et
+K_total ; quand des objets bougent ou changent, seules leurs contributions
+sont recalculées et K_total est corrigé de la différence. Le coût d'un pas
+est proportionnel au nombre d'objets modifiés, plus une comparaison des
+tableaux de la scène si les modifications ne sont pas signalées par update.
+
+Les additions et soustractions successives accumulent des erreurs d'arrondi :
+K_total est resommé exactement à partir des Kn tous les `resync_every`
+objets mis à jour. Les Kn dépendent de la pose du capteur : après un
+changement de pose, les courants sont calculés directement (lecture directe,
+electric_sense.readout_dipoles) et les Kn ne sont recalculés que si la pose
+reste la même à l'appel suivant.
+"""
+
+def sphere_contributions(positions, strengths, electrodes):
+    """Matrices Kn (N, 5, 5) de chaque sphère pour des électrodes (5, 3)"""
+    r = electrodes[None, :, :] - positions[:, None, :]
+    r_norm = np.sqrt(np.einsum('nai,nai->na', r, r))
+    F = r / r_norm[:, :, None]**3
+    return np.einsum('n,nai,nbi->nab', strengths, F, F) / (4*np.pi*GAMMA)
+
+class IncrementalSense:
+    """État de perception incrémental d'une scène pour une pose du capteur
+
+    Le coût proportionnel aux seuls objets modifiés ne vaut que pour un
+    capteur fixe. Quand la pose change à chaque appel (robot en boucle
+    fermée), chaque appel coûte une lecture directe de toute la scène, comme
+    compute_electric_sense : les contributions ne sont alors pas tenues à
+    jour, et sont recalculées (une passe sur les N objets) au premier appel
+    qui retrouve la même pose que le précédent. La détection des objets
+    modifiés (sync) ne relit que les indices journalisés par Scene.update ;
+    pour une liste de Sphere ou après un ajout/retrait, elle compare tous les
+    objets.
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere), copiée
+        sensor_position: Position du capteur [x,y,z]
+        sensor_orientation: Orientation du capteur [rad]
+        resync_every: Nombre d'objets mis à jour entre deux resommations
+                      exactes de K_total
+    """
+    def __init__(self, spheres, sensor_position=(0, 0, 0), sensor_orientation=0.0, resync_every=1000):
+        self.resync_every = resync_every
+        self.sensor_position = np.array(sensor_position, dtype=float)
+        self.sensor_orientation = float(sensor_orientation)
+        self._load(spheres)
+
+    def _load(self, spheres):
+        positions, radii, chis = sphere_arrays(spheres)
+        self.positions = np.array(positions, dtype=float)
+        self.radii = np.array(radii, dtype=float)
+        self.chis = np.array(chis, dtype=float)
+        self._version = getattr(spheres, 'version', None)
+        self.rebuild()
+
+    def rebuild(self):
+        """Recalcule toutes les contributions pour la pose courante"""
+        self.electrodes = electrode_positions(self.sensor_position, self.sensor_orientation)
+        self.contributions = sphere_contributions(self.positions, self.chis * self.radii**3,
+                                                  self.electrodes)
+        self.stale = False
+        self.resync()
+
+    def resync(self):
+        """Resommation exacte de K_total à partir des contributions"""
+        self.K_total = self.contributions.sum(axis=0)
+        self._pending = 0
+
+    def update(self, index, position=None, radius=None, chi=None):
+        """Modifie un ou plusieurs objets (index entier ou tableau d'indices)"""
+        index = np.atleast_1d(index)
+        if position is not None:
+            self.positions[index] = position
+        if radius is not None:
+            self.radii[index] = radius
+        if chi is not None:
+            self.chis[index] = chi
+        if self.stale:
+            return
+        new = sphere_contributions(self.positions[index], self.chis[index] * self.radii[index]**3,
+                                   self.electrodes)
+        self.K_total += new.sum(axis=0) - self.contributions[index].sum(axis=0)
+        self.contributions[index] = new
+        self._pending += len(index)
+        if self._pending >= self.resync_every:
+            self.resync()
+
+    def set_pose(self, sensor_position, sensor_orientation):
+        """Change la pose du capteur
+
+        Une nouvelle pose rend les contributions périmées (stale) sans les
+        recalculer ; elles sont recalculées si la même pose est redemandée.
+        """
+        sensor_position = np.asarray(sensor_position, dtype=float)
+        if (np.array_equal(sensor_position, self.sensor_position)
+                and sensor_orientation == self.sensor_orientation):
+            if self.stale:
+                self.rebuild()
+            return
+        self.sensor_position = sensor_position.copy()
+        self.sensor_orientation = float(sensor_orientation)
+        self.stale = True
+
+    def sync(self, spheres):
+        """Met à jour l'état d'après la scène : seuls les objets modifiés
+
+        Une Scene dont le compteur `version` n'a pas changé n'est pas relue.
+        Un changement du nombre d'objets recharge toute la scène.
+
+        Returns:
+            Indices des objets mis à jour
+        """
+        version = getattr(spheres, 'version', None)
+        if version is not None and version == self._version:
+            return np.zeros(0, dtype=int)
+        positions, radii, chis = sphere_arrays(spheres)
+        if len(radii) != len(self.radii):
+            self._load(spheres)
+            return np.arange(len(radii))
+        candidates = spheres.changed_since(self._version) if hasattr(spheres, 'changed_since') else None
+        if candidates is None:
+            changed = np.flatnonzero(np.any(positions != self.positions, axis=1)
+                                     | (radii != self.radii) | (chis != self.chis))
+        else:
+            changed = candidates
+        if len(changed):
+            self.update(changed, positions[changed], radii[changed], chis[changed])
+        self._version = version
+        return changed
+
+    def currents(self):
+        """(I_ax, I_lat, I_vert) pour l'état courant"""
+        if self.stale:
+            return readout_dipoles(self.positions, self.chis * self.radii**3,
+                                   self.sensor_position, self.sensor_orientation)
+        return currents_from_K(self.K_total)
+
+    def compute_electric_sense(self, spheres, sensor_position, sensor_orientation):
+        """Même signature que compute_electric_sense (argument sense=)
+
+        Les objets modifiés depuis l'appel précédent sont détectés (sync) ;
+        spheres=None utilise l'état tel quel (modifications signalées par
+        update).
+        """
+        self.set_pose(sensor_position, sensor_orientation)
+        if spheres is not None:
+            self.sync(spheres)
+        return self.currents()
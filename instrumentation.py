@@ -0,0 +1,126 @@
+# instrumentation.py
+import json
+from time import perf_counter
+
+"""
+Instrumentation des simulations : temps par phase, compteurs et crochets
+appelés à chaque pas.
+
+La boucle de simulation appelle start() puis lap(phase) à la fin de chaque
+phase : le temps écoulé depuis le dernier repère est attribué à la phase.
+Sans instrumentation, la boucle utilise NULL_INSTRUMENTATION, dont les
+méthodes ne font rien (quelques appels vides par pas).
+
+Les résumés (summary) sont des dictionnaires sérialisables en JSON ; ceux
+de plusieurs simulations ou de plusieurs processus s'additionnent avec merge.
+"""
+
+PHASES = ('collision', 'sense', 'control', 'integration', 'record', 'render', 'overhead')
+COUNTERS = ('runs', 'steps', 'sense_calls', 'spheres_evaluated', 'collisions', 'out_of_bounds')
+
+class Instrumentation:
+    """Temps par phase et compteurs, cumulés sur une ou plusieurs simulations
+
+    Les crochets sont appelés à chaque pas avec un dictionnaire d'état :
+    'time', 'x', 'y', 'theta', 'I_ax', 'I_lat', 'I_vert', 'v', 'w' (tableaux
+    (M,) des robots actifs pour simulate_ensemble, plus 'robots', leurs
+    indices).
+
+    Args:
+        hooks: Fonctions hook(state) appelées à chaque pas
+    """
+    enabled = True
+
+    def __init__(self, hooks=None):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.hooks = list(hooks or [])
+        self._last = perf_counter()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    # Appels depuis les boucles de simulation
+    def start(self):
+        self._last = perf_counter()
+
+    def lap(self, phase):
+        """Attribue à `phase` le temps écoulé depuis le dernier repère"""
+        now = perf_counter()
+        self.times[phase] += now - self._last
+        self._last = now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def step(self, state):
+        for hook in self.hooks:
+            hook(state)
+
+    def end_run(self, collision=0, out_of_bounds=0, runs=1):
+        """Fin d'une simulation (ou d'un ensemble de `runs` robots)"""
+        self.counters['runs'] += runs
+        self.counters['collisions'] += int(collision)
+        self.counters['out_of_bounds'] += int(out_of_bounds)
+
+    # Résumés
+    def summary(self):
+        """Temps par phase (total et fraction), compteurs et moyennes par pas"""
+        total = sum(self.times.values())
+        steps = self.counters['steps']
+        return {
+            'times': dict(self.times),
+            'fractions': {k: (v / total if total else 0.0) for k, v in self.times.items()},
+            'total_time': total,
+            'counters': dict(self.counters),
+            'time_per_step': total / steps if steps else None,
+            'spheres_per_step': self.counters['spheres_evaluated'] / steps if steps else None
+        }
+
+    def merge(self, other):
+        """Ajoute une autre Instrumentation (ou son résumé) à celle-ci"""
+        summary = other.summary() if isinstance(other, Instrumentation) else other
+        for k, v in summary['times'].items():
+            self.times[k] = self.times.get(k, 0.0) + v
+        for k, v in summary['counters'].items():
+            self.counters[k] = self.counters.get(k, 0) + v
+        return self
+
+    def save(self, path):
+        """Enregistre le résumé (JSON)"""
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=1)
+
+    def report(self):
+        """Résumé lisible : une ligne par phase, puis les compteurs"""
+        summary = self.summary()
+        lines = [f"{phase:12s} {summary['times'][phase]:9.3f} s  {100*summary['fractions'][phase]:5.1f} %"
+                 for phase in self.times if summary['times'][phase]]
+        lines += [f"{name:18s} {value}" for name, value in summary['counters'].items()]
+        if summary['time_per_step'] is not None:
+            lines.append(f"{'time_per_step':18s} {summary['time_per_step']*1e6:.1f} µs")
+            lines.append(f"{'spheres_per_step':18s} {summary['spheres_per_step']:.1f}")
+        return '\n'.join(lines)
+
+class NullInstrumentation:
+    """Instrumentation désactivée : toutes les méthodes sont vides"""
+    enabled = False
+    hooks = ()
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def step(self, state):
+        pass
+
+    def end_run(self, collision=0, out_of_bounds=0, runs=1):
+        pass
+
+NULL_INSTRUMENTATION = NullInstrumentation()
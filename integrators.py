@@ -0,0 +1,197 @@
+# integrators.py
+import numpy as np
+from constants import SIMULATION_TIME, DT
+from electric_sense import compute_electric_sense, sphere_arrays
+
+"""
+Intégrateurs à pas adaptatif pour la simulation du robot.
+
+L'état est (x, y, θ) avec ẋ = v·cos θ, ẏ = v·sin θ, θ̇ = ω, où (v, ω) est la
+commande calculée à partir de la perception. Chaque évaluation de la dérivée
+coûte un appel à la fonction de perception.
+
+Les méthodes de Runge-Kutta emboîtées (Bogacki-Shampine 3(2), Dormand-Prince
+5(4)) estiment l'erreur locale à chaque pas et adaptent le pas pour la garder
+sous atol + rtol·|y| : petits pas près des objets où ω varie vite, grands pas
+loin des objets. Les deux méthodes réutilisent la dernière évaluation d'un pas
+comme première du suivant (FSAL).
+
+Les collisions et sorties de scène sont des événements g(t) = 0 sur des
+fonctions de la position seule (sans perception) : on les détecte sur
+l'interpolant d'Hermite cubique de chaque pas, puis on localise l'instant
+par dichotomie.
+"""
+
+# Tableaux de Butcher : (c, A, b d'ordre haut, b d'ordre bas, ordre)
+TABLEAUS = {
+    'rk23': (
+        np.array([0, 1/2, 3/4, 1]),
+        np.array([[0, 0, 0],
+                  [1/2, 0, 0],
+                  [0, 3/4, 0],
+                  [2/9, 1/3, 4/9]]),
+        np.array([2/9, 1/3, 4/9, 0]),
+        np.array([7/24, 1/4, 1/3, 1/8]),
+        3
+    ),
+    'rk45': (
+        np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1]),
+        np.array([[0, 0, 0, 0, 0, 0],
+                  [1/5, 0, 0, 0, 0, 0],
+                  [3/40, 9/40, 0, 0, 0, 0],
+                  [44/45, -56/15, 32/9, 0, 0, 0],
+                  [19372/6561, -25360/2187, 64448/6561, -212/729, 0, 0],
+                  [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656, 0],
+                  [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]]),
+        np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]),
+        np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40]),
+        5
+    )
+}
+
+def hermite(t0, y0, f0, t1, y1, f1, t):
+    """Interpolant d'Hermite cubique entre (t0, y0, f0) et (t1, y1, f1)"""
+    h = t1 - t0
+    s = (t - t0) / h
+    h00 = 2*s**3 - 3*s**2 + 1
+    h10 = s**3 - 2*s**2 + s
+    h01 = -2*s**3 + 3*s**2
+    h11 = s**3 - s**2
+    return h00*y0 + h10*h*f0 + h01*y1 + h11*h*f1
+
+class AdaptiveIntegrator:
+    """Intégrateur de Runge-Kutta emboîté avec localisation d'événements
+
+    Args:
+        method: 'rk23' (Bogacki-Shampine) ou 'rk45' (Dormand-Prince)
+        rtol, atol: Tolérances relative et absolue sur l'erreur locale
+        first_step: Pas initial [s]
+        max_step: Pas maximal [s] (limite aussi le déplacement entre deux
+                  tests d'événement)
+        min_step: Pas minimal [s] : un pas de cette taille est accepté même
+                  si l'erreur dépasse la tolérance (ω = K·I_lat est
+                  singulier quand I_ax s'annule en B1/B2)
+        event_samples: Nombre de points de test des événements par pas
+        event_tol: Précision de la localisation des événements [s]
+    """
+    def __init__(self, method='rk23', rtol=1e-4, atol=1e-6, first_step=DT, max_step=1.0,
+                 min_step=1e-3, event_samples=4, event_tol=1e-9):
+        if method not in TABLEAUS:
+            raise ValueError(f"Méthode {method} non implémentée")
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self.first_step = first_step
+        self.max_step = max_step
+        self.min_step = min_step
+        self.event_samples = event_samples
+        self.event_tol = event_tol
+
+    def _step(self, f, t, y, f0, h):
+        """Un pas emboîté : (y_new, f_new, erreur normalisée)"""
+        c, A, b, b_low, _ = TABLEAUS[self.method]
+        k = np.empty((len(c), len(y)))
+        k[0] = f0
+        for i in range(1, len(c) - 1):
+            k[i] = f(y + h * A[i, :i] @ k[:i])
+        y_new = y + h * A[-1, :len(c)-1] @ k[:-1]
+        k[-1] = f(y_new)
+        error = h * (b - b_low) @ k
+        scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+        return y_new, k[-1], np.sqrt(np.mean((error / scale)**2))
+
+    def _locate(self, g, t0, y0, f0, t1, y1, f1):
+        """Premier instant de [t0, t1] où g(y) devient négatif, ou None"""
+        ts = np.linspace(t0, t1, self.event_samples + 2)[1:]
+        previous = t0
+        for ts_i in ts:
+            if g(hermite(t0, y0, f0, t1, y1, f1, ts_i)) < 0:
+                a, b = previous, ts_i
+                while b - a > self.event_tol:
+                    mid = (a + b) / 2
+                    if g(hermite(t0, y0, f0, t1, y1, f1, mid)) < 0:
+                        b = mid
+                    else:
+                        a = mid
+                return b
+            previous = ts_i
+        return None
+
+    def simulate(self, behavior, spheres, simulation_time=SIMULATION_TIME,
+                 sense=compute_electric_sense, recorder=None, bounds=2.5, collision_margin=0.05):
+        """Équivalent de simulation.simulate_behavior à pas adaptatif
+
+        Returns:
+            Historique au format de simulate_behavior, avec en plus
+            'n_sense' (nombre d'appels à la perception), 'n_steps' (nombre
+            de pas acceptés, y compris celui tronqué à l'événement) et
+            'event_time' (instant de collision ou de sortie, None sinon).
+            Les courants et commandes enregistrés sont ceux évalués à chaque
+            pose enregistrée.
+        """
+        from recorder import TrajectoryRecorder
+        positions, radii, _ = sphere_arrays(spheres)
+        positions = np.asarray(positions)[:, :2]
+        radii = np.asarray(radii)
+
+        def g_collision(y):
+            d = np.sqrt(np.sum((positions - y[:2])**2, axis=-1)) - radii - collision_margin
+            return d.min() if len(d) else np.inf
+
+        def g_out_of_bounds(y):
+            return bounds - max(abs(y[0]), abs(y[1]))
+
+        measured = {}
+        n_sense = [0]
+
+        def f(y):
+            n_sense[0] += 1
+            I_ax, I_lat, I_vert = sense(spheres, np.array([y[0], y[1], 0]), y[2])
+            v, w = behavior.compute_command(I_ax, I_lat)
+            measured['sense'], measured['command'] = (I_ax, I_lat, I_vert), (v, w)
+            return np.array([v * np.cos(y[2]), v * np.sin(y[2]), w])
+
+        if recorder is None:
+            recorder = TrajectoryRecorder(1)
+        t = 0.0
+        y = np.zeros(3)
+        collision = g_collision(y) < 0
+        out_of_bounds = not collision and g_out_of_bounds(y) < 0
+        event_time = 0.0 if collision or out_of_bounds else None
+        recorder.record(t, *y)
+
+        order = TABLEAUS[self.method][4]
+        h = min(self.first_step, self.max_step)
+        f0 = f(y) if event_time is None else None
+        n_steps = 0
+        while event_time is None and simulation_time - t > self.event_tol:
+            h = min(h, simulation_time - t)
+            y_new, f_new, error = self._step(f, t, y, f0, h)
+            factor = 0.9 * error**(-1/order) if error > 0 else 5.0
+            if error > 1 and h > self.min_step:
+                h = max(h * max(0.2, factor), self.min_step)
+                continue
+
+            # Événements sur le pas accepté
+            n_steps += 1
+            for g, kind in ((g_collision, 'collision'), (g_out_of_bounds, 'out_of_bounds')):
+                t_event = self._locate(g, t, y, f0, t + h, y_new, f_new)
+                if t_event is not None and (event_time is None or t_event < event_time):
+                    event_time, event_kind = t_event, kind
+            if event_time is not None:
+                y_event = hermite(t, y, f0, t + h, y_new, f_new, event_time)
+                recorder.record(event_time, *y_event)
+                collision = event_kind == 'collision'
+                out_of_bounds = event_kind == 'out_of_bounds'
+                break
+
+            t, y, f0 = t + h, y_new, f_new
+            recorder.record(t, *y, sense=measured['sense'], command=measured['command'])
+            h = min(max(h * min(5.0, factor), self.min_step), self.max_step)
+
+        recorder.finish(collision=collision, out_of_bounds=out_of_bounds)
+        history = recorder.history(0)
+        history['n_sense'] = n_sense[0]
+        history['n_steps'] = n_steps
+        history['event_time'] = event_time
+        return history
@@ -0,0 +1,197 @@
+# kernels.py
+import importlib.util
+import numpy as np
+from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES, SIMULATION_TIME, DT
+from electric_sense import sphere_arrays, READOUT_W, READOUT_A
+from ensemble import simulate_ensemble
+
+"""
+Noyau compilé (Numba) fusionnant perception, commande et intégration.
+
+Pour chaque robot d'un ensemble, le noyau enchaîne tous les pas sans
+repasser par Python : test de collision et de sortie, courants par lecture
+directe (voir electric_sense.readout_dipoles), loi de commande des 4
+comportements et pas d'Euler. Les seules allocations sont faites une fois
+par robot ; les poses sont écrites dans des tableaux préalloués.
+
+Numba n'est importé qu'à la première compilation (l'import seul coûte
+plusieurs centaines de ms au démarrage d'un processus), et la compilation est
+mise en cache sur disque (numba cache=True) : seul le premier lancement paie
+la compilation. Sans Numba, simulate_fused se replie sur
+ensemble.simulate_ensemble (NumPy, mêmes équations et même format de
+sortie).
+
+Les résultats des deux chemins ne diffèrent que par l'ordre des sommes
+(arrondis) ; comme entre deux compositions d'ensemble différentes, ces
+écarts peuvent s'amplifier sur les trajectoires sensibles (I_ax proche de 0
+pour les comportements répulsifs) et changer l'issue d'une simulation.
+"""
+
+HAVE_NUMBA = importlib.util.find_spec('numba') is not None
+numba = None  # Importé par fused_kernel
+
+def _fused_steps(positions, strengths, radii, offsets, scene_index, behavior_types, k_gains,
+                 forward_speeds, n_steps, dt, bounds, collision_margin, electrodes, weights, readout,
+                 x_out, y_out, theta_out, lengths, collision, out_of_bounds):
+    """Simule tous les pas de chaque robot (compilé par Numba)"""
+    epsilon = 1e-10  # Même seuil que compute_command
+    for m in numba.prange(len(scene_index)):
+        start, end = offsets[scene_index[m]], offsets[scene_index[m] + 1]
+        bt = behavior_types[m]
+        x, y, theta = 0.0, 0.0, 0.0
+        # Tampons du robot, réutilisés à chaque pas
+        e = np.empty((5, 3))
+        r = np.empty((5, 3))
+        inv_r3 = np.empty(5)
+        v_acc = np.empty(5)
+        lengths[m] = n_steps + 1
+        for k in range(n_steps):
+            # Vérification de collision et de sortie
+            hit = False
+            for n in range(start, end):
+                dx = x - positions[n, 0]
+                dy = y - positions[n, 1]
+                if np.sqrt(dx*dx + dy*dy) < radii[n] + collision_margin:
+                    hit = True
+                    break
+            if hit:
+                collision[m] = True
+                lengths[m] = k + 1
+                break
+            if abs(x) > bounds or abs(y) > bounds:
+                out_of_bounds[m] = True
+                lengths[m] = k + 1
+                break
+
+            # Courants : vα = Σn sn·Fnα·un, un = Σβ wβ·Fnβ, I = -A·v
+            c, s = np.cos(theta), np.sin(theta)
+            for a in range(5):
+                e[a, 0] = x + c * electrodes[a, 0] - s * electrodes[a, 1]
+                e[a, 1] = y + s * electrodes[a, 0] + c * electrodes[a, 1]
+                e[a, 2] = electrodes[a, 2]
+                v_acc[a] = 0.0
+            for n in range(start, end):
+                ux, uy, uz = 0.0, 0.0, 0.0
+                for a in range(5):
+                    r[a, 0] = e[a, 0] - positions[n, 0]
+                    r[a, 1] = e[a, 1] - positions[n, 1]
+                    r[a, 2] = e[a, 2] - positions[n, 2]
+                    r2 = r[a, 0]*r[a, 0] + r[a, 1]*r[a, 1] + r[a, 2]*r[a, 2]
+                    inv_r3[a] = 1.0 / (r2 * np.sqrt(r2))
+                    ux += weights[a] * inv_r3[a] * r[a, 0]
+                    uy += weights[a] * inv_r3[a] * r[a, 1]
+                    uz += weights[a] * inv_r3[a] * r[a, 2]
+                for a in range(5):
+                    v_acc[a] += strengths[n] * inv_r3[a] * (r[a, 0]*ux + r[a, 1]*uy + r[a, 2]*uz)
+            I_ax, I_lat = 0.0, 0.0
+            for a in range(5):
+                I_ax -= readout[0, a] * v_acc[a]
+                I_lat -= readout[1, a] * v_acc[a]
+
+            # Commande (lois B1 à B4 de ElectricBehavior.compute_command)
+            if abs(I_ax) > epsilon:
+                if bt == 1:
+                    K = k_gains[m] / (I_ax + epsilon)
+                elif bt == 2:
+                    K = -k_gains[m] / (I_ax + epsilon)
+                elif bt == 3:
+                    K = k_gains[m] / abs(I_ax)
+                else:
+                    K = -k_gains[m] / abs(I_ax)
+            else:
+                K = 0.0
+            w = K * I_lat
+            v = forward_speeds[m]
+
+            # Intégration (Euler)
+            theta += w * dt
+            x += v * np.cos(theta) * dt
+            y += v * np.sin(theta) * dt
+            x_out[k + 1, m] = x
+            y_out[k + 1, m] = y
+            theta_out[k + 1, m] = theta
+
+_KERNELS = {}
+
+def fused_kernel(parallel=False):
+    """Noyau compilé (compilation paresseuse, en cache sur disque)"""
+    if not HAVE_NUMBA:
+        raise ImportError("Le noyau compilé nécessite numba")
+    if parallel not in _KERNELS:
+        global numba
+        import numba
+        _KERNELS[parallel] = numba.njit(cache=True, parallel=parallel)(_fused_steps)
+    return _KERNELS[parallel]
+
+def step_times(simulation_time, dt):
+    """Instants enregistrés par simulate_ensemble : 0 puis le début de chaque pas"""
+    times = [0.0]
+    t = 0
+    while t < simulation_time:
+        times.append(t)
+        t += dt
+    return np.array(times)
+
+def simulate_fused(behaviors, scenes, simulation_time=SIMULATION_TIME, dt=DT, bounds=2.5,
+                   collision_margin=0.05, parallel=False, backend=None):
+    """Simule M robots avec le noyau fusionné (même interface que simulate_ensemble)
+
+    Seules les poses sont enregistrées (pas de courants, commandes,
+    recorder ni instrumentation).
+
+    Args:
+        behaviors: Liste de M ElectricBehavior
+        scenes: Liste de M scènes (une même scène peut être partagée)
+        parallel: Répartit les robots sur les cœurs (numba parallel=True)
+        backend: 'numba', 'numpy' ou None (numba s'il est installé)
+
+    Returns:
+        Liste de M historiques au format de simulate_behavior
+    """
+    backend = backend or ('numba' if HAVE_NUMBA else 'numpy')
+    if backend == 'numpy':
+        return simulate_ensemble(behaviors, scenes, simulation_time, dt, bounds, collision_margin)
+    M = len(behaviors)
+    if len(scenes) != M:
+        raise ValueError("Il faut une scène par robot")
+    behavior_types = np.array([b.behavior_type for b in behaviors], dtype=np.int64)
+    unknown = ~np.isin(behavior_types, [1, 2, 3, 4])
+    if unknown.any():
+        raise ValueError(f"Comportement {behavior_types[unknown][0]} non implémenté")
+
+    # Scènes uniques, concaténées : scène i = offsets[i]:offsets[i+1]
+    scene_ids = {}
+    parts = []
+    scene_index = np.empty(M, dtype=np.int64)
+    for m, scene in enumerate(scenes):
+        if id(scene) not in scene_ids:
+            scene_ids[id(scene)] = len(parts)
+            parts.append(sphere_arrays(scene))
+        scene_index[m] = scene_ids[id(scene)]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for _, r, _ in parts])
+    positions = np.ascontiguousarray(np.concatenate([p for p, _, _ in parts]).reshape(-1, 3), dtype=float)
+    radii = np.concatenate([r for _, r, _ in parts]).astype(float)
+    strengths = np.concatenate([c for _, _, c in parts]).astype(float) * radii**3
+
+    times = step_times(simulation_time, dt)
+    n_steps = len(times) - 1
+    x_out = np.zeros((n_steps + 1, M))
+    y_out = np.zeros((n_steps + 1, M))
+    theta_out = np.zeros((n_steps + 1, M))
+    lengths = np.zeros(M, dtype=np.int64)
+    collision = np.zeros(M, dtype=np.bool_)
+    out_of_bounds = np.zeros(M, dtype=np.bool_)
+    electrodes = np.column_stack([X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES]).astype(float)
+
+    fused_kernel(parallel)(
+        positions, strengths, radii, offsets, scene_index, behavior_types,
+        np.array([b.k_gain for b in behaviors], dtype=float),
+        np.array([b.forward_speed for b in behaviors], dtype=float),
+        n_steps, float(dt), float(bounds), float(collision_margin), electrodes,
+        np.ascontiguousarray(READOUT_W, dtype=float), np.ascontiguousarray(READOUT_A, dtype=float),
+        x_out, y_out, theta_out, lengths, collision, out_of_bounds)
+
+    return [{'time': times[:n], 'x': x_out[:n, m], 'y': y_out[:n, m], 'theta': theta_out[:n, m],
+             'collision': bool(collision[m]), 'out_of_bounds': bool(out_of_bounds[m])}
+            for m, n in enumerate(lengths)]
@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
 
 """
 Simulation d'un capteur électrique capacitif et de sa réponse à des objets perturbateurs.
@@ -16,7 +14,24 @@ Principes physiques :
 """
 
 class ElectricSensor:
-    def __init__(self, objects, params=None):
+    """Capteur au centre d'une grille carrée et objets perturbateurs
+
+    Les champs sont évalués sur la grille par blocs de points (chunk_size
+    points × objets au plus par bloc), ce qui borne la mémoire de travail
+    pour les grilles fines (2000×2000 et plus). E0 ne dépend pas des objets :
+    il est mis en cache et réutilisé quand seuls les objets changent.
+
+    Args:
+        objects: Liste de [x, y, is_conductor]
+        params: Paramètres physiques (remplacent ceux par défaut)
+        n: Nombre de points de la grille par côté
+        extent: Demi-largeur de la grille [m]
+        chunk_size: Nombre maximal de couples (point, objet) par bloc
+    """
+    # Rayon d'exclusion autour des singularités des champs [m]
+    r_min = 0.3
+
+    def __init__(self, objects, params=None, n=50, extent=2.0, chunk_size=2**20):
         # Paramètres physiques par défaut
         self.params = {
             'gamma': 1.0,     # conductivité du milieu (S/m)
@@ -33,12 +48,41 @@ class ElectricSensor:
         self.I = self.params['C0'] * self.params['U']
         self.objects = objects
         self.capteur_pos = np.array([0, 0])
+        self.chunk_size = chunk_size
+        self._E0_cache = {}
         
         # Grille de calcul
-        self.n = 50
-        x = np.linspace(-2, 2, self.n)
-        y = np.linspace(-2, 2, self.n)
-        self.X, self.Y = np.meshgrid(x, y)
+        self.set_grid(n, extent)
+
+    def set_grid(self, n, extent=2.0):
+        """Change la résolution (n×n points) et l'étendue de la grille"""
+        self.n = n
+        self.extent = extent
+        self.x = np.linspace(-extent, extent, n)
+        self.y = np.linspace(-extent, extent, n)
+
+    @property
+    def X(self):
+        return np.broadcast_to(self.x, (self.n, self.n))
+
+    @property
+    def Y(self):
+        return np.broadcast_to(self.y[:, None], (self.n, self.n))
+
+    def _object_arrays(self, objects=None):
+        """Positions (M, 2) et moments dipolaires induits P = χa³E0 (M, 2)"""
+        objects = list(self.objects if objects is None else objects)
+        if not objects:
+            return np.zeros((0, 2)), np.zeros((0, 2))
+        pos = np.array([obj[:2] for obj in objects], dtype=float)
+        # Contraste selon la nature de chaque objet
+        chi = np.where([bool(obj[2]) for obj in objects],
+                       self.params['chi_cond'], self.params['chi_isol'])
+        # E0 à la position des objets
+        r = pos - self.capteur_pos
+        r_norm = np.sqrt(np.sum(r**2, axis=-1, keepdims=True))
+        E0_at_obj = self.I * r / (4*np.pi*self.params['gamma']*r_norm**3)
+        return pos, chi[:, None] * self.params['a']**3 * E0_at_obj
 
     def compute_E0(self, x, y):
         """Calcul du champ électrique initial E0 créé par le capteur.
@@ -46,14 +90,13 @@ class ElectricSensor:
         E0 suit la loi d'un dipôle électrique :
         E0(r) = I·r/(4πγr³) où r est le vecteur position depuis le capteur
         """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
         r = np.array([x - self.capteur_pos[0], y - self.capteur_pos[1]])
         r_norm = np.sqrt(r[0]**2 + r[1]**2)
-        E = np.zeros((2, x.shape[0], x.shape[1]))
         # Masque pour éviter la singularité au centre
-        mask = r_norm > 0.3
-        # Composantes du champ E0
-        E[0][mask] = self.I * r[0][mask] / (4*np.pi*self.params['gamma']*r_norm[mask]**3)
-        E[1][mask] = self.I * r[1][mask] / (4*np.pi*self.params['gamma']*r_norm[mask]**3)
+        mask = r_norm > self.r_min
+        with np.errstate(divide='ignore', invalid='ignore'):
+            E = np.where(mask, self.I * r / (4*np.pi*self.params['gamma']*r_norm**3), 0.0)
         return E
 
     def compute_E1(self, x, y, obj):
@@ -63,31 +106,59 @@ class ElectricSensor:
         2. Cette polarisation crée un champ dipôlaire :
            E1(r) = [3(P·r)r - r²P]/(4πγr⁵)
         """
-        pos = np.array(obj[:2])
-        # Contraste selon la nature de l'objet
-        chi = self.params['chi_cond'] if obj[2] else self.params['chi_isol']
-        
-        # Calcul de E0 à la position de l'objet
-        r_to_obj = pos - self.capteur_pos
-        r_norm_obj = np.sqrt(np.sum(r_to_obj**2))
-        E0_at_obj = self.I * r_to_obj / (4*np.pi*self.params['gamma']*r_norm_obj**3)
-        
-        # Moment dipolaire induit P = χa³E0
-        P = chi * self.params['a']**3 * E0_at_obj
-        
-        # Calcul du champ dipôlaire E1
-        r = np.array([x - pos[0], y - pos[1]])
-        r_norm = np.sqrt(r[0]**2 + r[1]**2)
-        E = np.zeros((2, x.shape[0], x.shape[1]))
-        mask = r_norm > 0.3
-        
-        # Produit scalaire P·r
-        P_dot_r = P[0]*r[0] + P[1]*r[1]
-        # Formule du champ dipôlaire
-        for i in range(2):
-            E[i][mask] = (3*P_dot_r[mask]*r[i][mask] - r_norm[mask]**2*P[i]) / \
-                         (4*np.pi*self.params['gamma']*r_norm[mask]**5)
-        return E
+        pos, P = self._object_arrays([obj])
+        return self._dipole_fields(x, y, pos, P)
+
+    def compute_E1_total(self, x, y):
+        """Somme des champs E1 de tous les objets, vectorisée sur les objets"""
+        pos, P = self._object_arrays()
+        return self._dipole_fields(x, y, pos, P)
+
+    def _dipole_fields(self, x, y, pos, P):
+        """Somme des champs dipôlaires (pos, P) aux points (x, y), par blocs"""
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        shape = x.shape
+        x, y = x.ravel(), y.ravel()
+        E = np.zeros((2, x.size))
+        step = max(1, self.chunk_size // max(len(pos), 1))
+        for start in range(0, x.size, step):
+            chunk = slice(start, start + step)
+            # r : (2, M, points du bloc)
+            r = np.array([x[None, chunk] - pos[:, 0, None], y[None, chunk] - pos[:, 1, None]])
+            r2 = r[0]**2 + r[1]**2
+            mask = r2 > self.r_min**2
+            # Produit scalaire P·r
+            P_dot_r = P[:, 0, None]*r[0] + P[:, 1, None]*r[1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                coef = np.where(mask, 1 / (4*np.pi*self.params['gamma']*r2**2.5), 0.0)
+            # Formule du champ dipôlaire, sommée sur les objets
+            E[:, chunk] = np.sum((3*P_dot_r*r - r2*P.T[:, :, None]) * coef, axis=1)
+        return E.reshape((2,) + shape)
+
+    def grid_E0(self):
+        """E0 sur la grille, mis en cache (indépendant des objets)"""
+        key = (self.n, self.extent, tuple(self.capteur_pos), self.I, self.params['gamma'])
+        if key not in self._E0_cache:
+            E0 = np.empty((2, self.n, self.n))
+            rows = max(1, self.chunk_size // self.n)
+            for start in range(0, self.n, rows):
+                E0[:, start:start + rows] = self.compute_E0(self.x[None, :], self.y[start:start + rows, None])
+            self._E0_cache = {key: E0}
+        return self._E0_cache[key]
+
+    def compute_fields(self):
+        """Champs (E0, E1_total, E_total) sur la grille, chacun (2, n, n)
+
+        E1 est évalué par blocs de lignes de la grille ; E0 vient du cache.
+        """
+        E0 = self.grid_E0()
+        pos, P = self._object_arrays()
+        E1 = np.empty((2, self.n, self.n))
+        rows = max(1, self.chunk_size // (self.n * max(len(pos), 1)))
+        for start in range(0, self.n, rows):
+            E1[:, start:start + rows] = self._dipole_fields(
+                self.x[None, :], self.y[start:start + rows, None], pos, P)
+        return E0, E1, E0 + E1
 
     def compute_delta_I(self, angle):
         """Calcul de la variation de courant ΔI pour une orientation donnée.
@@ -95,37 +166,30 @@ class ElectricSensor:
         ΔI est proportionnel au potentiel créé par E1 :
         ΔI = -C0·ΔV = -C0·∫E1·dl
         L'intégrale est évaluée le long de la direction du capteur.
+        angle peut être un tableau : ΔI est linéaire en la direction
+        (cos, sin), la somme sur les objets est faite une seule fois.
         """
-        direction = np.array([np.cos(angle), np.sin(angle)])
-        phi_total = 0
-        
-        for obj in self.objects:
-            pos = np.array(obj[:2])
-            chi = self.params['chi_cond'] if obj[2] else self.params['chi_isol']
-            r = pos - self.capteur_pos
-            r_norm = np.sqrt(np.sum(r**2))
-            # E0 à la position de l'objet
-            E0_at_obj = self.I * r / (4*np.pi*self.params['gamma']*r_norm**3)
-            # Polarisation induite
-            P = chi * self.params['a']**3 * E0_at_obj
-            # Contribution au potentiel
-            phi = np.sum(P * direction) / (4*np.pi*self.params['gamma']*r_norm**2)
-            phi_total += phi
-        
-        return -self.params['C0'] * phi_total
+        pos, P = self._object_arrays()
+        r = pos - self.capteur_pos
+        r_norm2 = np.sum(r**2, axis=-1, keepdims=True)
+        # Contribution au potentiel par unité de direction, sommée sur les objets
+        phi = np.sum(P / (4*np.pi*self.params['gamma']*r_norm2), axis=0)
+        angle = np.asarray(angle, dtype=float)
+        return -self.params['C0'] * (phi[0]*np.cos(angle) + phi[1]*np.sin(angle))
 
     def plot_fields(self):
         """Visualisation des champs et de la réponse du capteur"""
+        # matplotlib n'est chargé que pour le tracé
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Circle
         fig = plt.figure(figsize=(15, 10))
 
         # Calcul des champs
-        E0 = self.compute_E0(self.X, self.Y)
-        E1_total = sum(self.compute_E1(self.X, self.Y, obj) for obj in self.objects)
-        E_total = E0 + E1_total
+        E0, E1_total, E_total = self.compute_fields()
 
         # Calcul de ΔI pour toutes les orientations
         angles = np.linspace(0, 2*np.pi, 360)
-        delta_I = np.array([self.compute_delta_I(angle) for angle in angles])
+        delta_I = self.compute_delta_I(angles)
 
         def add_objects(ax):
             for obj in self.objects:
@@ -167,15 +231,17 @@ class ElectricSensor:
         plt.tight_layout()
         return fig
 
-# Configuration et exécution
-objects = [
-    [1.0,  0.2, True],   # [x, y, is_conductor]
-    [1.6, -1.3, False],
-    [-0.6, 1.1, True],
-    [-1.0, 0.2, False],
-]
-
-sensor = ElectricSensor(objects)
-fig = sensor.plot_fields()
-fig.savefig('champs_et_delta_I.png', dpi=300, bbox_inches='tight')
-plt.close()
+if __name__ == "__main__":
+    # Configuration et exécution
+    objects = [
+        [1.0,  0.2, True],   # [x, y, is_conductor]
+        [1.6, -1.3, False],
+        [-0.6, 1.1, True],
+        [-1.0, 0.2, False],
+    ]
+
+    sensor = ElectricSensor(objects)
+    fig = sensor.plot_fields()
+    fig.savefig('champs_et_delta_I.png', dpi=300, bbox_inches='tight')
+    import matplotlib.pyplot as plt
+    plt.close(fig)
@@ -0,0 +1,234 @@
+# polarization.py
+import numpy as np
+from electric_sense import Sphere, compute_K_polarized, currents_from_K
+
+"""
+Objets polarisables quelconques, décrits par un tenseur de polarisation 3x3.
+
+La perturbation d'un objet petit devant sa distance aux électrodes est celle
+d'un dipôle : Kαβ = 1/(4πγ) · rα·P·rβ / (||rα||³||rβ||³). Pour une sphère,
+P = χa³I ; pour un ellipsoïde de demi-axes (a1, a2, a3), dans son repère
+propre, P est diagonal :
+
+    Pi = a1·a2·a3·χ / (1 + (3·Li - 1)·χ)
+
+avec Li les facteurs de dépolarisation (Σ Li = 1, Li = 1/3 pour une sphère,
+d'où Pi = χa³). C'est la forme (a1·a2·a3/3)·(κ - 1)/(1 + Li·(κ - 1)) en
+fonction du rapport de conductivités κ = (1 + 2χ)/(1 - χ), écrite en χ pour
+rester finie pour un conducteur parfait (χ = 1). Dans le repère global,
+P = R·Pcorps·Rᵀ.
+
+ObjectScene stocke les objets en tableaux et garde en cache les tenseurs
+dans le repère global : seuls ceux des objets tournés depuis le dernier
+calcul sont recalculés. La perception traite les sphères et les objets
+anisotropes dans une seule passe (electric_sense.compute_K_polarized).
+"""
+
+def carlson_rd(x, y, z, tol=1e-4):
+    """Intégrale elliptique symétrique de Carlson R_D(x, y, z)
+
+    Algorithme de duplication ; l'erreur relative est d'ordre tol⁶.
+    """
+    x, y, z = (np.asarray(v, dtype=float) for v in (x, y, z))
+    total, factor = 0.0, 1.0
+    while True:
+        mu = (x + y + 3*z) / 5
+        if max(np.max(np.abs(mu - x) / mu), np.max(np.abs(mu - y) / mu),
+               np.max(np.abs(mu - z) / mu)) < tol:
+            break
+        sx, sy, sz = np.sqrt(x), np.sqrt(y), np.sqrt(z)
+        lam = sx*sy + sx*sz + sy*sz
+        total = total + factor / (sz * (z + lam))
+        factor /= 4
+        x, y, z = (x + lam) / 4, (y + lam) / 4, (z + lam) / 4
+    X, Y, Z = (mu - x) / mu, (mu - y) / mu, (mu - z) / mu
+    ea, eb = X*Y, Z*Z
+    ec, ed = ea - eb, ea - 6*eb
+    ee = ed + 2*ec
+    series = 1 + ed*(-3/14 + 9/88*ed - 9/52*Z*ee) + Z*(ee/6 + Z*(-9/22*ec + 3/26*Z*ea))
+    return 3*total + factor * series / (mu * np.sqrt(mu))
+
+def depolarization_factors(semi_axes):
+    """Facteurs de dépolarisation (L1, L2, L3) d'un ellipsoïde
+
+    Li = (a1·a2·a3/3) · R_D(aj², ak², ai²)
+    """
+    a = np.asarray(semi_axes, dtype=float)
+    a2 = a**2
+    volume = a.prod() / 3
+    return np.array([volume * carlson_rd(a2[(i+1) % 3], a2[(i+2) % 3], a2[i]) for i in range(3)])
+
+def ellipsoid_tensor(semi_axes, chi):
+    """Tenseur de polarisation (3, 3) d'un ellipsoïde dans son repère propre
+
+    Args:
+        semi_axes: Demi-axes (a1, a2, a3) [m]
+        chi: Contraste électrique χ, comme pour une sphère de même matériau
+    """
+    a = np.asarray(semi_axes, dtype=float)
+    L = depolarization_factors(a)
+    return np.diag(a.prod() * chi / (1 + (3*L - 1) * chi))
+
+def rotation_matrix(rotation):
+    """Matrice de rotation (3, 3) : angle autour de z [rad] ou matrice"""
+    rotation = np.asarray(rotation, dtype=float)
+    if rotation.ndim == 2:
+        return rotation
+    c, s = np.cos(rotation), np.sin(rotation)
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+class PolarizedObject:
+    """Objet décrit par son tenseur de polarisation
+
+    Attributes:
+        position (np.array): Position [x,y,z] en m
+        body_tensor (np.array): Tenseur de polarisation (3, 3) dans le repère
+                                propre de l'objet [m³]
+        rotation (np.array): Rotation (3, 3) du repère propre
+        radius (float): Rayon englobant en m (collisions et tracé)
+        chi (float): Contraste électrique (signe : conducteur/isolant)
+    """
+    def __init__(self, position, body_tensor, radius, chi, rotation=0.0):
+        self.position = np.array(position, dtype=float)
+        self.body_tensor = np.array(body_tensor, dtype=float)
+        self.radius = radius
+        self.chi = chi
+        self.rotate(rotation)
+
+    def rotate(self, rotation):
+        """Change l'orientation de l'objet (angle autour de z ou matrice)"""
+        self.rotation = rotation_matrix(rotation)
+        self._tensor = None
+
+    @property
+    def tensor(self):
+        """Tenseur de polarisation dans le repère global, en cache"""
+        if self._tensor is None:
+            self._tensor = self.rotation @ self.body_tensor @ self.rotation.T
+        return self._tensor
+
+class Ellipsoid(PolarizedObject):
+    """Ellipsoïde de demi-axes (a1, a2, a3) et de contraste χ
+
+    Args:
+        rotation: Orientation des axes (angle autour de z [rad] ou matrice)
+    """
+    def __init__(self, position, semi_axes, chi, rotation=0.0):
+        self.semi_axes = np.array(semi_axes, dtype=float)
+        super().__init__(position, ellipsoid_tensor(self.semi_axes, chi),
+                         self.semi_axes.max(), chi, rotation)
+
+def _is_isotropic(tensors):
+    """Vrai pour les tenseurs multiples de l'identité (N, 3, 3)"""
+    iso = np.trace(tensors, axis1=-2, axis2=-1)[..., None, None] / 3 * np.eye(3)
+    return np.all(np.isclose(tensors, iso, rtol=1e-12, atol=0), axis=(-2, -1))
+
+class ObjectScene:
+    """Scène mixte de sphères et d'objets polarisables, en tableaux
+
+    Les tenseurs dans le repère global sont calculés à la demande et gardés
+    en cache ; rotate() ne marque que les objets tournés pour recalcul. Les
+    objets isotropes (sphères) restent décrits par leur intensité s = χa³.
+
+    Attributes:
+        positions: Positions (N, 3) [m]
+        radii: Rayons englobants (N,) [m]
+        chis: Contrastes électriques (N,)
+    """
+    def __init__(self, objects=()):
+        self.positions = np.zeros((0, 3))
+        self.radii = np.zeros(0)
+        self.chis = np.zeros(0)
+        self.body_tensors = np.zeros((0, 3, 3))
+        self.rotations = np.zeros((0, 3, 3))
+        self._tensors = np.zeros((0, 3, 3))
+        self._stale = np.zeros(0, dtype=bool)
+        self.extend(objects)
+
+    def extend(self, objects):
+        """Ajoute des Sphere ou PolarizedObject (Ellipsoid, ...)"""
+        objects = list(objects)
+        if not objects:
+            return
+        body = []
+        for obj in objects:
+            if isinstance(obj, Sphere):
+                body.append(obj.chi * obj.radius**3 * np.eye(3))
+            else:
+                body.append(obj.body_tensor)
+        rotations = [getattr(obj, 'rotation', np.eye(3)) for obj in objects]
+        self.positions = np.vstack([self.positions, [obj.position for obj in objects]])
+        self.radii = np.append(self.radii, [obj.radius for obj in objects])
+        self.chis = np.append(self.chis, [obj.chi for obj in objects])
+        self.body_tensors = np.concatenate([self.body_tensors, body])
+        self.rotations = np.concatenate([self.rotations, rotations])
+        self._tensors = np.concatenate([self._tensors, np.zeros((len(objects), 3, 3))])
+        self._stale = np.append(self._stale, np.ones(len(objects), dtype=bool))
+        self.isotropic = _is_isotropic(self.body_tensors)
+        self.anisotropic = np.flatnonzero(~self.isotropic)
+        self.strengths = np.trace(self.body_tensors, axis1=1, axis2=2) / 3
+
+    def add(self, obj):
+        """Ajoute un objet et renvoie son indice"""
+        self.extend([obj])
+        return len(self) - 1
+
+    def rotate(self, index, rotation):
+        """Change l'orientation d'un objet (angle autour de z ou matrice)"""
+        self.rotations[index] = rotation_matrix(rotation)
+        self._stale[index] = True
+
+    def move(self, index, position):
+        """Déplace un ou plusieurs objets (les tenseurs sont inchangés)"""
+        self.positions[index] = position
+
+    @property
+    def tensors(self):
+        """Tenseurs de polarisation (N, 3, 3) dans le repère global"""
+        stale = np.flatnonzero(self._stale)
+        if len(stale):
+            R = self.rotations[stale]
+            self._tensors[stale] = np.einsum('nij,njk,nlk->nil', R, self.body_tensors[stale], R)
+            self._stale[stale] = False
+        return self._tensors
+
+    def __len__(self):
+        return len(self.radii)
+
+    def __getitem__(self, i):
+        if self.isotropic[i] and np.allclose(self.rotations[i], np.eye(3)):
+            return Sphere(self.positions[i], self.radii[i], self.chis[i])
+        return PolarizedObject(self.positions[i], self.body_tensors[i], self.radii[i],
+                               self.chis[i], self.rotations[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"ObjectScene({len(self)} objets dont {len(self.anisotropic)} anisotropes)"
+
+def compute_K_objects(objects, sensor_position, sensor_orientation):
+    """K_total (5, 5) d'une ObjectScene (ou d'une liste d'objets)"""
+    if not isinstance(objects, ObjectScene):
+        objects = ObjectScene(objects)
+    return compute_K_polarized(objects.positions, objects.strengths, objects.tensors,
+                               objects.anisotropic, sensor_position, sensor_orientation)
+
+def compute_electric_sense(objects, sensor_position, sensor_orientation, cutoff=None):
+    """compute_electric_sense pour une scène mixte (argument sense=)
+
+    Args:
+        cutoff: Rayon de perception [m] (seuls les objets plus proches sont
+                sommés)
+    """
+    if not isinstance(objects, ObjectScene):
+        objects = ObjectScene(objects)
+    if cutoff is None:
+        return currents_from_K(compute_K_objects(objects, sensor_position, sensor_orientation))
+    d = objects.positions - np.asarray(sensor_position, dtype=float)
+    near = np.einsum('ij,ij->i', d, d) <= cutoff**2
+    K_total = compute_K_polarized(objects.positions[near], objects.strengths[near],
+                                  objects.tensors[near], np.flatnonzero(~objects.isotropic[near]),
+                                  sensor_position, sensor_orientation)
+    return currents_from_K(K_total)
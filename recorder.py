@@ -0,0 +1,191 @@
+# recorder.py
+import json
+from pathlib import Path
+import numpy as np
+
+class TrajectoryRecorder:
+    """Enregistreur de trajectoires sur tableaux préalloués
+
+    Enregistre, pour M robots, une ligne par pas conservé : pose (x, y, θ)
+    et, en option, les courants mesurés (I_ax, I_lat, I_vert) et la commande
+    (v, ω) qui ont produit cette pose. La ligne 0 est la pose initiale (ses
+    courants et sa commande valent NaN). Un robot arrêté (collision, sortie)
+    n'ajoute plus de lignes : ses lignes valides sont [0, lengths[m]).
+
+    En mémoire, les tableaux grandissent par doublement. Avec `path`, les
+    lignes sont écrites par blocs de chunk_size dans un dossier (un fichier
+    binaire par champ + meta.json) et relues paresseusement par memmap
+    (TrajectoryRecorder.load), sans garder toute la trajectoire en RAM.
+
+    Args:
+        n_robots: Nombre de robots M
+        record_sense: Enregistre I_ax, I_lat, I_vert
+        record_command: Enregistre v, ω
+        decimation: Ne conserve qu'un pas sur `decimation` (la pose finale
+                    de chaque robot est toujours conservée)
+        capacity: Nombre de lignes préallouées (en mémoire)
+        path: Dossier d'enregistrement par blocs (optionnel)
+        chunk_size: Taille des blocs écrits sur disque
+    """
+    POSE_FIELDS = ('x', 'y', 'theta')
+    SENSE_FIELDS = ('I_ax', 'I_lat', 'I_vert')
+    COMMAND_FIELDS = ('v', 'w')
+
+    def __init__(self, n_robots=1, record_sense=False, record_command=False, decimation=1,
+                 capacity=1024, path=None, chunk_size=4096):
+        self.n_robots = n_robots
+        self.decimation = decimation
+        self.fields = self.POSE_FIELDS \
+            + (self.SENSE_FIELDS if record_sense else ()) \
+            + (self.COMMAND_FIELDS if record_command else ())
+        self.path = None if path is None else Path(path)
+        self.chunk_size = chunk_size
+
+        rows = chunk_size if self.path is not None else max(capacity, 1)
+        self._time = np.empty(rows)
+        self._data = {name: np.empty((rows, n_robots)) for name in self.fields}
+        self._rows = 0      # lignes dans le tampon
+        self._flushed = 0   # lignes déjà écrites sur disque
+        self._step = 0      # nombre d'appels à record
+
+        self.lengths = np.zeros(n_robots, dtype=np.int64)
+        self.final = {name: np.zeros(n_robots) for name in ('time',) + self.POSE_FIELDS}
+        self.final_step = np.zeros(n_robots, dtype=np.int64)
+        self.last_recorded_step = np.zeros(n_robots, dtype=np.int64)
+        self.collision = np.zeros(n_robots, dtype=bool)
+        self.out_of_bounds = np.zeros(n_robots, dtype=bool)
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for name in ('time',) + self.fields:
+                (self.path / f'{name}.bin').write_bytes(b'')
+
+    @property
+    def n_rows(self):
+        return self._flushed + self._rows
+
+    def record(self, time, x, y, theta, alive=None, sense=None, command=None):
+        """Enregistre un pas pour les robots `alive` (tous par défaut)
+
+        Les valeurs sont des tableaux (M,) ; celles des robots arrêtés sont
+        ignorées. sense = (I_ax, I_lat, I_vert) et command = (v, ω).
+        """
+        alive = np.ones(self.n_robots, dtype=bool) if alive is None else alive
+        step = self._step
+        self._step += 1
+
+        values = dict(zip(self.POSE_FIELDS, (x, y, theta)))
+        for name, value in zip(self.POSE_FIELDS, (x, y, theta)):
+            self.final[name][alive] = np.broadcast_to(value, alive.shape)[alive]
+        self.final['time'][alive] = time
+        self.final_step[alive] = step
+
+        if step % self.decimation:
+            return
+        if sense is not None:
+            values.update(zip(self.SENSE_FIELDS, sense))
+        if command is not None:
+            values.update(zip(self.COMMAND_FIELDS, command))
+
+        if self._rows == len(self._time):
+            self._grow()
+        row = self._rows
+        self._time[row] = time
+        for name in self.fields:
+            self._data[name][row] = values.get(name, np.nan)
+        self._rows += 1
+        self.lengths[alive] = self.n_rows
+        self.last_recorded_step[alive] = step
+
+        if self.path is not None and self._rows == self.chunk_size:
+            self.flush()
+
+    def _grow(self):
+        if self.path is not None:
+            self.flush()
+            return
+        self._time = np.concatenate([self._time, np.empty_like(self._time)])
+        for name in self.fields:
+            self._data[name] = np.concatenate([self._data[name], np.empty_like(self._data[name])])
+
+    def flush(self):
+        """Écrit le tampon sur disque (mode par blocs)"""
+        if self.path is None or self._rows == 0:
+            return
+        with open(self.path / 'time.bin', 'ab') as f:
+            f.write(self._time[:self._rows].tobytes())
+        for name in self.fields:
+            with open(self.path / f'{name}.bin', 'ab') as f:
+                f.write(self._data[name][:self._rows].tobytes())
+        self._flushed += self._rows
+        self._rows = 0
+
+    def finish(self, collision=None, out_of_bounds=None):
+        """Termine l'enregistrement : issues par robot, écriture des métadonnées"""
+        if collision is not None:
+            self.collision[:] = collision
+        if out_of_bounds is not None:
+            self.out_of_bounds[:] = out_of_bounds
+        if self.path is None:
+            return self
+        self.flush()
+        meta = {
+            'n_robots': self.n_robots, 'n_rows': self.n_rows, 'fields': list(self.fields),
+            'decimation': self.decimation,
+            'lengths': self.lengths.tolist(), 'final_step': self.final_step.tolist(),
+            'last_recorded_step': self.last_recorded_step.tolist(),
+            'final': {name: value.tolist() for name, value in self.final.items()},
+            'collision': self.collision.tolist(), 'out_of_bounds': self.out_of_bounds.tolist()
+        }
+        (self.path / 'meta.json').write_text(json.dumps(meta))
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Relit un enregistrement par blocs ; les champs sont des memmap"""
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text())
+        recorder = cls.__new__(cls)
+        recorder.path = path
+        recorder.n_robots = meta['n_robots']
+        recorder.fields = tuple(meta['fields'])
+        recorder.decimation = meta['decimation']
+        recorder._time = np.empty(0)
+        recorder._data = {name: np.empty((0, recorder.n_robots)) for name in recorder.fields}
+        recorder._flushed, recorder._rows = meta['n_rows'], 0
+        recorder.lengths = np.array(meta['lengths'], dtype=np.int64)
+        recorder.final_step = np.array(meta['final_step'], dtype=np.int64)
+        recorder.last_recorded_step = np.array(meta['last_recorded_step'], dtype=np.int64)
+        recorder.final = {name: np.array(value) for name, value in meta['final'].items()}
+        recorder.collision = np.array(meta['collision'], dtype=bool)
+        recorder.out_of_bounds = np.array(meta['out_of_bounds'], dtype=bool)
+        return recorder
+
+    def field(self, name):
+        """Champ `name` (n_rows, M), ou (n_rows,) pour 'time'"""
+        if self.path is not None and self._flushed:
+            if self._rows:
+                self.flush()
+            shape = (self._flushed,) if name == 'time' else (self._flushed, self.n_robots)
+            return np.memmap(self.path / f'{name}.bin', dtype=float, mode='r', shape=shape)
+        if name == 'time':
+            return self._time[:self._rows]
+        return self._data[name][:self._rows]
+
+    def history(self, m):
+        """Historique du robot m au format de simulate_behavior"""
+        n = self.lengths[m]
+        missing_final = self.final_step[m] > self.last_recorded_step[m]
+        history = {}
+        for name in ('time',) + self.fields:
+            values = self.field(name)[:n] if name == 'time' else self.field(name)[:n, m]
+            if missing_final:
+                final = self.final.get(name, np.array([np.nan] * self.n_robots))[m]
+                values = np.append(values, final)
+            history[name] = np.asarray(values)
+        history['collision'] = bool(self.collision[m])
+        history['out_of_bounds'] = bool(self.out_of_bounds[m])
+        return history
+
+    def histories(self):
+        return [self.history(m) for m in range(self.n_robots)]
@@ -0,0 +1,200 @@
+# render.py
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import Patch, Polygon
+from matplotlib.lines import Line2D
+from command import ElectricBehavior
+from draw_robot import robot_geometry, scene_patches
+
+"""
+Rendu des figures de simulation, sans affichage.
+
+Les figures sont créées une seule fois sur le backend Agg (sans pyplot ni
+interface graphique) puis réutilisées d'une seed à l'autre : on ne met à jour
+que les données des artistes (sphères, trajectoire, robots, marqueur final).
+Le placement des axes est calculé une fois (pas de bbox_inches='tight' à
+chaque sauvegarde).
+"""
+
+# Taille et résolution par défaut des figures complètes et des vignettes
+FIGSIZE = (16, 12)
+DPI = 300
+THUMBNAIL_FIGSIZE = (4, 3)
+THUMBNAIL_DPI = 50
+
+# Marqueur final selon l'issue
+OUTCOME_MARKERS = {'collision': 'ro', 'out_of_bounds': 'yo'}
+
+class SimulationRenderer:
+    """Figure 2x2 des trajectoires des comportements, réutilisable
+
+    Args:
+        dpi: Résolution des images (par défaut DPI, ou THUMBNAIL_DPI)
+        figsize: Taille de la figure en pouces
+        thumbnail: Vignette : petite figure sans titres, axes ni légende,
+                   robots réduits au triangle
+        bounds: Demi-largeur de la zone affichée [m]
+    """
+    def __init__(self, dpi=None, figsize=None, thumbnail=False, bounds=2.5):
+        self.thumbnail = thumbnail
+        self.dpi = dpi if dpi is not None else (THUMBNAIL_DPI if thumbnail else DPI)
+        figsize = figsize if figsize is not None else (THUMBNAIL_FIGSIZE if thumbnail else FIGSIZE)
+
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.axs = self.fig.subplots(2, 2).flatten()
+        self.artists = [self._setup_axis(ax, bounds) for ax in self.axs]
+
+        if not thumbnail:
+            legend_elements = [
+                Patch(facecolor='red', alpha=0.5, label='Conducteur (χ > 0)'),
+                Patch(facecolor='blue', alpha=0.5, label='Isolant (χ < 0)'),
+                Line2D([0], [0], color='b', linewidth=2, label='Trajectoire'),
+                Line2D([0], [0], marker='o', color='r', markersize=10, linestyle='None', label='Collision')
+            ]
+            self.axs[0].legend(handles=legend_elements, loc='upper right')
+            self.fig.tight_layout()
+        else:
+            self.fig.subplots_adjust(left=0.01, right=0.99, bottom=0.01, top=0.99, wspace=0.02, hspace=0.02)
+
+    def _setup_axis(self, ax, bounds):
+        """Crée les artistes d'un axe, vides, et fixe sa mise en page"""
+        ax.set_aspect('equal')
+        ax.set_xlim(-bounds, bounds)
+        ax.set_ylim(-bounds, bounds)
+        if self.thumbnail:
+            ax.set_xticks([])
+            ax.set_yticks([])
+        else:
+            ax.grid(True)
+            ax.set_xlabel('X (m)')
+            ax.set_ylabel('Y (m)')
+            ax.set_title(' ')  # réserve la place du titre pour la mise en page
+
+        artists = {
+            'spheres': ax.add_collection(PatchCollection([])),
+            'trajectory': ax.plot([], [], 'b-', linewidth=1 if self.thumbnail else 2)[0],
+            'start': ax.add_patch(Polygon(np.zeros((3, 2)), color='gray')),
+            'final': ax.add_patch(Polygon(np.zeros((3, 2)), color='black')),
+            'outcome': ax.plot([], [], 'ro', markersize=10, alpha=0.5)[0]
+        }
+        if not self.thumbnail:
+            artists['start_electrodes'] = ax.plot([], [], 'ko', markersize=5)[0]
+            artists['final_electrodes'] = ax.plot([], [], 'ko', markersize=5)[0]
+        return artists
+
+    def _set_robot(self, artists, name, position, orientation):
+        triangle, electrodes = robot_geometry(position, orientation)
+        artists[name].set_xy(triangle)
+        if f'{name}_electrodes' in artists:
+            artists[f'{name}_electrodes'].set_data(electrodes[:, 0], electrodes[:, 1])
+
+    def update(self, spheres, histories):
+        """Met à jour les artistes pour une scène et ses historiques
+
+        Args:
+            spheres: Scène (Scene ou liste de Sphere)
+            histories: Dictionnaire {type de comportement: historique}
+                       (4 au plus)
+        """
+        circles, colors = scene_patches(spheres)
+        behavior_types = list(histories)
+        for i, (ax, artists) in enumerate(zip(self.axs, self.artists)):
+            ax.set_visible(i < len(behavior_types))
+            if i >= len(behavior_types):
+                continue
+            bt = behavior_types[i]
+            history = histories[bt]
+
+            artists['spheres'].set_paths(circles)
+            artists['spheres'].set_facecolor(colors)
+            artists['spheres'].set_edgecolor(colors)
+            artists['trajectory'].set_data(history['x'], history['y'])
+            self._set_robot(artists, 'start', np.zeros(3), 0)
+            final_pos = np.array([history['x'][-1], history['y'][-1], 0])
+            self._set_robot(artists, 'final', final_pos, history['theta'][-1])
+
+            outcome = next((k for k in OUTCOME_MARKERS if history.get(k, False)), None)
+            if outcome is None:
+                artists['outcome'].set_data([], [])
+            else:
+                artists['outcome'].set_color(OUTCOME_MARKERS[outcome][0])
+                artists['outcome'].set_data([history['x'][-1]], [history['y'][-1]])
+
+            if not self.thumbnail:
+                ax.set_title(f"B{bt}: {ElectricBehavior(behavior_type=bt).get_name()}")
+
+    def render(self, spheres, histories, filename, metadata=None):
+        """Met à jour la figure et l'enregistre dans `filename`
+
+        Args:
+            metadata: Métadonnées du fichier (par ex. textes PNG)
+        """
+        self.update(spheres, histories)
+        self.fig.savefig(filename, dpi=self.dpi, metadata=metadata)
+        return filename
+
+@functools.lru_cache(maxsize=None)
+def shared_renderer(**renderer_kwargs):
+    """Figure réutilisée par le processus courant pour des paramètres donnés"""
+    return SimulationRenderer(**renderer_kwargs)
+
+# Figure de chaque processus de render_batch
+_WORKER_RENDERER = None
+
+def _init_worker(renderer_kwargs):
+    global _WORKER_RENDERER
+    _WORKER_RENDERER = SimulationRenderer(**renderer_kwargs)
+
+def _render_chunk(jobs):
+    return [_WORKER_RENDERER.render(*job) for job in jobs]
+
+def _trim(history):
+    """Champs d'un historique utiles au rendu (moins de données à transmettre)"""
+    return {k: history[k] for k in ('x', 'y', 'theta', 'collision', 'out_of_bounds') if k in history}
+
+def render_batch(jobs, workers=None, chunk_size=None, **renderer_kwargs):
+    """Rend une liste de figures (spheres, histories, filename)
+
+    Chaque processus crée une seule figure et la réutilise pour ses lots.
+
+    Args:
+        jobs: Liste de tuples (spheres, histories, filename)
+        workers: Nombre de processus (None: tous les cœurs, 0: sans pool)
+        chunk_size: Nombre de figures par lot envoyé à un processus (par
+                    défaut, environ 4 lots par processus)
+        renderer_kwargs: Paramètres de SimulationRenderer (dpi, thumbnail, ...)
+
+    Returns:
+        Liste des fichiers écrits
+    """
+    jobs = [(spheres, {bt: _trim(h) for bt, h in histories.items()}, filename)
+            for spheres, histories, filename in jobs]
+    if workers == 0:
+        renderer = SimulationRenderer(**renderer_kwargs)
+        return [renderer.render(*job) for job in jobs]
+
+    if chunk_size is None:
+        chunk_size = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(renderer_kwargs,)) as pool:
+        return [filename for output in pool.map(_render_chunk, chunks) for filename in output]
+
+def render_sweep(scenes, results, output_dir='simulations', workers=None, **renderer_kwargs):
+    """Rend une figure des comportements par seed d'un balayage (sweep.run_sweep)
+
+    Pour un balayage sur plusieurs gains, seul le dernier gain est tracé.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    histories = {seed: {} for seed in scenes}
+    for (seed, bt, _), history in results.items():
+        histories[seed][bt] = history
+    jobs = [(spheres, histories[seed], os.path.join(output_dir, f'simulation_comportements_{seed:02d}.png'))
+            for seed, spheres in scenes.items()]
+    return render_batch(jobs, workers, **renderer_kwargs)
@@ -0,0 +1,236 @@
+# results_cache.py
+import argparse
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+import numpy as np
+from sense_cache import scene_hash
+
+"""
+Cache sur disque des résultats de simulation, adressé par contenu.
+
+La clé d'un résultat est l'empreinte de tout ce qui le détermine : contenu
+de la scène (et constantes du capteur), paramètres du comportement
+(behavior_type, k_gain, forward_speed), durée et pas de simulation,
+réglages de l'intégrateur, méthode de perception et version du code (contenu
+des modules de simulation). Un résultat dont l'un de ces éléments change a
+donc une autre clé : il n'y a jamais à invalider un résultat périmé, seulement
+à libérer la place (éviction des moins récemment utilisés au-delà de
+max_bytes, ou `python results_cache.py clear`).
+
+Chaque historique est un fichier .npz nommé par sa clé, écrit de façon
+atomique (plusieurs processus peuvent partager le dossier). La taille du
+cache est tenue à jour à chaque écriture, à partir d'un parcours du dossier
+fait une seule fois : le dossier n'est reparcouru que pour évincer. Un
+fichier illisible (écriture interrompue, disque plein) est supprimé et
+compté comme absent.
+
+Une figure tracée à partir de résultats en cache porte dans ses métadonnées
+PNG l'empreinte de ces résultats et du code de tracé (figure_key) : elle n'est
+retracée que si l'un ou l'autre a changé (figure_is_current).
+"""
+
+DEFAULT_DIRECTORY = 'simulations/cache'
+
+# Modules dont dépendent les trajectoires simulées (tous les chemins de
+# simulation et de perception, y compris ceux importés à la demande)
+CODE_MODULES = ('constants.py', 'electric_sense.py', 'command.py', 'simulation.py', 'ensemble.py',
+                'integrators.py', 'recorder.py', 'scene.py', 'spatial_index.py', 'sense_table.py',
+                'sense_cache.py', 'walls.py', 'far_field.py', 'polarization.py', 'incremental.py',
+                'kernels.py', 'sweep.py')
+
+# Modules dont dépendent les figures
+RENDER_MODULES = ('render.py', 'draw_robot.py', 'constants.py')
+FIGURE_KEY = 'ResultsKey'
+
+@functools.lru_cache(maxsize=None)
+def code_version(modules=CODE_MODULES):
+    """Empreinte du code de simulation (contenu des CODE_MODULES, ou de `modules`)"""
+    h = hashlib.sha1()
+    root = Path(__file__).resolve().parent
+    for name in modules:
+        path = root / name
+        if path.exists():
+            h.update(name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+def integrator_settings(integrator):
+    """Réglages d'un intégrateur (None : Euler à pas fixe)"""
+    if integrator is None:
+        return 'euler'
+    return {'class': type(integrator).__name__,
+            **{k: v for k, v in sorted(vars(integrator).items()) if not k.startswith('_')}}
+
+def result_key(spheres, behavior, simulation_time, dt, integrator=None, method='simulate_behavior',
+               bounds=2.5):
+    """Clé d'un résultat de simulation
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere)
+        behavior: ElectricBehavior simulé
+        integrator: Intégrateur à pas adaptatif, ou None
+        method: Chemin de simulation et de perception (par ex.
+                'simulate_behavior', 'ensemble', 'ensemble:table:<empreinte>')
+        bounds: Demi-taille de la zone simulée [m]
+    """
+    description = {
+        'scene': scene_hash(spheres),
+        'behavior': [int(behavior.behavior_type), float(behavior.k_gain), float(behavior.forward_speed)],
+        'simulation_time': float(simulation_time),
+        'dt': float(dt),
+        'integrator': integrator_settings(integrator),
+        'method': method,
+        'bounds': float(bounds),
+        'code': code_version()
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+def figure_key(result_keys):
+    """Empreinte d'une figure : clés des résultats tracés et code de tracé"""
+    description = {'results': sorted(result_keys), 'render': code_version(RENDER_MODULES)}
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+def figure_is_current(filename, key):
+    """La figure existe et a été tracée pour l'empreinte `key` (figure_key)"""
+    from PIL import Image
+    try:
+        with Image.open(filename) as image:
+            return getattr(image, 'text', {}).get(FIGURE_KEY) == key
+    except (FileNotFoundError, OSError):
+        return False
+
+def file_hash(path):
+    """Empreinte du contenu d'un fichier (par ex. une table de perception)"""
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+class ResultsCache:
+    """Historiques de simulation enregistrés sur disque, par clé
+
+    Args:
+        directory: Dossier du cache
+        max_bytes: Taille maximale ; au-delà, les résultats les moins
+                   récemment utilisés sont supprimés
+    """
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=500 * 2**20):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None  # Taille totale, lue sur disque au premier besoin
+
+    def _path(self, key):
+        return self.directory / f'{key}.npz'
+
+    def get(self, key):
+        """Historique enregistré sous `key`, ou None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                history = {name: (data[name].item() if data[name].ndim == 0 else data[name])
+                           for name in data.files if name != '__none__'}
+                history.update(dict.fromkeys(data['__none__'].tolist() if '__none__' in data.files else []))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Fichier tronqué ou corrompu : supprimé, le résultat sera recalculé
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        os.utime(path)  # date d'accès pour l'éviction
+        self.hits += 1
+        return history
+
+    def _file_size(self, path):
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def put(self, key, history):
+        """Enregistre un historique (écriture atomique), puis libère la place si besoin"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        arrays = {name: np.asarray(value) for name, value in history.items() if value is not None}
+        arrays['__none__'] = np.array([name for name, value in history.items() if value is None], dtype=str)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        path = self._path(key)
+        if self._bytes is None:
+            self.size()
+        self._bytes -= self._file_size(path)
+        os.replace(tmp, path)
+        self._bytes += self._file_size(path)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Historique en cache, ou calculé par compute() puis enregistré"""
+        history = self.get(key)
+        if history is None:
+            history = compute()
+            self.put(key, history)
+        return history
+
+    def entries(self):
+        """Fichiers du cache, du moins au plus récemment utilisé"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('*.npz'), key=lambda p: p.stat().st_mtime)
+
+    def size(self):
+        """Taille totale du cache [octets], relue sur disque"""
+        self._bytes = sum(self._file_size(p) for p in self.entries())
+        return self._bytes
+
+    def evict(self, max_bytes=None):
+        """Supprime les résultats les moins récemment utilisés au-delà de max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        sizes = [self._file_size(p) for p in entries]
+        total = sum(sizes)
+        removed = 0
+        for path, size in zip(entries, sizes):
+            if total <= max_bytes:
+                break
+            total -= size
+            path.unlink(missing_ok=True)
+            removed += 1
+        self._bytes = total
+        return removed
+
+    def invalidate(self, key):
+        """Supprime un résultat"""
+        path = self._path(key)
+        if self._bytes is not None:
+            self._bytes -= self._file_size(path)
+        path.unlink(missing_ok=True)
+
+    def clear(self):
+        """Supprime tous les résultats ; renvoie leur nombre"""
+        entries = self.entries()
+        for path in entries:
+            path.unlink(missing_ok=True)
+        self._bytes = 0
+        return len(entries)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache des résultats de simulation")
+    parser.add_argument('command', choices=['stats', 'clear', 'evict'])
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--max-mb', type=float, default=None, help="Taille maximale pour evict [Mo]")
+    args = parser.parse_args()
+
+    cache = ResultsCache(args.directory)
+    if args.command == 'stats':
+        print(f"{len(cache.entries())} résultats, {cache.size() / 2**20:.1f} Mo dans {cache.directory}")
+    elif args.command == 'clear':
+        print(f"{cache.clear()} résultats supprimés")
+    else:
+        max_bytes = None if args.max_mb is None else int(args.max_mb * 2**20)
+        print(f"{cache.evict(max_bytes)} résultats supprimés")
@@ -0,0 +1,206 @@
+# scene.py
+from collections import deque
+import numpy as np
+from electric_sense import Sphere
+
+class Scene:
+    """Scène de sphères stockée en tableaux contigus (structure de tableaux)
+
+    Remplace les listes de Sphere : positions, rayons et χ sont stockés dans
+    trois tableaux, avec une capacité qui double à l'ajout. Tous les
+    consommateurs (compute_electric_sense, check_collision, draw_scene, ...)
+    lisent directement ces tableaux. L'itération et l'indexation renvoient des
+    copies sous forme de Sphere, pour compatibilité.
+
+    Les structures dérivées (index spatial, arbre de champ lointain) sont
+    mises en cache et reconstruites seulement après une modification
+    (compteur `version`). Les indices modifiés par update sont journalisés
+    sur les CHANGE_LOG dernières versions (voir changed_since).
+
+    Attributes:
+        positions: Positions (N, 3) [m] (lecture seule, voir update)
+        radii: Rayons (N,) [m]
+        chis: Contrastes électriques (N,)
+    """
+    CHANGE_LOG = 64
+
+    def __init__(self, positions=None, radii=None, chis=None, copy=True):
+        positions = np.zeros((0, 3)) if positions is None else positions
+        radii = np.zeros(0) if radii is None else radii
+        chis = np.zeros(0) if chis is None else chis
+        convert = np.array if copy else np.asarray
+        self._positions = convert(positions, dtype=float).reshape(-1, 3)
+        self._radii = convert(radii, dtype=float).reshape(-1)
+        self._chis = convert(chis, dtype=float).reshape(-1)
+        if not (len(self._positions) == len(self._radii) == len(self._chis)):
+            raise ValueError("positions, radii et chis doivent avoir la même longueur")
+        self._n = len(self._radii)
+        self.version = 0
+        self._cache = {}
+        self._changes = deque()  # Indices modifiés par les versions _changes_base+1 .. version
+        self._changes_base = 0
+
+    @classmethod
+    def from_spheres(cls, spheres):
+        """Construit une scène à partir d'une liste de Sphere"""
+        scene = cls()
+        for sphere in spheres:
+            scene.add(sphere.position, sphere.radius, sphere.chi)
+        return scene
+
+    # Accès aux tableaux
+    @property
+    def positions(self):
+        return self._positions[:self._n]
+
+    @property
+    def radii(self):
+        return self._radii[:self._n]
+
+    @property
+    def chis(self):
+        return self._chis[:self._n]
+
+    @property
+    def strengths(self):
+        """Intensités de polarisation s = χa³"""
+        return self.chis * self.radii**3
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if not -self._n <= i < self._n:
+            raise IndexError("indice de sphère hors de la scène")
+        i = i % self._n
+        return Sphere(self._positions[i], self._radii[i], self._chis[i])
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    # Modifications
+    def _modified(self, indices=None):
+        """Nouvelle version ; indices : sphères modifiées (None : changement de structure)"""
+        self.version += 1
+        self._cache.clear()
+        if indices is None:
+            self._changes.clear()
+            self._changes_base = self.version
+        else:
+            self._changes.append(indices)
+            if len(self._changes) > self.CHANGE_LOG:
+                self._changes.popleft()
+                self._changes_base += 1
+
+    def changed_since(self, version):
+        """Indices des sphères modifiées depuis `version`
+
+        Returns:
+            Tableau d'indices, ou None si l'information n'est plus disponible
+            (version trop ancienne, ajout ou retrait de sphères)
+        """
+        if version == self.version:
+            return np.zeros(0, dtype=int)
+        if version is None or not self._changes_base <= version < self.version:
+            return None
+        return np.unique(np.concatenate(list(self._changes)[version - self._changes_base:]))
+
+    def _reserve(self, n):
+        """Garantit une capacité d'au moins n sphères (copie si partagée)"""
+        if n <= len(self._radii) and self._radii.flags.writeable:
+            return
+        capacity = max(n, 2 * len(self._radii), 8)
+        for name, shape in (('_positions', (capacity, 3)), ('_radii', (capacity,)), ('_chis', (capacity,))):
+            array = np.zeros(shape)
+            array[:self._n] = getattr(self, name)[:self._n]
+            setattr(self, name, array)
+
+    def add(self, position, radius, chi):
+        """Ajoute une sphère et renvoie son indice"""
+        self._reserve(self._n + 1)
+        self._positions[self._n] = position
+        self._radii[self._n] = radius
+        self._chis[self._n] = chi
+        self._n += 1
+        self._modified()
+        return self._n - 1
+
+    def extend(self, positions, radii, chis):
+        """Ajoute un lot de sphères"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        n = len(positions)
+        self._reserve(self._n + n)
+        self._positions[self._n:self._n + n] = positions
+        self._radii[self._n:self._n + n] = radii
+        self._chis[self._n:self._n + n] = chis
+        self._n += n
+        self._modified()
+
+    def remove(self, indices):
+        """Retire une ou plusieurs sphères (les indices suivants sont décalés)"""
+        keep = np.ones(self._n, dtype=bool)
+        keep[np.atleast_1d(indices)] = False
+        self._positions = self.positions[keep]
+        self._radii = self.radii[keep]
+        self._chis = self.chis[keep]
+        self._n = int(keep.sum())
+        self._modified()
+
+    def update(self, index, position=None, radius=None, chi=None):
+        """Modifie une ou plusieurs sphères (index entier, tableau ou masque)"""
+        self._reserve(self._n)
+        if position is not None:
+            self._positions[:self._n][index] = position
+        if radius is not None:
+            self._radii[:self._n][index] = radius
+        if chi is not None:
+            self._chis[:self._n][index] = chi
+        self._modified(np.atleast_1d(np.arange(self._n)[index]))
+
+    # Structures dérivées, mises en cache
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def grid(self):
+        """Index spatial (SphereGrid) de la scène"""
+        from spatial_index import SphereGrid
+        return self._cached('grid', lambda: SphereGrid(self.positions, self.radii, self.chis))
+
+    def far_field_tree(self, leaf_size=16):
+        """Arbre de champ lointain (FarFieldTree) de la scène"""
+        from far_field import FarFieldTree
+        return self._cached(('far_field', leaf_size),
+                            lambda: FarFieldTree(self.positions, self.strengths, leaf_size))
+
+    def content_hash(self):
+        """Empreinte du contenu de la scène (clé des cartes de perception)"""
+        from sense_cache import content_hash
+        return self._cached('content_hash', lambda: content_hash(self.to_array()))
+
+    # Forme sérialisée compacte : un tableau (N, 5) [x, y, z, a, χ]
+    def to_array(self):
+        return np.column_stack([self.positions, self.radii, self.chis])
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.asarray(array, dtype=float).reshape(-1, 5)
+        return cls(array[:, :3], array[:, 3], array[:, 4])
+
+    def save(self, path):
+        """Enregistre la scène (format .npy)"""
+        np.save(path, self.to_array())
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_array(np.load(path))
+
+    def __reduce__(self):
+        # Pickle compact : sans capacité excédentaire ni cache
+        return (Scene.from_array, (self.to_array(),))
+
+    def __repr__(self):
+        return f"Scene({self._n} sphères)"
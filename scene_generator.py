@@ -0,0 +1,193 @@
+# scene_generator.py
+import numpy as np
+from scene import Scene
+
+"""
+Génération vectorisée de grandes scènes (10⁴ à 10⁵ sphères) sans recouvrement.
+
+Les sphères sont tirées par lots de candidats (lancer de fléchettes,
+« dart throwing »). Un candidat est rejeté s'il sort de la zone, s'il empiète
+sur la zone d'exclusion autour de la pose de départ, s'il recouvre une
+sphère déjà placée ou un candidat antérieur du même lot. Les voisins sont
+trouvés par hachage spatial : les sphères placées sont triées par cellule
+d'une grille de pas 2·r_max + min_gap (au moins), avec une table dense du
+début de chaque cellule, et chaque candidat n'est comparé qu'aux sphères des
+9 cellules qui l'entourent. Toutes les étapes sont des opérations sur
+tableaux ; le nombre de lots croît seulement avec la densité visée.
+
+Le tirage ne dépend que du générateur fourni (np.random.Generator) : une
+même seed donne la même scène.
+"""
+
+# Décalages des 9 cellules voisines (cellule comprise)
+_NEIGHBORS = np.array([(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)])
+
+def sample_radii(rng, size, radius_range=(0.1, 0.2), radius_distribution='uniform'):
+    """Tire des rayons dans radius_range
+
+    Args:
+        radius_distribution: 'uniform', 'loguniform', ou fonction
+                             (rng, size) -> rayons (ramenés dans radius_range)
+    """
+    min_radius, max_radius = radius_range
+    if callable(radius_distribution):
+        return np.clip(np.asarray(radius_distribution(rng, size), dtype=float), min_radius, max_radius)
+    if radius_distribution == 'uniform':
+        return rng.uniform(min_radius, max_radius, size)
+    if radius_distribution == 'loguniform':
+        return np.exp(rng.uniform(np.log(min_radius), np.log(max_radius), size))
+    raise ValueError(f"Distribution de rayons inconnue : {radius_distribution}")
+
+def default_arena_size(n_spheres, radius_range=(0.1, 0.2), radius_distribution='uniform',
+                       keep_out=0.5, coverage=0.2):
+    """Demi-taille de zone donnant une fraction de surface couverte `coverage`
+
+    La surface moyenne d'une sphère est estimée sur un tirage fixe des rayons ;
+    la zone d'exclusion du départ s'y ajoute. Jamais moins que la zone des
+    scènes par défaut (2 m).
+
+    Args:
+        coverage: Fraction de la zone couverte par les sphères ; le tirage
+                  par lots se bloque au-delà d'environ 0.5
+    """
+    radii = sample_radii(np.random.default_rng(0), 4096, radius_range, radius_distribution)
+    area = n_spheres * np.pi * np.mean(radii**2) / coverage + np.pi * keep_out**2
+    return max(2.0, float(np.sqrt(area)) / 2)
+
+def _cell_starts(sorted_keys, n_keys):
+    """Début de chaque cellule dans des clés triées (table dense, n_keys + 1)"""
+    starts = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sorted_keys, minlength=n_keys), out=starts[1:])
+    return starts
+
+def _pairs(query_keys, starts):
+    """Couples (requête, indice trié) dont les cellules sont voisines
+
+    Args:
+        query_keys: Cellules (Q, 9) des voisinages des requêtes
+        starts: Table des débuts de cellules (voir _cell_starts)
+    """
+    lo = starts[query_keys].ravel()
+    counts = starts[query_keys + 1].ravel() - lo
+    queries = np.repeat(np.arange(len(query_keys)).repeat(_NEIGHBORS.shape[0]), counts)
+    # Indices lo..hi-1 de chaque plage, mis bout à bout
+    offsets = np.repeat(lo - np.cumsum(counts) + counts, counts)
+    return queries, offsets + np.arange(len(offsets))
+
+def generate_scene(n_spheres, rng, arena_size=None, radius_range=(0.1, 0.2), radius_distribution='uniform',
+                   conductor_fraction=0.5, conductor_chi=1.0, insulator_chi=-0.5, start=(0.0, 0.0),
+                   keep_out=0.5, min_gap=0.0, batch_size=8192, max_rounds=200):
+    """Crée une scène de n_spheres sphères sans recouvrement
+
+    Args:
+        n_spheres: Nombre de sphères
+        rng: Générateur aléatoire (np.random.Generator)
+        arena_size: Demi-taille de la zone des centres [m] ; par défaut,
+                    déduite de n_spheres (voir default_arena_size)
+        radius_range: Rayons minimal et maximal [m]
+        radius_distribution: Loi des rayons (voir sample_radii)
+        conductor_fraction: Proportion de conducteurs (χ = conductor_chi),
+                            les autres étant isolants (χ = insulator_chi)
+        start: Position de départ du robot (x, y) [m]
+        keep_out: Rayon de la zone d'exclusion autour de start [m] ; les
+                  sphères y sont entièrement exclues
+        min_gap: Écart minimal entre les surfaces de deux sphères [m]
+        batch_size: Nombre maximal de candidats par lot
+        max_rounds: Nombre maximal de lots avant d'abandonner
+
+    Returns:
+        Scene
+    """
+    min_radius, max_radius = radius_range
+    if not 0 < min_radius <= max_radius:
+        raise ValueError("radius_range doit vérifier 0 < min <= max")
+    if arena_size is None:
+        arena_size = default_arena_size(n_spheres, radius_range, radius_distribution, keep_out)
+    # Grille dense bordée d'une cellule vide de chaque côté ; pour les scènes
+    # clairsemées, les cellules sont agrandies (au plus ~4 cellules par sphère)
+    cell_size = max(2 * max_radius + min_gap, 2 * arena_size / np.sqrt(4 * n_spheres + 1))
+    n_cells = int(np.ceil(2 * arena_size / cell_size)) + 3
+    start = np.asarray(start, dtype=float)
+
+    xy = np.zeros((n_spheres, 2))
+    radii = np.zeros(n_spheres)
+    keys = np.zeros(0, dtype=np.int64)       # Cellules des sphères placées, triées
+    order = np.zeros(0, dtype=np.int64)      # Indice de sphère de chaque entrée de keys
+    starts = _cell_starts(keys, n_cells**2)
+    n = 0
+    for _ in range(max_rounds):
+        if n == n_spheres:
+            break
+        size = min(batch_size, max(4 * (n_spheres - n), 256))
+        candidates = rng.uniform(-arena_size, arena_size, (size, 2))
+        candidate_radii = sample_radii(rng, size, radius_range, radius_distribution)
+
+        # Zone d'exclusion autour du départ
+        ok = np.hypot(*(candidates - start).T) > keep_out + candidate_radii
+        candidates, candidate_radii = candidates[ok], candidate_radii[ok]
+
+        ij = np.floor((candidates + arena_size) / cell_size).astype(np.int64) + 1
+        neighborhoods = ij[:, None, :] + _NEIGHBORS
+        neighborhood_keys = neighborhoods[..., 0] * n_cells + neighborhoods[..., 1]
+        candidate_keys = ij[:, 0] * n_cells + ij[:, 1]
+
+        # Recouvrement avec les sphères déjà placées
+        ok = np.ones(len(candidates), dtype=bool)
+        q, s = _pairs(neighborhood_keys, starts)
+        s = order[s]
+        d = candidates[q] - xy[s]
+        overlap = np.einsum('ij,ij->i', d, d) < (candidate_radii[q] + radii[s] + min_gap)**2
+        ok[q[overlap]] = False
+
+        # Recouvrement entre candidats du lot : le plus tardif est rejeté
+        batch_order = np.argsort(candidate_keys, kind='stable')
+        q, s = _pairs(neighborhood_keys, _cell_starts(candidate_keys[batch_order], n_cells**2))
+        s = batch_order[s]
+        earlier = s < q
+        q, s = q[earlier], s[earlier]
+        d = candidates[q] - candidates[s]
+        overlap = np.einsum('ij,ij->i', d, d) < (candidate_radii[q] + candidate_radii[s] + min_gap)**2
+        ok[q[overlap]] = False
+
+        accepted = np.flatnonzero(ok)[:n_spheres - n]
+        m = len(accepted)
+        xy[n:n + m] = candidates[accepted]
+        radii[n:n + m] = candidate_radii[accepted]
+
+        # Insertion des nouvelles cellules dans l'index trié
+        new_keys = candidate_keys[accepted]
+        new_order = np.argsort(new_keys, kind='stable')
+        where = np.searchsorted(keys, new_keys[new_order], side='right')
+        keys = np.insert(keys, where, new_keys[new_order])
+        order = np.insert(order, where, n + new_order)
+        starts = _cell_starts(keys, n_cells**2)
+        n += m
+    if n < n_spheres:
+        raise ValueError(f"Seulement {n} sphères placées sur {n_spheres} après {max_rounds} lots : "
+                         "scène trop dense (agrandir arena_size ou réduire les rayons)")
+
+    chis = np.where(rng.random(n_spheres) < conductor_fraction, conductor_chi, insulator_chi)
+    positions = np.column_stack([xy, np.zeros(n_spheres)])
+    return Scene(positions, radii, chis, copy=False)
+
+def min_clearance(spheres):
+    """Plus petit écart entre les surfaces de deux sphères voisines (négatif : recouvrement)
+
+    Vérification par grille, en O(N) ; renvoie inf pour moins de 2 sphères.
+    """
+    positions, radii = spheres.positions, spheres.radii
+    if len(radii) < 2:
+        return np.inf
+    xy = positions[:, :2]
+    cell_size = max(2 * radii.max(), np.ptp(xy, axis=0).max() / np.sqrt(4 * len(radii)))
+    ij = np.floor((xy - xy.min(axis=0)) / cell_size).astype(np.int64) + 1
+    n_cells = int(ij.max()) + 2
+    keys = ij[:, 0] * n_cells + ij[:, 1]
+    neighborhoods = ij[:, None, :] + _NEIGHBORS
+    order = np.argsort(keys, kind='stable')
+    q, s = _pairs(neighborhoods[..., 0] * n_cells + neighborhoods[..., 1], _cell_starts(keys[order], n_cells**2))
+    s = order[s]
+    q, s = q[s > q], s[s > q]
+    if len(q) == 0:
+        return np.inf
+    return float(np.min(np.hypot(*(xy[q] - xy[s]).T) - radii[q] - radii[s]))
@@ -0,0 +1,352 @@
+# sense_cache.py
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES, GAMMA, C0, U
+from electric_sense import (sphere_arrays, compute_electric_sense, compute_electric_sense_batch,
+                            READOUT_W, READOUT_A)
+
+"""
+Cartes de perception pré-calculées pour les scènes statiques.
+
+Pour une scène fixe, (I_ax, I_lat, I_vert) ne dépend que de la pose
+(x, y, θ) du robot. On l'échantillonne sur une grille régulière en (x, y) et
+en θ (périodique), et on le reconstruit par interpolation trilinéaire.
+
+La grille est remplie paresseusement, par tuiles de tile×tile×tile_theta
+cellules : seules les régions de l'espace des poses visitées par les
+trajectoires sont calculées, en un seul appel vectorisé par tuile. Toutes
+les simulations d'une même scène (comportements, gains) partagent la carte
+et ne paient chaque tuile qu'une fois. Une tuile contient plus de poses que
+la trajectoire n'en visite : le premier passage dans une région coûte plus
+cher que le calcul exact, les suivants se réduisent à une interpolation
+(coût indépendant du nombre de sphères).
+
+Les cartes sont indexées par une empreinte du contenu de la scène et des
+paramètres du capteur (scene_hash), gardées en mémoire par un cache LRU
+(SenseMapCache) et, en option, enregistrées sur disque.
+
+L'erreur d'interpolation croît sans limite près des objets (la réponse y
+varie en 1/d⁴). Une tuile dont une pose peut amener une électrode à moins de
+near_distance de la surface d'une sphère n'est donc pas calculée : les poses
+qui y tombent sont calculées exactement. Ailleurs, l'erreur trilinéaire
+vérifie |f - f_h| ≤ Σd h_d²/8·max|∂dd f| sur la cellule ; pour une sphère
+d'intensité s dont les électrodes sont à au moins r (voir
+sense_table : |∂e∂e fk| ≤ 20·Sk·|s|/r⁶, |∂e fk| ≤ 4·Sk·|s|/r⁵ avec
+Sk = Σα|Akα|·Σβ|wβ|), et ρ ≤ r + R_e la distance du centre du capteur à la
+sphère (R_e : rayon des électrodes dans le plan), la rotation donnant
+|∂θθ f| ≤ ρ²·max|∂e∂e f| + ρ·max|∂e f| :
+
+    |δfk| ≤ Σn |sn|·Sk·[h²/8·40/rn⁶ + dθ²/8·(20·ρn²/rn⁶ + 4·ρn/rn⁵)]
+
+avec rn ≥ an + near_distance. Cette borne est évaluée par tuile avec la
+distance de chaque sphère à la tuile (SenseMap.error_bound(pose)) et, pour
+toute la carte, avec rn = an + near_distance (SenseMap.error_bound()).
+SenseMap.error mesure l'écart réel sur des poses données. Comme pour
+sense_table, des trajectoires longues peuvent diverger du chemin exact
+malgré une erreur faible à chaque pas.
+"""
+
+def scene_hash(spheres):
+    """Empreinte du contenu d'une scène et des paramètres du capteur
+
+    Pour une Scene, l'empreinte est mise en cache jusqu'à la prochaine
+    modification.
+    """
+    if hasattr(spheres, 'content_hash'):
+        return spheres.content_hash()
+    positions, radii, chis = sphere_arrays(spheres)
+    return content_hash(np.column_stack([positions, radii, chis]))
+
+# Rayon des électrodes autour du centre du capteur, dans le plan [m]
+ELECTRODE_REACH = float(np.max(np.hypot(X_ELECTRODES, Y_ELECTRODES)))
+
+def interpolation_error(strengths, r, resolution, d_theta):
+    """Borne de l'erreur trilinéaire (3,) de sphères dont les électrodes sont à au moins r
+
+    Args:
+        strengths: Intensités de polarisation s = χa³ (N,) [m³]
+        r: Distance minimale des électrodes au centre de chaque sphère (N,) [m]
+        resolution: Pas de la grille en x et y [m]
+        d_theta: Pas de la grille en θ [rad]
+    """
+    S = np.abs(READOUT_A).sum(axis=1) * np.abs(READOUT_W).sum()
+    rho = r + ELECTRODE_REACH
+    per_unit = (resolution**2 / 8 * 40 / r**6
+                + d_theta**2 / 8 * (20 * rho**2 / r**6 + 4 * rho / r**5))
+    return S * (np.abs(strengths) @ per_unit)
+
+def content_hash(array):
+    """Empreinte d'un tableau de scène (N, 5) et des constantes du capteur"""
+    h = hashlib.sha1()
+    for a in (array, X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES, C0, U, GAMMA):
+        h.update(np.ascontiguousarray(a, dtype=float).tobytes())
+    return h.hexdigest()
+
+class SenseMap:
+    """Carte (I_ax, I_lat, I_vert) d'une scène statique sur une grille (x, y, θ)
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere), supposée fixe
+        extent: Demi-largeur de la zone couverte [m] ; hors zone, la
+                perception est calculée exactement
+        resolution: Pas de la grille en x et y [m]
+        n_theta: Nombre d'orientations échantillonnées sur [0, 2π)
+        tile: Nombre de cellules par côté d'une tuile en x et y
+        tile_theta: Nombre de cellules d'une tuile en θ (divise n_theta)
+        near_distance: Distance minimale des électrodes à la surface des
+                       sphères pour interpoler [m] ; les tuiles plus proches
+                       sont calculées exactement à chaque pose
+        chunk_size: Nombre maximal de couples (pose, sphère) par appel
+                    vectorisé
+    """
+    def __init__(self, spheres, extent=2.5, resolution=0.025, n_theta=64, tile=4, tile_theta=4,
+                 near_distance=0.1, chunk_size=2**16):
+        if n_theta % tile_theta:
+            raise ValueError("tile_theta doit diviser n_theta")
+        self.spheres = spheres
+        self.key = scene_hash(spheres)
+        self.extent = extent
+        self.resolution = resolution
+        self.n_theta = n_theta
+        self.tile = tile
+        self.tile_theta = tile_theta
+        self.near_distance = near_distance
+        self.chunk_size = chunk_size
+        self.n_cells = int(np.ceil(2 * extent / resolution))
+        self.d_theta = 2*np.pi / n_theta
+        self.tiles = {}     # (ti, tj, tk) -> (tile+1, tile+1, tile_theta+1, 3), None si calcul exact
+        self.tile_errors = {}   # (ti, tj) -> borne de l'erreur (3,), inf si calcul exact
+        self.n_computed = 0
+        _, radii, chis = sphere_arrays(spheres)
+        self.max_error = interpolation_error(chis * radii**3, radii + near_distance,
+                                             resolution, self.d_theta)
+
+    @property
+    def params(self):
+        return {'extent': self.extent, 'resolution': self.resolution, 'n_theta': self.n_theta,
+                'tile': self.tile, 'tile_theta': self.tile_theta, 'near_distance': self.near_distance}
+
+    def _tile_error(self, ti, tj):
+        """Borne de l'erreur sur une tuile (toutes orientations), inf si trop proche d'une sphère"""
+        if (ti, tj) not in self.tile_errors:
+            size = self.tile * self.resolution
+            x0 = -self.extent + ti * size
+            y0 = -self.extent + tj * size
+            positions, radii, chis = sphere_arrays(self.spheres)
+            positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+            # Distance du centre de chaque sphère au rectangle des positions du capteur
+            dx = np.maximum(np.maximum(x0 - positions[:, 0], positions[:, 0] - x0 - size), 0)
+            dy = np.maximum(np.maximum(y0 - positions[:, 1], positions[:, 1] - y0 - size), 0)
+            r = np.hypot(dx, dy) - ELECTRODE_REACH
+            if np.any(r - radii < self.near_distance):
+                self.tile_errors[ti, tj] = np.full(3, np.inf)
+            else:
+                self.tile_errors[ti, tj] = interpolation_error(chis * radii**3, r, self.resolution,
+                                                               self.d_theta)
+        return self.tile_errors[ti, tj]
+
+    def _compute_tile(self, ti, tj, tk):
+        """Calcule exactement les nœuds d'une tuile"""
+        i = ti * self.tile + np.arange(self.tile + 1)
+        j = tj * self.tile + np.arange(self.tile + 1)
+        k = tk * self.tile_theta + np.arange(self.tile_theta + 1)
+        I, J, Kt = np.meshgrid(i, j, k, indexing='ij')
+        x = -self.extent + I.ravel() * self.resolution
+        y = -self.extent + J.ravel() * self.resolution
+        theta = Kt.ravel() * self.d_theta
+
+        positions, radii, chis = sphere_arrays(self.spheres)
+        strengths = chis * radii**3
+        step = max(1, self.chunk_size // max(len(strengths), 1))
+        values = np.empty((len(x), 3))
+        for start in range(0, len(x), step):
+            chunk = slice(start, start + step)
+            m = len(x[chunk])
+            sensor_positions = np.column_stack([x[chunk], y[chunk], np.zeros(m)])
+            values[chunk] = np.column_stack(compute_electric_sense_batch(
+                np.broadcast_to(positions, (m,) + positions.shape),
+                np.broadcast_to(strengths, (m,) + strengths.shape),
+                sensor_positions, theta[chunk]))
+        self.n_computed += len(x)
+        return values.reshape(self.tile + 1, self.tile + 1, self.tile_theta + 1, 3)
+
+    def _tile(self, key):
+        """Nœuds de la tuile, None si ses poses sont calculées exactement"""
+        if key not in self.tiles:
+            near = np.isinf(self._tile_error(*key[:2])).any()
+            self.tiles[key] = None if near else self._compute_tile(*key)
+        return self.tiles[key]
+
+    def _in_map(self, x, y):
+        return (np.abs(x) < self.extent) & (np.abs(y) < self.extent)
+
+    def _cells(self, x, y, theta):
+        """Indices de cellule (i, j, k) et coordonnées locales (u, v, w) dans [0, 1]"""
+        gx = (x + self.extent) / self.resolution
+        gy = (y + self.extent) / self.resolution
+        gt = np.mod(theta, 2*np.pi) / self.d_theta
+        i = np.minimum(np.floor(gx).astype(np.int64), self.n_cells - 1)
+        j = np.minimum(np.floor(gy).astype(np.int64), self.n_cells - 1)
+        k = np.minimum(np.floor(gt).astype(np.int64), self.n_theta - 1)
+        return i, j, k, gx - i, gy - j, gt - k
+
+    def responses(self, sensor_positions, sensor_orientations):
+        """(I_ax, I_lat, I_vert) interpolés pour M poses, (M, 3)
+
+        Les poses hors de la zone couverte ou trop proches d'une sphère
+        (near_distance) sont calculées exactement.
+        """
+        sensor_positions = np.atleast_2d(np.asarray(sensor_positions, dtype=float))
+        theta = np.broadcast_to(np.asarray(sensor_orientations, dtype=float), (len(sensor_positions),))
+        x, y = sensor_positions[:, 0], sensor_positions[:, 1]
+        out = np.empty((len(x), 3))
+
+        inside = self._in_map(x, y)
+        i, j, k, u, v, w = self._cells(x[inside], y[inside], theta[inside])
+        ti, tj, tk = i // self.tile, j // self.tile, k // self.tile_theta
+        a, b, c = i - ti * self.tile, j - tj * self.tile, k - tk * self.tile_theta
+        tile_ids = np.stack([ti, tj, tk], axis=-1)
+
+        # Interpolation trilinéaire, tuile par tuile
+        values = np.empty((len(i), 3))
+        unique, group = np.unique(tile_ids, axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        exact = np.zeros(len(i), dtype=bool)
+        for g, key in enumerate(map(tuple, unique.tolist())):
+            sel = group == g
+            T = self._tile(key)
+            if T is None:
+                exact[sel] = True
+                continue
+            aa, bb, cc = a[sel], b[sel], c[sel]
+            uu, vv, ww = u[sel, None], v[sel, None], w[sel, None]
+            total = 0
+            for da, wa in ((0, 1 - uu), (1, uu)):
+                for db, wb in ((0, 1 - vv), (1, vv)):
+                    for dc, wc in ((0, 1 - ww), (1, ww)):
+                        total = total + wa * wb * wc * T[aa + da, bb + db, cc + dc]
+            values[sel] = total
+        out[inside] = values
+        inside[inside] = ~exact
+
+        for m in np.flatnonzero(~inside):
+            out[m] = compute_electric_sense(self.spheres, sensor_positions[m], theta[m])
+        return out
+
+    def _response(self, sensor_position, sensor_orientation):
+        """Version scalaire de responses pour une pose (chemin de simulate_behavior)"""
+        x, y = float(sensor_position[0]), float(sensor_position[1])
+        if not (abs(x) < self.extent and abs(y) < self.extent):
+            return np.array(compute_electric_sense(self.spheres, sensor_position, sensor_orientation))
+        i, j, k, u, v, w = self._cells(x, y, float(sensor_orientation))
+        ti, tj, tk = int(i) // self.tile, int(j) // self.tile, int(k) // self.tile_theta
+        T = self._tile((ti, tj, tk))
+        if T is None:
+            return np.array(compute_electric_sense(self.spheres, sensor_position, sensor_orientation))
+        a, b, c = i - ti * self.tile, j - tj * self.tile, k - tk * self.tile_theta
+        corners = T[a:a+2, b:b+2, c:c+2]
+        weights = np.einsum('i,j,k->ijk', [1 - u, u], [1 - v, v], [1 - w, w])
+        return np.einsum('ijk,ijkl->l', weights, corners)
+
+    def compute_electric_sense(self, spheres, sensor_position, sensor_orientation):
+        """Remplace compute_electric_sense (argument sense de simulate_behavior)
+
+        spheres doit être la scène de la carte ; il n'est pas relu.
+        """
+        I_ax, I_lat, I_vert = self._response(sensor_position, sensor_orientation)
+        return I_ax, I_lat, I_vert
+
+    def error_bound(self, sensor_position=None):
+        """Borne de l'erreur d'interpolation sur (I_ax, I_lat, I_vert)
+
+        Sans pose, borne valable sur toute la carte (électrodes à
+        near_distance des surfaces). Avec la position du capteur, borne
+        de sa tuile, bien plus fine ; 0 pour les poses calculées exactement.
+        """
+        if sensor_position is None:
+            return self.max_error
+        x, y = float(sensor_position[0]), float(sensor_position[1])
+        if not (abs(x) < self.extent and abs(y) < self.extent):
+            return np.zeros(3)
+        i, j, _, _, _, _ = self._cells(x, y, 0.0)
+        bound = self._tile_error(int(i) // self.tile, int(j) // self.tile)
+        return np.zeros(3) if np.isinf(bound).any() else bound
+
+    def error(self, sensor_positions, sensor_orientations):
+        """Écart |interpolé - exact| (M, 3) sur des poses données"""
+        sensor_positions = np.atleast_2d(np.asarray(sensor_positions, dtype=float))
+        theta = np.atleast_1d(np.asarray(sensor_orientations, dtype=float))
+        exact = np.array([compute_electric_sense(self.spheres, p, t)
+                          for p, t in zip(sensor_positions, theta)])
+        return np.abs(self.responses(sensor_positions, theta) - exact)
+
+    # Persistance : un fichier .npz par scène et jeu de paramètres
+    def filename(self):
+        p = self.params
+        return (f"{self.key}_{p['extent']}_{p['resolution']}_{p['n_theta']}_{p['tile']}_{p['tile_theta']}"
+                f"_{p['near_distance']}.npz")
+
+    def save(self, directory):
+        """Enregistre les tuiles calculées dans `directory`"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        ids = np.array(sorted(t for t, values in self.tiles.items() if values is not None),
+                       dtype=np.int64).reshape(-1, 3)
+        tiles = np.array([self.tiles[tuple(t)] for t in ids]).reshape(
+            (len(ids), self.tile + 1, self.tile + 1, self.tile_theta + 1, 3))
+        np.savez(directory / self.filename(), ids=ids, tiles=tiles)
+
+    def load_tiles(self, directory):
+        """Ajoute les tuiles enregistrées dans `directory`, s'il y en a"""
+        path = Path(directory) / self.filename()
+        if not path.exists():
+            return False
+        with np.load(path) as data:
+            for t, values in zip(data['ids'], data['tiles']):
+                self.tiles.setdefault(tuple(int(v) for v in t), values)
+        return True
+
+class SenseMapCache:
+    """Cache LRU de cartes de perception, indexé par empreinte de scène
+
+    Args:
+        maxsize: Nombre maximal de cartes gardées en mémoire
+        directory: Dossier de persistance (optionnel) : les cartes y sont
+                   relues à la création et enregistrées à l'éviction ou
+                   par save()
+        map_kwargs: Paramètres de SenseMap (resolution, n_theta, ...)
+    """
+    def __init__(self, maxsize=8, directory=None, **map_kwargs):
+        self.maxsize = maxsize
+        self.directory = None if directory is None else Path(directory)
+        self.map_kwargs = map_kwargs
+        self.maps = OrderedDict()
+
+    def get(self, spheres):
+        """Carte de la scène, créée (ou relue sur disque) si absente"""
+        key = scene_hash(spheres)
+        if key in self.maps:
+            self.maps.move_to_end(key)
+            return self.maps[key]
+        sense_map = SenseMap(spheres, **self.map_kwargs)
+        if self.directory is not None:
+            sense_map.load_tiles(self.directory)
+        self.maps[key] = sense_map
+        while len(self.maps) > self.maxsize:
+            _, evicted = self.maps.popitem(last=False)
+            if self.directory is not None:
+                evicted.save(self.directory)
+        return sense_map
+
+    def save(self):
+        """Enregistre toutes les cartes en mémoire sur disque"""
+        if self.directory is None:
+            raise ValueError("SenseMapCache sans dossier de persistance")
+        for sense_map in self.maps.values():
+            sense_map.save(self.directory)
+
+    def compute_electric_sense(self, spheres, sensor_position, sensor_orientation):
+        """Remplace compute_electric_sense (argument sense de simulate_behavior)"""
+        return self.get(spheres).compute_electric_sense(spheres, sensor_position, sensor_orientation)
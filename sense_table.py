@@ -0,0 +1,259 @@
+# sense_table.py
+import numpy as np
+from constants import X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES, GAMMA, C0, U
+from electric_sense import sphere_arrays, readout_dipoles, READOUT_W, READOUT_A
+
+"""
+Mode de perception rapide par table pré-calculée.
+
+Avec P = χa³I, la contribution d'une sphère à K est linéaire en s = χa³ et ne
+dépend sinon que de la position q de la sphère dans le repère du robot
+(les électrodes y sont fixes) :
+
+    (I_ax, I_lat, I_vert) = Σn sn·f(qn)
+
+On tabule la réponse normalisée f(q) sur une grille régulière du plan du robot
+(qz = 0) et on la reconstruit par interpolation bilinéaire.
+
+Borne d'erreur : pour une fonction de classe C², l'erreur d'interpolation
+bilinéaire sur une cellule de pas h vérifie |f - f_h| ≤ h²/8·(max|∂xx f| +
+max|∂yy f|), les maxima étant pris sur la cellule. Avec f = -Σαβ Aα·wβ·Fα·Fβ
+(Fα = rα/||rα||³, voir electric_sense.readout_dipoles), on a |Fα| = 1/rα²,
+|∂e Fα| ≤ 2/rα³ et |∂e∂e Fα| ≤ 6/rα⁴ pour toute direction unité e, d'où
+
+    |∂e∂e fk| ≤ Σαβ |Akα|·|wβ|·(6/(rα⁴rβ²) + 8/(rα³rβ³) + 6/(rα²rβ⁴))
+
+majoration décroissante en chaque rα : on l'évalue avec la distance minimale
+de chaque électrode à la cellule. On obtient ainsi `cell_error`, une borne
+garantie de l'erreur en tout point de chaque cellule (et non une mesure).
+Pour une pose, l'erreur sur chaque composante est bornée par
+Σn|sn|·cell_error(qn) (voir error_bound), et globalement par unit_error·Σn|sn|
+où unit_error est le maximum de cell_error sur les cellules utilisables. Cette
+borne globale est dominée par les cellules proches de r_min et donc très
+pessimiste ; la borne par pose est celle à utiliser. La table n'est utilisée
+que dans les cellules dont tous les points sont à au moins r_min de chaque
+électrode (masque `usable`, calculé une fois) : les sphères tombant dans une
+autre cellule, hors de la grille ou hors du plan du robot sont calculées par
+le chemin exact (erreur nulle). Le choix du chemin ne coûte ainsi qu'une
+lecture du masque par sphère, et la table doit couvrir toute la scène vue
+depuis les poses du robot pour que le chemin exact reste l'exception.
+
+Le système étant sensible aux conditions initiales près des obstacles, des
+trajectoires longues peuvent diverger du chemin exact malgré une erreur de
+perception faible à chaque pas.
+"""
+
+def unit_response(q):
+    """Réponse exacte (I_ax, I_lat, I_vert) d'une source de polarisation unité
+
+    Args:
+        q: Positions des sources dans le repère du robot (..., 3) [m]
+
+    Returns:
+        np.array (..., 3)
+    """
+    q = np.asarray(q, dtype=float)
+    electrodes = np.stack([X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES], axis=-1)
+
+    # Fα = rα/||rα||³ (..., 5, 3)
+    r = electrodes - q[..., None, :]
+    r_norm = np.sqrt(np.sum(r*r, axis=-1))
+    F = r / r_norm[..., None]**3
+
+    # δI = -C0·K·C0·U avec K = F·Fᵀ/(4πγ), sans former K
+    w = C0 @ U
+    Fw = np.einsum('...ai,a->...i', F, w)
+    K_w = np.einsum('...ai,...i->...a', F, Fw) / (4*np.pi*GAMMA)
+    delta_I = -K_w @ C0.T
+
+    I_ax = (delta_I[..., 1] + delta_I[..., 2] + delta_I[..., 3] + delta_I[..., 4])/4
+    I_lat = delta_I[..., 1] - delta_I[..., 3]
+    I_vert = delta_I[..., 2] - delta_I[..., 4]
+    return np.stack([I_ax, I_lat, I_vert], axis=-1)
+
+def to_robot_frame(positions, sensor_position, sensor_orientation):
+    """Positions (..., N, 3) exprimées dans le repère du (des) capteur(s)"""
+    sensor_position = np.asarray(sensor_position, dtype=float)
+    theta = np.asarray(sensor_orientation, dtype=float)
+    c, s = np.cos(theta), np.sin(theta)
+    zero, one = np.zeros_like(theta), np.ones_like(theta)
+    # Transposée de la rotation d'angle -θ, pour d @ rotation
+    rotation = np.stack([np.stack([c, -s, zero], axis=-1),
+                         np.stack([s, c, zero], axis=-1),
+                         np.stack([zero, zero, one], axis=-1)], axis=-2)
+    d = np.asarray(positions, dtype=float) - sensor_position[..., None, :]
+    return d @ rotation
+
+class SenseTable:
+    """Table de réponse normalisée f(q) sur une grille du plan du robot
+
+    Attributes:
+        x, y: Axes de la grille (repère robot) [m]
+        response: Réponse tabulée (nx, ny, 3)
+        r_min: Distance minimale aux électrodes pour utiliser la table [m]
+        usable: Cellules entièrement à plus de r_min des électrodes (nx-1, ny-1)
+        cell_error: Borne de l'erreur d'interpolation sur chaque cellule,
+                    par unité de χa³ (nx-1, ny-1, 3)
+        unit_error: Maximum de cell_error sur les cellules utilisables
+    """
+    def __init__(self, x, y, response, r_min):
+        self.x = x
+        self.y = y
+        self.response = response
+        self.r_min = r_min
+        self.h = x[1] - x[0]
+        self._flat = np.ascontiguousarray(response).reshape(-1, 3)
+        r2 = self._cell_distance2()
+        self.usable = r2.min(axis=-1) >= r_min**2
+        self._usable = np.pad(self.usable, 1).ravel()
+        self.cell_error = self._cell_error_bound(r2)
+
+        # Erreur maximale sur les cellules utilisables
+        self.unit_error = self.cell_error[self.usable].max(axis=0) if self.usable.any() else np.zeros(3)
+
+    @classmethod
+    def build(cls, extent=3.0, resolution=0.01, r_min=0.05, chunk_size=100000):
+        """Calcule la table sur [-extent, extent]² avec un pas `resolution`"""
+        n = int(round(2*extent/resolution)) + 1
+        x = np.linspace(-extent, extent, n)
+        y = np.linspace(-extent, extent, n)
+        X, Y = np.meshgrid(x, y, indexing='ij')
+        q = np.stack([X.ravel(), Y.ravel(), np.zeros(X.size)], axis=-1)
+
+        response = np.empty((q.shape[0], 3))
+        for start in range(0, len(q), chunk_size):
+            response[start:start+chunk_size] = unit_response(q[start:start+chunk_size])
+        return cls(x, y, response.reshape(n, n, 3), r_min)
+
+    def _cell_distance2(self):
+        """Carré de la distance de chaque électrode à chaque cellule (nx-1, ny-1, 5)"""
+        electrodes = self._electrodes()
+        x0, y0 = self.x[:-1, None, None], self.y[None, :-1, None]
+        # Distance de chaque électrode au rectangle de chaque cellule (plan z = 0)
+        dx = np.maximum(np.maximum(x0 - electrodes[:, 0], electrodes[:, 0] - x0 - self.h), 0)
+        dy = np.maximum(np.maximum(y0 - electrodes[:, 1], electrodes[:, 1] - y0 - self.h), 0)
+        return dx**2 + dy**2 + electrodes[:, 2]**2
+
+    def _cell_error_bound(self, r2):
+        """Borne h²/8·(max|∂xx f| + max|∂yy f|) sur chaque cellule (nx-1, ny-1, 3)"""
+        A, w = np.abs(READOUT_A), np.abs(READOUT_W)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_r = 1 / np.sqrt(r2)
+            second = (6 * (inv_r**4 @ A.T) * (inv_r**2 @ w)[..., None]
+                      + 8 * (inv_r**3 @ A.T) * (inv_r**3 @ w)[..., None]
+                      + 6 * (inv_r**2 @ A.T) * (inv_r**4 @ w)[..., None])
+        # Cellules contenant une électrode (jamais utilisées, r < r_min) : pas de borne
+        return np.where(np.isnan(second), np.inf, self.h**2 / 4 * second)
+
+    def save(self, path):
+        """Enregistre la table (format .npz)"""
+        np.savez_compressed(path, x=self.x, y=self.y, response=self.response, r_min=self.r_min,
+                            electrodes=self._electrodes(), C0=C0, U=U)
+
+    @classmethod
+    def load(cls, path):
+        """Recharge une table, en vérifiant qu'elle correspond au capteur actuel"""
+        data = np.load(path)
+        if not (np.array_equal(data['electrodes'], cls._electrodes())
+                and np.array_equal(data['C0'], C0) and np.array_equal(data['U'], U)):
+            raise ValueError(f"La table {path} a été calculée pour un autre capteur")
+        return cls(data['x'], data['y'], data['response'], float(data['r_min']))
+
+    @classmethod
+    def load_or_build(cls, path, **build_kwargs):
+        """Recharge la table si elle existe et est valide, la calcule sinon"""
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError):
+            table = cls.build(**build_kwargs)
+            table.save(path)
+            return table
+
+    @staticmethod
+    def _electrodes():
+        return np.stack([X_ELECTRODES, Y_ELECTRODES, Z_ELECTRODES], axis=-1)
+
+    def _locate(self, q):
+        """Positions servies par la table, avec leurs cellules et coordonnées locales
+
+        Returns:
+            in_table (...), indices aplatis du nœud (i, j) de la cellule,
+            tx et ty (...) ; hors table, la cellule est ramenée dans la grille
+            et ne doit pas être utilisée
+        """
+        nx, ny = self.usable.shape
+        fx = (q[..., 0] - self.x[0]) / self.h
+        fy = (q[..., 1] - self.y[0]) / self.h
+        # Le masque bordé (_usable) rejette les cellules hors de la grille
+        i = np.clip(np.floor(fx), -1, nx).astype(np.int64)
+        j = np.clip(np.floor(fy), -1, ny).astype(np.int64)
+        at_edge = (fx == nx) | (fy == ny)  # bord supérieur : dernière cellule
+        if at_edge.any():
+            i = np.where(fx == nx, nx - 1, i)
+            j = np.where(fy == ny, ny - 1, j)
+        in_table = np.take(self._usable, (i + 1) * (ny + 2) + j + 1) & (np.abs(q[..., 2]) < 1e-12)
+        np.clip(i, 0, nx - 1, out=i)
+        np.clip(j, 0, ny - 1, out=j)
+        return in_table, i * (ny + 1) + j, fx - i, fy - j
+
+    def _weighted_sum(self, weights, q):
+        """Σn weights_n·f(q_n) (3,) pour weights (N,) et q (N, 3)"""
+        in_table, k, tx, ty = self._locate(q)
+        ny = self.usable.shape[1] + 1
+        T = self._flat
+        w = np.where(in_table, weights, 0.0)
+        wx, w1x = w * tx, w * (1 - tx)
+        I = ((w1x - w1x*ty) @ np.take(T, k, axis=0) + (wx - wx*ty) @ np.take(T, k + ny, axis=0)
+             + (w1x*ty) @ np.take(T, k + 1, axis=0) + (wx*ty) @ np.take(T, k + ny + 1, axis=0))
+        if not in_table.all():
+            out = ~in_table
+            # Chemin exact dans le repère du robot (capteur à l'origine, θ = 0)
+            I = I + readout_dipoles(q[out], weights[out], np.zeros(3), 0.0)
+        return I
+
+    def responses(self, q):
+        """Réponses normalisées f(q), par la table si possible, exactes sinon"""
+        q = np.asarray(q, dtype=float)
+        in_table, k, tx, ty = self._locate(q)
+        k, tx, ty = k[in_table], tx[in_table, None], ty[in_table, None]
+        ny = self.usable.shape[1] + 1
+        T = self._flat
+        f = np.empty(q.shape[:-1] + (3,))
+        f[in_table] = ((1-tx)*(1-ty)*np.take(T, k, axis=0) + tx*(1-ty)*np.take(T, k + ny, axis=0)
+                       + (1-tx)*ty*np.take(T, k + 1, axis=0) + tx*ty*np.take(T, k + ny + 1, axis=0))
+        f[~in_table] = unit_response(q[~in_table])
+        return f
+
+    def compute_electric_sense(self, spheres, sensor_position, sensor_orientation):
+        """Remplace compute_electric_sense : même signature, mêmes sorties"""
+        positions, radii, chis = sphere_arrays(spheres)
+        q = to_robot_frame(positions, sensor_position, sensor_orientation)
+        I = self._weighted_sum(chis * radii**3, q)
+        return I[0], I[1], I[2]
+
+    def compute_electric_sense_batch(self, positions, strengths, sensor_positions, sensor_orientations):
+        """Remplace electric_sense.compute_electric_sense_batch"""
+        strengths = np.asarray(strengths, dtype=float)
+        q = to_robot_frame(positions, sensor_positions, sensor_orientations)
+        active = strengths != 0  # ignore les sphères fictives de remplissage
+        f = np.zeros(q.shape[:-1] + (3,))
+        f[active] = self.responses(q[active])
+        I = np.einsum('mn,mnk->mk', strengths, f)
+        return I[:, 0], I[:, 1], I[:, 2]
+
+    def error_bound(self, spheres, sensor_position=None, sensor_orientation=0.0):
+        """Borne de l'erreur sur (I_ax, I_lat, I_vert) pour une scène
+
+        Sans pose, borne globale unit_error·Σ|χa³| (très pessimiste). Avec
+        la pose du capteur, borne locale Σ|χa³|·cell_error(q), bien plus fine.
+        """
+        positions, radii, chis = sphere_arrays(spheres)
+        weights = np.abs(chis * radii**3)
+        if sensor_position is None:
+            return self.unit_error * np.sum(weights)
+
+        q = to_robot_frame(positions, sensor_position, sensor_orientation)
+        in_table, k, _, _ = self._locate(q)
+        k = k[in_table]
+        ny = self.usable.shape[1] + 1
+        return weights[in_table] @ self.cell_error[k // ny, k % ny]
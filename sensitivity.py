@@ -0,0 +1,128 @@
+# sensitivity.py
+import numpy as np
+from electric_sense import sphere_arrays, electrode_positions, READOUT_W, READOUT_A
+
+"""
+Dérivées analytiques des courants perçus par rapport à la pose du robot
+(x, y, θ) et, en option, aux positions et χ des sphères.
+
+Avec Fnα = rnα/||rnα||³ (rnα = eα - pn) et un = Σβ wβ·Fnβ (w = C0·U), les
+courants valent I = -A·v avec vα = Σn sn·Fnα·un (voir readout_dipoles).
+La dérivée de F par rapport à r est J = (Id - 3·r̂·r̂ᵀ)/||r||³ (symétrique) ;
+une électrode eα = p + R(θ)·lα se déplace de (1, 0, 0), (0, 1, 0) et
+ẑ × (eα - p) selon x, y et θ. Toutes les dérivées s'obtiennent dans la même
+passe que les courants, par lots de poses.
+"""
+
+# Indices des composantes des courants et des coordonnées de pose
+CURRENTS = ('I_ax', 'I_lat', 'I_vert')
+POSE = ('x', 'y', 'theta')
+
+def _J(r, inv_r3, inv_r2, d):
+    """J·d pour des vecteurs r (..., 3) et des directions d (..., 3)"""
+    rd = np.einsum('...i,...i->...', r, d)
+    return inv_r3[..., None] * (d - 3 * r * (rd * inv_r2)[..., None])
+
+def _chunk_jacobian(positions, strengths, radii3, sensor_positions, sensor_orientations, wrt_spheres):
+    electrodes = electrode_positions(sensor_positions, sensor_orientations)  # (Q, 5, 3)
+    r = electrodes[:, None, :, :] - positions[None, :, None, :]             # (Q, N, 5, 3)
+    inv_r2 = 1 / np.einsum('qnai,qnai->qna', r, r)
+    inv_r3 = inv_r2**1.5
+    F = r * inv_r3[..., None]
+    u = np.einsum('b,qnbi->qni', READOUT_W, F)
+    su = u * strengths[None, :, None]
+    currents = -np.einsum('ka,qnai,qni->qk', READOUT_A, F, su)
+
+    # Déplacements des électrodes (Q, 3, 5, 3) selon x, y et θ
+    arm = electrodes - np.asarray(sensor_positions, dtype=float)[:, None, :]
+    moves = np.zeros((len(electrodes), 3, 5, 3))
+    moves[:, 0, :, 0] = 1
+    moves[:, 1, :, 1] = 1
+    moves[:, 2, :, 0] = -arm[..., 1]
+    moves[:, 2, :, 1] = arm[..., 0]
+
+    dF = _J(r[:, :, None], inv_r3[:, :, None], inv_r2[:, :, None], moves[:, None])  # (Q, N, 3, 5, 3)
+    du = np.einsum('b,qnjbi->qnji', READOUT_W, dF)
+    dv = (np.einsum('qnjai,qni->qaj', dF, su)
+          + np.einsum('qnai,qnji,n->qaj', F, du, strengths))
+    d_pose = -np.einsum('ka,qaj->qkj', READOUT_A, dv)
+    if not wrt_spheres:
+        return currents, d_pose
+
+    # dI/dpn = sn·(Σα Aα·J(rnα)·un + Σβ wβ·J(rnβ)·gn), gn = Σα Aα·Fnα (par composante)
+    g = np.einsum('ka,qnai->qnki', READOUT_A, F)
+    term1 = np.einsum('ka,qnai->qnki', READOUT_A, _J(r, inv_r3, inv_r2, u[:, :, None, :]))
+    term2 = np.einsum('b,qnbki->qnki', READOUT_W,
+                      _J(r[:, :, :, None], inv_r3[:, :, :, None], inv_r2[:, :, :, None], g[:, :, None]))
+    d_positions = ((term1 + term2) * strengths[None, :, None, None]).transpose(0, 2, 1, 3)
+    d_chis = -np.einsum('qnki,qni->qkn', g, u) * radii3[None, None, :]
+    return currents, d_pose, d_positions, d_chis
+
+def sense_jacobian(spheres, sensor_positions, sensor_orientations, wrt_spheres=False, chunk_size=2**20):
+    """Courants et leurs dérivées analytiques, pour une pose ou un lot de poses
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere)
+        sensor_positions: Position(s) du capteur (3,) ou (P, 3)
+        sensor_orientations: Orientation(s) du capteur, scalaire ou (P,) [rad]
+        wrt_spheres: Calcule aussi les dérivées par rapport aux positions et
+                     aux χ des sphères
+        chunk_size: Nombre maximal de couples (pose, sphère, électrode) par
+                    lot, pour borner la mémoire
+
+    Returns:
+        Tuple (currents, d_pose) : courants (P, 3) (I_ax, I_lat, I_vert) et
+        dérivées d_pose[p, k, j] = ∂Ik/∂(x, y, θ)j (P, 3, 3) ; avec
+        wrt_spheres, aussi d_positions (P, 3, N, 3) = ∂Ik/∂pn et
+        d_chis (P, 3, N) = ∂Ik/∂χn. Sans la dimension P pour une seule pose.
+    """
+    single = np.ndim(sensor_orientations) == 0
+    sensor_positions = np.asarray(sensor_positions, dtype=float).reshape(-1, 3)
+    sensor_orientations = np.atleast_1d(np.asarray(sensor_orientations, dtype=float))
+    positions, radii, chis = sphere_arrays(spheres)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    radii3 = np.asarray(radii, dtype=float)**3
+    strengths = np.asarray(chis, dtype=float) * radii3
+
+    step = max(1, chunk_size // (5 * max(len(positions), 1) * (6 if wrt_spheres else 3)))
+    parts = [_chunk_jacobian(positions, strengths, radii3, sensor_positions[i:i + step],
+                             sensor_orientations[i:i + step], wrt_spheres)
+             for i in range(0, len(sensor_orientations), step)]
+    results = tuple(np.concatenate(arrays) for arrays in zip(*parts))
+    return tuple(a[0] for a in results) if single else results
+
+def closed_loop_jacobian(behavior, spheres, sensor_positions, sensor_orientations):
+    """Linéarisation de la boucle fermée (ẋ, ẏ, θ̇) = (v·cosθ, v·sinθ, ω(I))
+
+    ω = ±k·I_lat/(I_ax + ε) (B1, B2) ou ±k·I_lat/|I_ax| (B3, B4), comme dans
+    ElectricBehavior.compute_command. Le spectre de la jacobienne donne la
+    stabilité locale, et ∂ω/∂k = ω/k la sensibilité au gain.
+
+    Returns:
+        Tuple (jacobian (P, 3, 3), dw_dk (P,)), sans la dimension P pour une
+        seule pose
+    """
+    single = np.ndim(sensor_orientations) == 0
+    theta = np.atleast_1d(np.asarray(sensor_orientations, dtype=float))
+    currents, d_pose = sense_jacobian(spheres, np.asarray(sensor_positions, dtype=float).reshape(-1, 3),
+                                      theta)
+    I_ax, I_lat = currents[:, 0], currents[:, 1]
+    epsilon = 1e-10  # Même seuil que compute_command
+    bt = behavior.behavior_type
+    sign = 1.0 if bt in (1, 3) else -1.0
+    if bt in (1, 2):
+        denominator, d_denominator = I_ax + epsilon, d_pose[:, 0]
+    else:
+        denominator, d_denominator = np.abs(I_ax), np.sign(I_ax)[:, None] * d_pose[:, 0]
+    valid = np.abs(I_ax) > epsilon
+    denominator = np.where(valid, denominator, 1.0)
+    gain = np.where(valid, sign * behavior.k_gain / denominator, 0.0)
+    dw = gain[:, None] * (d_pose[:, 1] - (I_lat / denominator)[:, None] * d_denominator)
+
+    v = behavior.forward_speed
+    jacobian = np.zeros((len(theta), 3, 3))
+    jacobian[:, 0, 2] = -v * np.sin(theta)
+    jacobian[:, 1, 2] = v * np.cos(theta)
+    jacobian[:, 2] = dw
+    dw_dk = gain * I_lat / behavior.k_gain if behavior.k_gain else np.zeros_like(gain)
+    return (jacobian[0], dw_dk[0]) if single else (jacobian, dw_dk)
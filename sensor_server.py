@@ -0,0 +1,330 @@
+# sensor_server.py
+import argparse
+import asyncio
+import struct
+import time
+from collections import namedtuple
+import numpy as np
+from constants import SIMULATION_TIME, DT
+from electric_sense import sphere_arrays, compute_electric_sense_batch
+
+"""
+Serveur de perception en boucle fermée, pour des contrôleurs externes.
+
+Chaque client (une connexion TCP locale ou un socket Unix) pilote son propre
+robot dans la scène du serveur : il envoie une commande (v, ω) et reçoit la
+nouvelle pose et les courants perçus. Le pas est celui de simulate_behavior
+(Euler, θ mis à jour en premier), suivi des tests de collision et de sortie ;
+un robot arrêté reste immobile jusqu'à un RESET.
+
+Les requêtes des clients en attente sont traitées ensemble : une seule
+évaluation vectorisée de la perception (compute_electric_sense_batch) par
+tick, quel que soit le nombre de sessions. Un tick commence dès qu'une
+requête arrive (ou après max_wait secondes pour en regrouper davantage).
+
+Protocole binaire, en petit-boutiste :
+- requête : REQUEST = (op, a, b, c) ; STEP : (v, ω, -), RESET : (x, y, θ)
+- réponse : RESPONSE = (t, x, y, θ, I_ax, I_lat, I_vert, status), status
+  valant RUNNING, COLLISION ou OUT_OF_BOUNDS
+À la connexion, le serveur envoie l'observation de la pose initiale (0, 0, 0).
+"""
+
+REQUEST = struct.Struct('<B3d')
+RESPONSE = struct.Struct('<8d')
+STEP, RESET = 0, 1
+RUNNING, COLLISION, OUT_OF_BOUNDS = 0, 1, 2
+
+Observation = namedtuple('Observation', ['t', 'x', 'y', 'theta', 'I_ax', 'I_lat', 'I_vert', 'status'])
+
+class _Session:
+    """État du robot d'un client"""
+    __slots__ = ('t', 'x', 'y', 'theta', 'status')
+
+    def __init__(self):
+        self.t, self.x, self.y, self.theta, self.status = 0.0, 0.0, 0.0, 0.0, RUNNING
+
+class SensorServer:
+    """Serveur asyncio de perception pour des robots pilotés par des clients
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere), partagée par les sessions
+        dt: Pas de temps d'un STEP [s]
+        bounds: Demi-taille de la scène [m]
+        collision_margin: Marge de collision [m]
+        sense: Fonction de perception par lot, de même signature que
+               compute_electric_sense_batch
+        max_wait: Délai de regroupement des requêtes avant un tick [s]
+    """
+    def __init__(self, spheres, dt=DT, bounds=2.5, collision_margin=0.05,
+                 sense=compute_electric_sense_batch, max_wait=0.0):
+        positions, radii, chis = sphere_arrays(spheres)
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.radii = np.asarray(radii, dtype=float)
+        self.strengths = np.asarray(chis, dtype=float) * self.radii**3
+        self.dt = dt
+        self.bounds = bounds
+        self.collision_margin = collision_margin
+        self.sense = sense
+        self.max_wait = max_wait
+        self.sessions = 0
+        self.ticks = 0
+        self.requests = 0
+        self.busy_time = 0.0  # Temps passé à traiter les ticks [s]
+        self._pending = []
+        self._wakeup = None
+        self._batcher = None
+
+    def process(self, batch):
+        """Traite un lot de requêtes [(session, op, a, b, c)] en une passe
+
+        Returns:
+            Liste des réponses (bytes), dans l'ordre du lot
+        """
+        M = len(batch)
+        sessions = [request[0] for request in batch]
+        op, a, b, c = np.array([request[1:] for request in batch], dtype=float).T
+        t, x, y, theta, status = np.array([(s.t, s.x, s.y, s.theta, s.status) for s in sessions],
+                                          dtype=float).reshape(M, 5).T.copy()
+
+        # RESET : nouvelle pose ; STEP : pas d'Euler pour les robots en mouvement
+        reset = op == RESET
+        x[reset], y[reset], theta[reset], t[reset], status[reset] = a[reset], b[reset], c[reset], 0.0, RUNNING
+        move = (op == STEP) & (status == RUNNING)
+        theta[move] += b[move] * self.dt
+        x[move] += a[move] * np.cos(theta[move]) * self.dt
+        y[move] += a[move] * np.sin(theta[move]) * self.dt
+        t[move] += self.dt
+
+        # Collisions et sorties à la nouvelle pose
+        check = move | reset
+        d = np.sqrt((x[check, None] - self.positions[:, 0])**2 + (y[check, None] - self.positions[:, 1])**2)
+        hit = (d < self.radii + self.collision_margin).any(axis=1)
+        out = ~hit & ((np.abs(x[check]) > self.bounds) | (np.abs(y[check]) > self.bounds))
+        status[check] = np.where(hit, COLLISION, np.where(out, OUT_OF_BOUNDS, RUNNING))
+
+        # Perception de toutes les sessions du tick en un appel
+        sensor_positions = np.stack([x, y, np.zeros(M)], axis=-1)
+        N = len(self.strengths)
+        I_ax, I_lat, I_vert = self.sense(np.broadcast_to(self.positions, (M, N, 3)),
+                                         np.broadcast_to(self.strengths, (M, N)),
+                                         sensor_positions, theta)
+
+        for s, row in zip(sessions, zip(t.tolist(), x.tolist(), y.tolist(), theta.tolist(),
+                                        status.astype(int).tolist())):
+            s.t, s.x, s.y, s.theta, s.status = row
+        # Réponses découpées dans un seul tampon (M, 8) au format RESPONSE
+        values = np.empty((M, 8), dtype='<f8')
+        for k, value in enumerate((t, x, y, theta, I_ax, I_lat, I_vert, status)):
+            values[:, k] = value
+        data = values.tobytes()
+        size = RESPONSE.size
+        self.ticks += 1
+        self.requests += M
+        return [data[i:i + size] for i in range(0, M * size, size)]
+
+    async def _run_batcher(self):
+        while True:
+            await self._wakeup.wait()
+            if self.max_wait:
+                await asyncio.sleep(self.max_wait)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            start = time.perf_counter()
+            try:
+                responses = self.process([request for request, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+            self.busy_time += time.perf_counter() - start
+
+    def _submit(self, session, op, a=0.0, b=0.0, c=0.0):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((session, op, a, b, c), future))
+        self._wakeup.set()
+        return future
+
+    async def _handle(self, reader, writer):
+        session = _Session()
+        self.sessions += 1
+        try:
+            writer.write(await self._submit(session, RESET))
+            await writer.drain()
+            while True:
+                try:
+                    data = await reader.readexactly(REQUEST.size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                op, a, b, c = REQUEST.unpack(data)
+                if op not in (STEP, RESET):
+                    break
+                writer.write(await self._submit(session, op, a, b, c))
+                # Un client lent ne fait pas grossir sans limite le tampon d'envoi
+                await writer.drain()
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """Démarre le serveur (TCP local, ou socket Unix si path est donné)
+
+        Returns:
+            asyncio.Server (voir server.sockets pour le port choisi)
+        """
+        self._wakeup = asyncio.Event()
+        self._batcher = asyncio.create_task(self._run_batcher())
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle, path=path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self, server):
+        server.close()
+        await server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+
+class SensorClient:
+    """Client d'un SensorServer (un robot)
+
+    Utiliser SensorClient.connect ; l'observation initiale est dans
+    client.observation.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.observation = None
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        client.observation = await client._receive()
+        return client
+
+    async def _receive(self):
+        self.observation = Observation(*RESPONSE.unpack(await self.reader.readexactly(RESPONSE.size)))
+        return self.observation
+
+    async def _request(self, op, a, b, c):
+        self.writer.write(REQUEST.pack(op, a, b, c))
+        return await self._receive()
+
+    async def step(self, v, w):
+        """Applique la commande (v, ω) pendant un pas ; renvoie l'Observation"""
+        return await self._request(STEP, v, w, 0.0)
+
+    async def reset(self, x=0.0, y=0.0, theta=0.0):
+        return await self._request(RESET, x, y, theta)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def run_behavior_client(behavior, simulation_time=SIMULATION_TIME, dt=DT, **connect_kwargs):
+    """Client de test : pilote un robot avec un ElectricBehavior
+
+    Reproduit simulate_behavior à travers le serveur (même dt que le
+    serveur).
+
+    Returns:
+        Tuple (historique au format de simulate_behavior, latences par pas [s])
+    """
+    client = await SensorClient.connect(**connect_kwargs)
+    obs = client.observation
+    history = {'time': [0.0], 'x': [obs.x], 'y': [obs.y], 'theta': [obs.theta]}
+    latencies = []
+    t = 0
+    while t < simulation_time and obs.status == RUNNING:
+        v, w = behavior.compute_command(obs.I_ax, obs.I_lat)
+        start = time.perf_counter()
+        obs = await client.step(v, w)
+        latencies.append(time.perf_counter() - start)
+        for name, value in (('time', t), ('x', obs.x), ('y', obs.y), ('theta', obs.theta)):
+            history[name].append(value)
+        t += dt
+    await client.close()
+    history = {name: np.array(values) for name, values in history.items()}
+    # Comme simulate_behavior, la pose finale n'est testée que si le temps n'est pas écoulé
+    stopped = t < simulation_time
+    history['collision'] = stopped and obs.status == COLLISION
+    history['out_of_bounds'] = stopped and obs.status == OUT_OF_BOUNDS
+    return history, np.array(latencies)
+
+def _client_process(behavior_type, simulation_time, connect_kwargs):
+    """Client de test exécuté dans son propre processus (voir demo)"""
+    from command import ElectricBehavior
+    return asyncio.run(run_behavior_client(ElectricBehavior(behavior_type=behavior_type), simulation_time,
+                                           **connect_kwargs))
+
+async def demo(spheres, n_clients=24, simulation_time=SIMULATION_TIME, max_wait=0.0, processes=False):
+    """Lance un serveur et n_clients clients de test concurrents
+
+    Args:
+        processes: Exécute chaque client dans son propre processus, comme
+                   des contrôleurs externes ; sinon, les clients partagent la
+                   boucle asyncio du serveur et leur temps de calcul s'ajoute
+                   aux latences mesurées
+
+    Returns:
+        Tuple (historiques, latences par pas de tous les clients, serveur)
+    """
+    sensor_server = SensorServer(spheres, max_wait=max_wait)
+    server = await sensor_server.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(n_clients) as pool:
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _client_process, i % 4 + 1, simulation_time, {'port': port})
+                    for i in range(n_clients)))
+        else:
+            from command import ElectricBehavior
+            results = await asyncio.gather(*(
+                run_behavior_client(ElectricBehavior(behavior_type=i % 4 + 1), simulation_time, port=port)
+                for i in range(n_clients)))
+    finally:
+        await sensor_server.stop(server)
+    histories = [history for history, _ in results]
+    latencies = np.concatenate([latency for _, latency in results])
+    return histories, latencies, sensor_server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur de perception pour contrôleurs externes")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help="Socket Unix (à la place de TCP)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed de la scène")
+    parser.add_argument('--max-wait', type=float, default=0.0, help="Délai de regroupement [s]")
+    parser.add_argument('--demo', type=int, default=None, help="Lance N clients de test et mesure la latence")
+    parser.add_argument('--demo-processes', action='store_true',
+                        help="Un processus par client de test (sinon, dans la boucle du serveur)")
+    args = parser.parse_args()
+
+    from sweep import generate_scenes
+    spheres = generate_scenes([args.seed])[0]
+
+    if args.demo:
+        histories, latencies, sensor_server = asyncio.run(demo(spheres, args.demo, max_wait=args.max_wait,
+                                                               processes=args.demo_processes))
+        print(f"{len(latencies)} pas, {sensor_server.ticks} ticks "
+              f"({sensor_server.requests / sensor_server.ticks:.1f} requêtes par tick)")
+        print(f"Latence : médiane {np.median(latencies)*1e3:.3f} ms, "
+              f"p99 {np.percentile(latencies, 99)*1e3:.3f} ms")
+        print(f"Temps serveur : {sensor_server.busy_time / sensor_server.ticks * 1e3:.3f} ms par tick")
+    else:
+        async def serve():
+            sensor_server = SensorServer(spheres, max_wait=args.max_wait)
+            server = await sensor_server.start(args.host, args.port, args.unix)
+            print(f"Serveur de perception sur {args.unix or f'{args.host}:{args.port}'}")
+            async with server:
+                await server.serve_forever()
+        asyncio.run(serve())
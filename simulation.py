@@ -1,14 +1,18 @@
 # simulation.py
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('TkAgg')
 import os
+import functools
+from time import perf_counter
 from pathlib import Path
-from constants import *
-from electric_sense import Sphere, compute_electric_sense
+from constants import SIMULATION_TIME, DT
+from electric_sense import compute_electric_sense, cutoff_error_bound
+from spatial_index import SphereGrid
+from scene import Scene
+from recorder import TrajectoryRecorder
+from ensemble import count_steps
+from instrumentation import NULL_INSTRUMENTATION
 from command import ElectricBehavior
-from draw_robot import draw_robot, draw_sphere
 
 def setup_plot(ax, xlim=(-2.5, 2.5), ylim=(-2.5, 2.5), add_legend=False):
     """Configure les paramètres de l'axe"""
@@ -21,33 +25,52 @@ def setup_plot(ax, xlim=(-2.5, 2.5), ylim=(-2.5, 2.5), add_legend=False):
     if add_legend:
         ax.legend(loc='upper right')
 
-def create_random_scene(num_spheres=4, min_radius=0.1, max_radius=0.2, arena_size=2.0):
-    """Crée une scène avec des sphères positionnées aléatoirement"""
-    spheres = []
+def create_random_scene(num_spheres=4, min_radius=0.1, max_radius=0.2, arena_size=2.0, rng=None):
+    """Crée une scène avec des sphères positionnées aléatoirement
+
+    Args:
+        rng: Générateur aléatoire (np.random.Generator). Par défaut, le
+             générateur global de numpy (np.random.seed) est utilisé.
+
+    Returns:
+        Scene
+    """
+    rng = np.random if rng is None else rng
+    spheres = Scene()
     
     for _ in range(num_spheres):
         # Position aléatoire (évite le centre où le robot démarre)
         while True:
-            x = np.random.uniform(-arena_size, arena_size)
-            y = np.random.uniform(-arena_size, arena_size)
+            x = rng.uniform(-arena_size, arena_size)
+            y = rng.uniform(-arena_size, arena_size)
             
             # Évite de placer trop près du robot (qui démarre à l'origine)
             if x*x + y*y > 0.5*0.5:
                 break
         
         # Taille aléatoire
-        radius = np.random.uniform(min_radius, max_radius)
+        radius = rng.uniform(min_radius, max_radius)
         
         # Choix aléatoire: conducteur (chi>0) ou isolant (chi<0)
-        chi = np.random.choice([1.0, -0.5])
+        chi = rng.choice([1.0, -0.5])
         
         # Création de la sphère
-        spheres.append(Sphere([x, y, 0], radius, chi))
+        spheres.add([x, y, 0], radius, chi)
     
     return spheres
 
-def check_collision(robot_pos, spheres, collision_margin=0.05):
-    """Vérifie si le robot est en collision avec une sphère"""
+def check_collision(robot_pos, spheres, collision_margin=0.05, grid=None):
+    """Vérifie si le robot est en collision avec une sphère
+
+    Args:
+        grid: Index spatial (SphereGrid) des sphères ; seules les sphères
+              voisines sont alors testées (par défaut, celui de la Scene)
+    """
+    if grid is None and hasattr(spheres, 'grid'):
+        grid = spheres.grid
+    if grid is not None:
+        return grid.check_collision(robot_pos, collision_margin)
+
     for sphere in spheres:
         # Distance entre le robot et le centre de la sphère
         distance = np.linalg.norm(robot_pos[:2] - sphere.position[:2])
@@ -62,60 +85,163 @@ def is_out_of_bounds(position, bounds=2.5):
     """Vérifie si le robot est sorti des limites de la scène"""
     return abs(position[0]) > bounds or abs(position[1]) > bounds
 
-def simulate_behavior(behavior, spheres, simulation_time=SIMULATION_TIME, dt=DT):
-    """Simule le déplacement du robot avec un comportement spécifique"""
+def count_evaluated(spheres, sensor_position, cutoff=None, grid=None):
+    """Nombre de sphères sommées par la perception pour une pose"""
+    if cutoff is None:
+        return len(spheres)
+    return len(grid.query_radius(sensor_position, cutoff))
+
+def instrumented_sense(sense, instrumentation, cutoff=None, grid=None):
+    """Fonction de perception qui compte ses appels et chronomètre leur durée"""
+    def timed_sense(spheres, sensor_position, sensor_orientation):
+        instrumentation.count('spheres_evaluated', count_evaluated(spheres, sensor_position, cutoff, grid))
+        instrumentation.count('sense_calls')
+        start = perf_counter()
+        result = sense(spheres, sensor_position, sensor_orientation)
+        instrumentation.times['sense'] += perf_counter() - start
+        return result
+    return timed_sense
+
+def simulate_behavior(behavior, spheres, simulation_time=SIMULATION_TIME, dt=DT,
+                      sense=compute_electric_sense, cutoff=None, recorder=None, integrator=None,
+                      instrumentation=None, walls=None):
+    """Simule le déplacement du robot avec un comportement spécifique
+
+    Args:
+        sense: Fonction de perception, de même signature que
+               compute_electric_sense (par ex. SenseTable.compute_electric_sense)
+        cutoff: Rayon de perception [m]. Un index spatial des sphères est
+                alors construit une fois et utilisé pour la perception
+                (sense doit accepter cutoff et grid) et les collisions.
+                La borne d'erreur de troncature est dans history['cutoff_error_bound'].
+        recorder: TrajectoryRecorder à un robot (par ex. avec courants,
+                  commandes, décimation ou écriture sur disque). Par défaut,
+                  un enregistreur en mémoire dimensionné pour la simulation.
+        integrator: Intégrateur à pas adaptatif (integrators.AdaptiveIntegrator)
+                    à utiliser à la place d'Euler à pas fixe dt
+        instrumentation: Instrumentation (instrumentation.py) qui cumule les
+                         temps par phase et les compteurs, et appelle ses
+                         crochets à chaque pas
+        walls: Parois du bassin (walls.PoolWalls). La perception par défaut
+               est alors celle du bassin (incompatible avec cutoff), et
+               l'approche d'une paroi met fin à la simulation (hors limites).
+
+    Returns:
+        Historique : tableaux 'x', 'y', 'theta', 'time' (et les champs
+        optionnels du recorder), booléens 'collision' et 'out_of_bounds'
+    """
     # Position et orientation initiales du robot
     x, y, theta = 0.0, 0.0, 0.0
+    collision, out_of_bounds = False, False
     
     # Historique des positions et orientations
-    history = {
-        'x': [x],
-        'y': [y],
-        'theta': [theta],
-        'time': [0],
-        'collision': False,
-        'out_of_bounds': False
-    }
+    if recorder is None:
+        recorder = TrajectoryRecorder(1, capacity=count_steps(simulation_time, dt) + 1)
+    
+    # Parois du bassin : perception par la méthode des images et limites
+    bounds = 2.5
+    if walls is not None:
+        if sense is compute_electric_sense:
+            if cutoff is not None:
+                raise ValueError("La perception du bassin (walls) ne prend pas en charge cutoff : "
+                                 "la troncature ignorerait les images des sphères")
+            sense = walls.compute_electric_sense
+        bounds = walls.bounds()
     
-    # Simulation
+    # Index spatial pour la perception tronquée et les collisions
+    grid = None
+    if cutoff is not None:
+        grid = spheres.grid if hasattr(spheres, 'grid') else SphereGrid.from_spheres(spheres)
+        sense = functools.partial(sense, cutoff=cutoff, grid=grid)
+    
+    inst = NULL_INSTRUMENTATION if instrumentation is None else instrumentation
+    if integrator is not None:
+        if inst.enabled:
+            sense = instrumented_sense(sense, inst, cutoff, grid)
+            sense_time = inst.times['sense']
+        inst.start()
+        history = integrator.simulate(behavior, spheres, simulation_time, sense=sense, recorder=recorder,
+                                     bounds=bounds)
+        if inst.enabled:
+            # Le temps de perception, chronométré à part, est déduit de l'intégration
+            inst.lap('integration')
+            inst.times['integration'] -= inst.times['sense'] - sense_time
+        inst.count('steps', history['n_steps'])
+        inst.end_run(history['collision'], history['out_of_bounds'])
+        if cutoff is not None:
+            history['cutoff_error_bound'] = cutoff_error_bound(spheres, cutoff)
+        return history
+    
+    # Simulation (l'intégrateur enregistre lui-même la pose initiale)
+    recorder.record(0, x, y, theta)
     t = 0
+    n_steps = 0
+    inst.start()
     while t < simulation_time:
         # Vérification de collision
-        if check_collision(np.array([x, y, 0]), spheres):
-            history['collision'] = True
+        if check_collision(np.array([x, y, 0]), spheres, grid=grid):
+            collision = True
             print(f"Collision détectée à t={t:.2f}s")
             break
         
         # Vérification si hors limites
-        if is_out_of_bounds([x, y]):
-            history['out_of_bounds'] = True
+        if is_out_of_bounds([x, y], bounds):
+            out_of_bounds = True
             print(f"Robot hors limites à t={t:.2f}s")
             break
+        inst.lap('collision')
         
         # Calcul des courants électriques
-        I_ax, I_lat, I_vert = compute_electric_sense(spheres, np.array([x, y, 0]), theta)
+        if inst.enabled:
+            inst.count('spheres_evaluated', count_evaluated(spheres, [x, y, 0], cutoff, grid))
+            inst.lap('overhead')
+        I_ax, I_lat, I_vert = sense(spheres, np.array([x, y, 0]), theta)
+        inst.lap('sense')
         
         # Calcul des commandes
         v, w = behavior.compute_command(I_ax, I_lat)
+        inst.lap('control')
         
         # Mise à jour de la position et orientation (intégration simple)
         theta += w * dt
         x += v * np.cos(theta) * dt
         y += v * np.sin(theta) * dt
+        inst.lap('integration')
         
         # Enregistrement dans l'historique
-        history['x'].append(x)
-        history['y'].append(y)
-        history['theta'].append(theta)
-        history['time'].append(t)
+        recorder.record(t, x, y, theta, sense=(I_ax, I_lat, I_vert), command=(v, w))
+        inst.lap('record')
+        if inst.hooks:
+            inst.step({'time': t, 'x': x, 'y': y, 'theta': theta, 'I_ax': I_ax, 'I_lat': I_lat,
+                       'I_vert': I_vert, 'v': v, 'w': w})
+            inst.lap('overhead')
         
         # Incrémentation du temps
         t += dt
+        n_steps += 1
     
+    inst.count('steps', n_steps)
+    inst.count('sense_calls', n_steps)
+    inst.end_run(collision, out_of_bounds)
+    recorder.finish(collision=collision, out_of_bounds=out_of_bounds)
+    history = recorder.history(0)
+    if cutoff is not None:
+        history['cutoff_error_bound'] = cutoff_error_bound(spheres, cutoff)
     return history
 
-def run_simulation(seed, output_dir='simulations'):
-    """Exécute la simulation pour les 4 comportements et visualise les résultats"""
+def run_simulation(seed, output_dir='simulations', sense_cache=None, instrumentation=None,
+                   results_cache=None):
+    """Exécute la simulation pour les 4 comportements et visualise les résultats
+
+    Avec sense_cache (sense_cache.SenseMapCache), la perception est
+    interpolée dans une carte de la scène partagée par les 4 comportements.
+    Avec instrumentation, les temps des 4 simulations et du tracé (phase
+    'render') y sont cumulés.
+    Avec results_cache (results_cache.ResultsCache), les historiques déjà
+    calculés sont relus au lieu d'être simulés, et la figure n'est pas
+    retracée si elle a été tracée pour les mêmes résultats avec le même code
+    de tracé (results_cache.figure_key).
+    """
     # Création du dossier de sortie s'il n'existe pas
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
@@ -126,75 +252,84 @@ def run_simulation(seed, output_dir='simulations'):
     # Simulation des 4 comportements
     behavior_types = [1, 2, 3, 4]
     histories = {}
+    keys = []
+    method = 'simulate_behavior' if sense_cache is None else \
+        f"simulate_behavior:sense_map:{sorted(sense_cache.map_kwargs.items())}"
     
     for bt in behavior_types:
         behavior = ElectricBehavior(behavior_type=bt)
+        if results_cache is not None:
+            from results_cache import result_key
+            key = result_key(spheres, behavior, SIMULATION_TIME, DT, method=method)
+            keys.append(key)
+            histories[bt] = results_cache.get(key)
+            if histories[bt] is not None:
+                print(f"Comportement {bt}: {behavior.get_name()} (en cache)")
+                continue
         print(f"Simulation du comportement {bt}: {behavior.get_name()}")
-        histories[bt] = simulate_behavior(behavior, spheres)
+        sense = compute_electric_sense if sense_cache is None else sense_cache.compute_electric_sense
+        histories[bt] = simulate_behavior(behavior, spheres, sense=sense, instrumentation=instrumentation)
+        if results_cache is not None:
+            results_cache.put(key, histories[bt])
     
     # Visualisation des résultats
-    fig, axs = plt.subplots(2, 2, figsize=(16, 12))
-    axs = axs.flatten()
-    
-    # Préparation des éléments de légende communs
-    from matplotlib.patches import Patch
-    from matplotlib.lines import Line2D
-    
-    legend_elements = [
-        Patch(facecolor='red', alpha=0.5, label='Conducteur (χ > 0)'),
-        Patch(facecolor='blue', alpha=0.5, label='Isolant (χ < 0)'),
-        Line2D([0], [0], color='b', linewidth=2, label='Trajectoire'),
-        Line2D([0], [0], marker='o', color='r', markersize=10, linestyle='None', label='Collision')
-    ]
-    
-    for i, bt in enumerate(behavior_types):
-        ax = axs[i]
-        history = histories[bt]
-        behavior = ElectricBehavior(behavior_type=bt)
-        
-        # Dessin des sphères (en premier pour qu'elles soient en arrière-plan)
-        for sphere in spheres:
-            draw_sphere(ax, sphere)
-        
-        # Tracé de la trajectoire
-        trajectory_line = ax.plot(history['x'], history['y'], 'b-', linewidth=2, label='Trajectoire')[0]
-        
-        # Dessin de la position initiale du robot
-        draw_robot(ax, np.array([0, 0, 0]), 0, color='gray')
-        
-        # Dessin de la position finale du robot
-        final_pos = np.array([history['x'][-1], history['y'][-1], 0])
-        final_theta = history['theta'][-1]
-        draw_robot(ax, final_pos, final_theta)
-        
-        # Marquage spécifique selon le résultat
-        if history.get('collision', False):
-            ax.plot(history['x'][-1], history['y'][-1], 'ro', markersize=10, label='Collision', alpha=0.5)
-        elif history.get('out_of_bounds', False):
-            ax.plot(history['x'][-1], history['y'][-1], 'yo', markersize=10, label='Hors limites', alpha=0.5)
-        
-        # Configuration de l'axe
-        setup_plot(ax, xlim=(-2.5, 2.5), ylim=(-2.5, 2.5))
-        ax.set_title(f"B{bt}: {behavior.get_name()}")
-        
-        # Ajout de la légende uniquement au premier graphique pour éviter la duplication
-        if i == 0:
-            ax.legend(handles=legend_elements, loc='upper right')
-    
-    plt.tight_layout()
-    # Sauvegarde avec le numéro de seed dans le nom de fichier
     filename = os.path.join(output_dir, f'simulation_comportements_{seed:02d}.png')
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    metadata = None
+    if results_cache is not None:
+        from results_cache import figure_key, figure_is_current, FIGURE_KEY
+        key = figure_key(keys)
+        if figure_is_current(filename, key):
+            print(f"Figure {filename} à jour")
+            return
+        metadata = {FIGURE_KEY: key}
+    inst = NULL_INSTRUMENTATION if instrumentation is None else instrumentation
+    inst.start()
+    plot_simulation(spheres, histories, filename, metadata=metadata)
+    inst.lap('render')
     print(f"Sauvegarde de la simulation {seed} dans {filename}")
-    plt.close(fig)  # Fermer la figure pour economiser la memoire
 
-if __name__ == "__main__":
-    # Nombre de simulations a executer
-    num_simulations = 30
-    
-    for i in range(num_simulations):
-        print(f"\nSimulation {i+1}/{num_simulations} (seed={i})...")
-        run_simulation(i)
+def plot_simulation(spheres, histories, filename, metadata=None, **renderer_kwargs):
+    """Trace les trajectoires des 4 comportements sur une même scène
+
+    La figure est créée une fois par processus puis réutilisée (render.py).
+
+    Args:
+        spheres: Scène (Scene ou liste de Sphere)
+        histories: Dictionnaire {type de comportement: historique}
+        filename: Fichier image de sortie
+        metadata: Métadonnées du fichier (par ex. textes PNG)
+        renderer_kwargs: Paramètres de render.SimulationRenderer (dpi,
+                         thumbnail, ...)
+    """
+    from render import shared_renderer
+    shared_renderer(**renderer_kwargs).render(spheres, histories, filename, metadata)
+
+def build_parser(parser=None):
+    """Arguments des simulations par seed (aussi utilisés par cli.py)"""
+    parser = parser or argparse.ArgumentParser(description="Simulation des 4 comportements par seed")
+    parser.add_argument('--seeds', type=int, default=30, help="Nombre de simulations (seeds 0 à N-1)")
+    parser.add_argument('--seed', type=int, nargs='+', default=None, help="Seeds à simuler (à la place de --seeds)")
+    parser.add_argument('--output-dir', default='simulations')
+    parser.add_argument('--no-cache', action='store_true', help="Recalcule tout, sans cache des résultats")
+    return parser
+
+def main(args=None):
+    """Lance les simulations (args : liste d'arguments ou argparse.Namespace)"""
+    if not isinstance(args, argparse.Namespace):
+        args = build_parser().parse_args(args)
+    seeds = args.seed if args.seed is not None else range(args.seeds)
+
+    # Les résultats inchangés sont relus (python results_cache.py clear pour tout recalculer)
+    results_cache = None
+    if not args.no_cache:
+        from results_cache import ResultsCache
+        results_cache = ResultsCache(os.path.join(args.output_dir, 'cache'))
+    for n, seed in enumerate(seeds, 1):
+        print(f"\nSimulation {n}/{len(seeds)} (seed={seed})...")
+        run_simulation(seed, args.output_dir, results_cache=results_cache)
         print('\n'+'-'*24 )
     
-    print(f"Toutes les simulations ont été enregistrées dans le dossier 'simulations/'")
+    print(f"Toutes les simulations ont été enregistrées dans le dossier '{args.output_dir}/'")
+
+if __name__ == "__main__":
+    main()
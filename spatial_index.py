@@ -0,0 +1,86 @@
+# spatial_index.py
+import numpy as np
+from electric_sense import sphere_arrays
+
+class SphereGrid:
+    """Index spatial des sphères sur une grille uniforme du plan XY
+
+    Les sphères sont triées par cellule ; une requête ne parcourt que les
+    cellules qui recouvrent le disque demandé. La grille est creuse : seules
+    les cellules occupées sont stockées (recherche par dichotomie).
+
+    Attributes:
+        positions: Positions des sphères (N, 3) [m]
+        radii: Rayons (N,) [m]
+        chis: Contrastes électriques (N,)
+        cell_size: Taille des cellules [m]
+    """
+    def __init__(self, positions, radii, chis, cell_size=0.5):
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.radii = np.asarray(radii, dtype=float)
+        self.chis = np.asarray(chis, dtype=float)
+        self.cell_size = cell_size
+        self.max_radius = self.radii.max() if len(self.radii) else 0.0
+
+        xy = self.positions[:, :2]
+        self.origin = xy.min(axis=0) if len(xy) else np.zeros(2)
+        ij = np.floor((xy - self.origin) / cell_size).astype(np.int64)
+        self.shape = ij.max(axis=0) + 1 if len(ij) else np.ones(2, dtype=np.int64)
+
+        keys = ij[:, 0] * self.shape[1] + ij[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    @classmethod
+    def from_spheres(cls, spheres, cell_size=0.5):
+        """Construit l'index à partir d'une liste de sphères"""
+        return cls(*sphere_arrays(spheres), cell_size=cell_size)
+
+    def __len__(self):
+        return len(self.radii)
+
+    def _candidates(self, center, radius):
+        """Indices des sphères des cellules recouvrant le disque (center, radius)"""
+        empty = np.zeros(0, dtype=np.int64)
+        if len(self) == 0:
+            return empty
+
+        lo = np.floor((center[:2] - radius - self.origin) / self.cell_size).astype(np.int64)
+        hi = np.floor((center[:2] + radius - self.origin) / self.cell_size).astype(np.int64)
+        lo = np.maximum(lo, 0)
+        hi = np.minimum(hi, self.shape - 1)
+        if np.any(hi < lo):
+            return empty
+
+        # Plages de sphères de chaque cellule du bloc
+        ci, cj = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1), indexing='ij')
+        cell_keys = (ci * self.shape[1] + cj).ravel()
+        starts = np.searchsorted(self.keys, cell_keys, side='left')
+        ends = np.searchsorted(self.keys, cell_keys, side='right')
+        counts = ends - starts
+        total = counts.sum()
+        if total == 0:
+            return empty
+
+        # Concaténation vectorisée des plages [start, end)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.order[offsets + np.arange(total)]
+
+    def query_radius(self, center, radius):
+        """Indices des sphères dont le centre est à moins de `radius` de `center`
+
+        La distance est mesurée en 3D ; seules les cellules XY recouvrant le
+        disque de rayon `radius` sont parcourues.
+        """
+        center = np.asarray(center, dtype=float)
+        candidates = self._candidates(center, radius)
+        d = self.positions[candidates] - center
+        keep = np.einsum('ij,ij->i', d, d) <= radius**2
+        return np.sort(candidates[keep])
+
+    def check_collision(self, robot_pos, collision_margin=0.05):
+        """Équivalent de simulation.check_collision, limité aux sphères voisines"""
+        robot_pos = np.asarray(robot_pos, dtype=float)
+        candidates = self._candidates(robot_pos, self.max_radius + collision_margin)
+        distance = np.linalg.norm(self.positions[candidates, :2] - robot_pos[:2], axis=-1)
+        return bool(np.any(distance < self.radii[candidates] + collision_margin))
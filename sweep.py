@@ -0,0 +1,325 @@
+# sweep.py
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from constants import SIMULATION_TIME, DT
+from electric_sense import sphere_arrays, compute_electric_sense_batch
+from scene import Scene
+from command import ElectricBehavior
+from ensemble import simulate_ensemble
+from instrumentation import Instrumentation
+
+# Scènes partagées et table de perception, chargées une fois par processus
+_WORKER_SCENES = None
+_WORKER_TABLE = None
+
+def scene_rng(seed, root_seed=0):
+    """Générateur indépendant pour la scène d'une seed
+
+    Le flux ne dépend que de (root_seed, seed), et pas de l'ordre
+    d'exécution ni du nombre de processus.
+    """
+    return np.random.default_rng(np.random.SeedSequence(root_seed, spawn_key=(seed,)))
+
+class SharedScenes:
+    """Ensemble de scènes stocké à plat dans un bloc de mémoire partagée
+
+    Les sphères de toutes les scènes sont concaténées ; offsets[i]:offsets[i+1]
+    délimite la scène i. Les processus s'y attachent par le nom du bloc
+    (attach) et lisent les tableaux sans copie.
+    """
+    def __init__(self, shm, layout, owner):
+        self.shm = shm
+        self.layout = layout
+        arrays = self._views(shm, layout)
+        self.positions = arrays['positions']
+        self.radii = arrays['radii']
+        self.chis = arrays['chis']
+        self.offsets = arrays['offsets']
+        self.owner = owner
+
+    @classmethod
+    def create(cls, scenes):
+        """Copie une liste de scènes (Scene ou listes de Sphere) en mémoire partagée"""
+        parts = [sphere_arrays(scene) for scene in scenes]
+        offsets = np.zeros(len(scenes) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(r) for _, r, _ in parts])
+        arrays = {
+            'positions': np.concatenate([p for p, _, _ in parts]).reshape(-1, 3),
+            'radii': np.concatenate([r for _, r, _ in parts]),
+            'chis': np.concatenate([c for _, _, c in parts]),
+            'offsets': offsets
+        }
+
+        layout = cls._layout(arrays)
+        size = max(sum(nbytes for _, _, _, _, nbytes in layout), 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        views = cls._views(shm, layout)
+        for key, array in arrays.items():
+            views[key][...] = array
+        return cls(shm, layout, owner=True)
+
+    @staticmethod
+    def _layout(arrays):
+        """Décrit l'emplacement de chaque tableau dans le bloc"""
+        layout = []
+        offset = 0
+        for key, array in arrays.items():
+            layout.append((key, array.dtype.str, array.shape, offset, array.nbytes))
+            offset += -(-array.nbytes // 8) * 8  # alignement sur 8 octets
+        return layout
+
+    @staticmethod
+    def _views(shm, layout):
+        return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+                for key, dtype, shape, offset, _ in layout}
+
+    @property
+    def spec(self):
+        """Description picklable (nom du bloc et disposition)"""
+        return self.shm.name, self.layout
+
+    @classmethod
+    def attach(cls, spec):
+        """S'attache à un bloc existant à partir de sa description"""
+        name, layout = spec
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def scene(self, i):
+        """Scène i, vue sans copie sur la mémoire partagée
+
+        Les tableaux sont en lecture seule : une modification de la Scene
+        en fait d'abord une copie locale.
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        views = [self.positions[start:end], self.radii[start:end], self.chis[start:end]]
+        for view in views:
+            view.flags.writeable = False
+        return Scene(*views, copy=False)
+
+    def close(self):
+        """Libère le bloc (et le détruit s'il a été créé par ce processus)"""
+        self.positions = self.radii = self.chis = self.offsets = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _init_worker(spec, table_path=None):
+    global _WORKER_SCENES, _WORKER_TABLE
+    _WORKER_SCENES = SharedScenes.attach(spec)
+    if table_path is not None:
+        from sense_table import SenseTable
+        _WORKER_TABLE = SenseTable.load(table_path)
+
+def _run_chunk(tasks, simulation_time, dt, shared=None, table=None, instrument=False, bounds=2.5):
+    """Simule un lot de tâches (scene_index, behavior_type, k_gain) en ensemble
+
+    Avec instrument, renvoie (historiques, résumé de l'instrumentation du lot).
+    """
+    shared = _WORKER_SCENES if shared is None else shared
+    table = _WORKER_TABLE if table is None else table
+    cache = {}
+    scenes = []
+    behaviors = []
+    for scene_index, behavior_type, k_gain in tasks:
+        if scene_index not in cache:
+            cache[scene_index] = shared.scene(scene_index)
+        scenes.append(cache[scene_index])
+        behaviors.append(ElectricBehavior(behavior_type=behavior_type, k_gain=k_gain))
+    instrumentation = Instrumentation() if instrument else None
+    sense = compute_electric_sense_batch if table is None else table.compute_electric_sense_batch
+    histories = simulate_ensemble(behaviors, scenes, simulation_time, dt, bounds=bounds, sense=sense,
+                                  instrumentation=instrumentation)
+    return (histories, instrumentation.summary()) if instrument else histories
+
+def generate_scenes(seeds, root_seed=0, generator=None, **scene_kwargs):
+    """Crée la scène de chaque seed avec son propre générateur
+
+    Args:
+        generator: Fonction de création de scène, appelée avec rng=... et
+                   scene_kwargs (par défaut, simulation.create_random_scene ;
+                   scene_generator.generate_scene pour de grandes scènes)
+    """
+    if generator is None:
+        from simulation import create_random_scene as generator
+    return [generator(rng=scene_rng(seed, root_seed), **scene_kwargs) for seed in seeds]
+
+def run_sweep(seeds, behavior_types=(1, 2, 3, 4), k_gains=None, workers=None,
+              chunk_size=64, root_seed=0, simulation_time=SIMULATION_TIME, dt=DT,
+              scene_kwargs=None, table_path=None, instrumentation=None, results_cache=None,
+              scene_generator=None, bounds=2.5):
+    """Balaye seeds × comportements (× gains) sur un pool de processus
+
+    Les scènes sont générées dans le processus principal puis partagées
+    en mémoire partagée. Les tâches sont regroupées par lots simulés en
+    ensemble (simulate_ensemble). Les résultats ne dépendent ni du nombre de
+    processus ni de chunk_size.
+
+    Args:
+        seeds: Seeds des scènes
+        behavior_types: Comportements à simuler sur chaque scène
+        k_gains: Gains à simuler (par défaut, K_GAIN seul)
+        workers: Nombre de processus (None: tous les cœurs, 0: sans pool)
+        chunk_size: Nombre de tâches par lot
+        root_seed: Seed racine des générateurs de scène
+        scene_kwargs: Paramètres du générateur de scène
+        table_path: Table de perception rapide (SenseTable) à utiliser, si
+                    fournie, à la place du calcul exact
+        instrumentation: Instrumentation où cumuler les temps par phase et
+                         les compteurs de tous les lots (tous processus)
+        results_cache: Cache des résultats (results_cache.ResultsCache) :
+                       seules les configurations absentes sont simulées
+        scene_generator: Fonction de création de scène (voir
+                         generate_scenes)
+        bounds: Demi-taille de la zone simulée [m] : un robot qui en sort
+                est arrêté (hors limites)
+
+    Returns:
+        Tuple (scenes, results) où results[(seed, behavior_type, k_gain)]
+        est l'historique de la simulation
+    """
+    from constants import K_GAIN
+    seeds = list(seeds)
+    k_gains = [K_GAIN] if k_gains is None else list(k_gains)
+    scenes = generate_scenes(seeds, root_seed, scene_generator, **(scene_kwargs or {}))
+
+    keys = [(seed, bt, k) for seed in seeds for bt in behavior_types for k in k_gains]
+    index = {seed: i for i, seed in enumerate(seeds)}
+    results = {}
+    if results_cache is not None:
+        from results_cache import result_key, file_hash
+        method = 'ensemble' if table_path is None else f'ensemble:table:{file_hash(table_path)}'
+        cache_keys = {(seed, bt, k): result_key(scenes[index[seed]], ElectricBehavior(bt, k_gain=k),
+                                                simulation_time, dt, method=method, bounds=bounds)
+                      for seed, bt, k in keys}
+        for key in keys:
+            history = results_cache.get(cache_keys[key])
+            if history is not None:
+                results[key] = history
+    missing = [key for key in keys if key not in results]
+    tasks = [(index[seed], bt, k) for seed, bt, k in missing]
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    instrument = instrumentation is not None
+    outputs = []
+    shared = SharedScenes.create(scenes) if chunks else None
+    try:
+        if not chunks:
+            pass
+        elif workers == 0:
+            table = None
+            if table_path is not None:
+                from sense_table import SenseTable
+                table = SenseTable.load(table_path)
+            outputs = [_run_chunk(chunk, simulation_time, dt, shared, table, instrument, bounds)
+                       for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, table_path)) as pool:
+                n = len(chunks)
+                outputs = list(pool.map(_run_chunk, chunks, [simulation_time] * n, [dt] * n,
+                                        [None] * n, [None] * n, [instrument] * n, [bounds] * n))
+    finally:
+        if shared is not None:
+            shared.close()
+
+    if instrument:
+        for _, summary in outputs:
+            instrumentation.merge(summary)
+        outputs = [output for output, _ in outputs]
+
+    histories = [h for output in outputs for h in output]
+    for key, history in zip(missing, histories):
+        results[key] = history
+        if results_cache is not None:
+            results_cache.put(cache_keys[key], history)
+    return dict(zip(seeds, scenes)), {key: results[key] for key in keys}
+
+def render_sweep(scenes, results, output_dir='simulations', workers=None, **renderer_kwargs):
+    """Étape de rendu, optionnelle : une figure des comportements par seed
+
+    Le rendu est fait sans affichage, en parallèle (voir render.py). Pour
+    un balayage sur plusieurs gains, seul le dernier gain est tracé.
+    """
+    from render import render_sweep
+    return render_sweep(scenes, results, output_dir, workers, **renderer_kwargs)
+
+def summarize(results):
+    """Proportion de collisions et de sorties par comportement"""
+    summary = {}
+    for (_, bt, k), history in results.items():
+        counts = summary.setdefault((bt, k), {'n': 0, 'collision': 0, 'out_of_bounds': 0})
+        counts['n'] += 1
+        counts['collision'] += history['collision']
+        counts['out_of_bounds'] += history['out_of_bounds']
+    return summary
+
+def build_parser(parser=None):
+    """Arguments du balayage (aussi utilisés par cli.py)"""
+    parser = parser or argparse.ArgumentParser(description="Balayage parallèle seeds × comportements")
+    parser.add_argument('--seeds', type=int, default=30, help="Nombre de seeds")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus")
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--root-seed', type=int, default=0)
+    parser.add_argument('--table', default=None, help="Table de perception rapide (.npz)")
+    parser.add_argument('--render', action='store_true', help="Enregistre les figures")
+    parser.add_argument('--output-dir', default='simulations')
+    parser.add_argument('--dpi', type=int, default=None, help="Résolution des figures")
+    parser.add_argument('--thumbnail', action='store_true', help="Figures en vignettes")
+    parser.add_argument('--profile', default=None, help="Enregistre le résumé de l'instrumentation (JSON)")
+    parser.add_argument('--cache', default=None, help="Dossier du cache des résultats (voir results_cache.py)")
+    parser.add_argument('--spheres', type=int, default=None,
+                        help="Grandes scènes de N sphères sans recouvrement (voir scene_generator.py)")
+    parser.add_argument('--arena', type=float, default=None,
+                        help="Demi-taille de la zone des sphères [m] (par défaut, déduite de --spheres)")
+    parser.add_argument('--bounds', type=float, default=None,
+                        help="Demi-taille de la zone simulée [m] (par défaut, zone des sphères + 0.5)")
+    return parser
+
+def main(args=None):
+    """Lance le balayage (args : liste d'arguments ou argparse.Namespace)"""
+    if not isinstance(args, argparse.Namespace):
+        args = build_parser().parse_args(args)
+    scene_generator, scene_kwargs = None, None
+    arena = 2.0  # Zone des scènes par défaut (create_random_scene)
+    if args.spheres is not None:
+        from scene_generator import generate_scene as scene_generator, default_arena_size
+        arena = default_arena_size(args.spheres) if args.arena is None else args.arena
+        scene_kwargs = {'n_spheres': args.spheres, 'arena_size': arena}
+    # Même marge que les scènes par défaut (sphères dans ±2 m, limites à ±2.5 m)
+    bounds = arena + 0.5 if args.bounds is None else args.bounds
+    instrumentation = Instrumentation() if args.profile else None
+    results_cache = None
+    if args.cache:
+        from results_cache import ResultsCache
+        results_cache = ResultsCache(args.cache)
+    scenes, results = run_sweep(range(args.seeds), workers=args.workers,
+                                chunk_size=args.chunk_size, root_seed=args.root_seed,
+                                table_path=args.table, instrumentation=instrumentation,
+                                results_cache=results_cache, scene_generator=scene_generator,
+                                scene_kwargs=scene_kwargs, bounds=bounds)
+    if results_cache is not None:
+        print(f"Cache : {results_cache.hits} résultats relus, {results_cache.misses} simulés")
+    for (bt, k), counts in sorted(summarize(results).items()):
+        print(f"B{bt} (k={k}): {counts['collision']}/{counts['n']} collisions, "
+              f"{counts['out_of_bounds']}/{counts['n']} hors limites")
+
+    if args.render:
+        if instrumentation is not None:
+            instrumentation.start()
+        render_sweep(scenes, results, args.output_dir, workers=args.workers,
+                     dpi=args.dpi, thumbnail=args.thumbnail, bounds=bounds)
+        if instrumentation is not None:
+            instrumentation.lap('render')
+        print(f"Figures enregistrées dans le dossier '{args.output_dir}/'")
+
+    if instrumentation is not None:
+        print(instrumentation.report())
+        instrumentation.save(args.profile)
+
+if __name__ == "__main__":
+    main()
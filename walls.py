@@ -0,0 +1,188 @@
+# walls.py
+import numpy as np
+from constants import GAMMA, POOL_SIZE
+from electric_sense import sphere_arrays, electrode_positions, currents_from_K
+
+"""
+Murs isolants du bassin par la méthode des images.
+
+Le bassin est un carré de côté POOL_SIZE centré sur l'origine ; ses parois
+verticales sont isolantes (courant normal nul). Dans chaque direction, les
+images d'un point x par les réflexions successives sur les parois x = ±L/2
+sont x_m = m·L + (-1)^m·x (m entier, ordre |m|), avec un changement de signe
+(-1)^m de la composante correspondante des vecteurs réfléchis.
+
+Deux effets sont modélisés :
+- Sphères : le champ du capteur vu par une sphère (et, par réciprocité,
+  le potentiel de son dipôle vu par les électrodes) est la somme des champs
+  de ses images. Fn[α] = Σk Dk·(rα,k/||rα,k||³) où rα,k relie l'image k de la
+  sphère à l'électrode α et Dk est la matrice de signes de la réflexion.
+  Alors K = 1/(4πγ) Σn sn·Fn·Fnᵀ, avec les termes croisés entre images (ce
+  que ne donnerait pas l'ajout de sphères miroirs à la scène).
+- Parois : les images du capteur lui-même perturbent la conductance,
+  δG[α, β] = Σk≠0 1/(4πγ·||eα - Rk(eβ)||), soit une contribution -δG à K.
+
+Les images de chaque scène sont générées une fois (positions et signes,
+tableau (K, N, 3)) et gardées en cache ; pour les scènes regroupées d'un
+ensemble (M, N, 3), celles du dernier lot sont gardées et réutilisées tant
+que le lot ne change pas. L'évaluation est une seule passe vectorisée sur
+les (K, N) couples image-sphère. Les images sont tronquées à
+l'ordre `order` (|mx| + |my| ≤ order) ; truncation_error estime l'erreur par
+la contribution de la dernière couche d'images.
+"""
+
+def reflection_indices(order):
+    """Indices (mx, my) des images d'ordre |mx| + |my| ≤ order, (K, 2)"""
+    m = np.arange(-order, order + 1)
+    mx, my = np.meshgrid(m, m, indexing='ij')
+    keep = np.abs(mx) + np.abs(my) <= order
+    indices = np.stack([mx[keep], my[keep]], axis=-1)
+    # Ordre croissant (l'identité en premier)
+    return indices[np.argsort(np.abs(indices).sum(axis=1), kind='stable')]
+
+class PoolWalls:
+    """Parois isolantes d'un bassin carré, par la méthode des images
+
+    Args:
+        size: Côté du bassin [m]
+        order: Ordre maximal des réflexions
+        wall_signal: Inclut la perturbation due aux parois elles-mêmes
+                     (sinon, seulement leur effet sur les sphères)
+        cache_size: Nombre de scènes dont les images sont gardées en cache
+    """
+    def __init__(self, size=POOL_SIZE, order=2, wall_signal=True, cache_size=8):
+        self.size = size
+        self.order = order
+        self.wall_signal = wall_signal
+        self.cache_size = cache_size
+        self.indices = reflection_indices(order)
+        # Signes des composantes x, y des vecteurs réfléchis (K, 3)
+        self.signs = np.ones((len(self.indices), 3))
+        self.signs[:, :2] = np.where(self.indices % 2, -1.0, 1.0)
+        self.shell = np.abs(self.indices).sum(axis=1)
+        self._images = {}
+        self._packed = None  # (positions, images) du dernier lot de scènes regroupées
+
+    @property
+    def half_size(self):
+        return self.size / 2
+
+    def reflect(self, points, indices=None):
+        """Images de points (..., 3) : tableau (K, ..., 3)"""
+        indices = self.indices if indices is None else indices
+        points = np.asarray(points, dtype=float)
+        shape = (len(indices),) + (1,) * (points.ndim - 1)
+        images = np.broadcast_to(points, (len(indices),) + points.shape).copy()
+        for axis in range(2):
+            m = indices[:, axis].reshape(shape)
+            images[..., axis] = m * self.size + np.where(m % 2, -1.0, 1.0) * points[..., axis]
+        return images
+
+    def scene_images(self, spheres):
+        """Images (K, N, 3) et intensités (N,) des sphères, en cache par scène"""
+        from sense_cache import scene_hash
+        key = scene_hash(spheres)
+        if key not in self._images:
+            positions, radii, chis = sphere_arrays(spheres)
+            if len(self._images) >= self.cache_size:
+                self._images.pop(next(iter(self._images)))
+            self._images[key] = (self.reflect(positions), chis * radii**3)
+        return self._images[key]
+
+    def packed_images(self, positions):
+        """Images (K, M, N, 3) de scènes regroupées (M, N, 3), en cache
+
+        Les images du dernier lot sont gardées : tant que les mêmes scènes
+        sont passées (pas successifs d'un ensemble, jusqu'à l'arrêt d'un
+        robot), elles ne sont pas recalculées. La vérification est une
+        comparaison du lot, K fois moins coûteuse que les images.
+        """
+        positions = np.asarray(positions, dtype=float)
+        if (self._packed is not None and self._packed[0].shape == positions.shape
+                and np.array_equal(self._packed[0], positions)):
+            return self._packed[1]
+        images = self.reflect(positions)
+        self._packed = (positions.copy(), images)
+        return images
+
+    def _F(self, electrodes, images, signs):
+        """Champs sommés sur les images : (..., N, 5, 3)
+
+        electrodes (..., 5, 3) et images (K, ..., N, 3)
+        """
+        r = electrodes[None, ..., None, :, :] - images[..., :, None, :]
+        r_norm = np.sqrt(np.einsum('...i,...i->...', r, r))
+        f = r / r_norm[..., None]**3
+        signs = signs.reshape((len(signs),) + (1,) * (f.ndim - 2) + (3,))
+        return np.sum(signs * f, axis=0)
+
+    def _K_spheres(self, images, strengths, electrodes, shell_max=None):
+        keep = slice(None) if shell_max is None else self.shell <= shell_max
+        F = self._F(electrodes, images[keep], self.signs[keep])
+        return np.einsum('...n,...nai,...nbi->...ab', strengths, F, F) / (4*np.pi*GAMMA)
+
+    def _G_walls(self, electrodes, shell_max=None):
+        """Perturbation de conductance δG due aux parois (..., 5, 5)"""
+        keep = self.shell > 0
+        if shell_max is not None:
+            keep &= self.shell <= shell_max
+        images = self.reflect(electrodes, self.indices[keep])  # (K, ..., 5, 3)
+        d = electrodes[None, ..., :, None, :] - images[..., None, :, :]
+        return np.sum(1 / np.sqrt(np.einsum('...i,...i->...', d, d)), axis=0) / (4*np.pi*GAMMA)
+
+    def compute_K(self, spheres, sensor_position, sensor_orientation, shell_max=None):
+        """K_total (5, 5) des sphères et des parois"""
+        images, strengths = self.scene_images(spheres)
+        electrodes = electrode_positions(sensor_position, sensor_orientation)
+        K = self._K_spheres(images, strengths, electrodes, shell_max)
+        if self.wall_signal:
+            K = K - self._G_walls(electrodes, shell_max)
+        return K
+
+    def compute_electric_sense(self, spheres, sensor_position, sensor_orientation):
+        """Remplace compute_electric_sense dans le bassin (argument sense=)"""
+        return currents_from_K(self.compute_K(spheres, sensor_position, sensor_orientation))
+
+    def compute_electric_sense_batch(self, positions, strengths, sensor_positions, sensor_orientations):
+        """Remplace electric_sense.compute_electric_sense_batch dans le bassin
+
+        Les images des scènes regroupées (M, N, 3) sont réutilisées d'un
+        appel à l'autre (packed_images) ; les sphères fictives de
+        remplissage (intensité nulle) n'ont pas d'effet.
+        """
+        images = self.packed_images(positions)  # (K, M, N, 3)
+        electrodes = electrode_positions(sensor_positions, sensor_orientations)  # (M, 5, 3)
+        K = self._K_spheres(images, np.asarray(strengths, dtype=float), electrodes)
+        if self.wall_signal:
+            K = K - self._G_walls(electrodes)
+        return currents_from_K(K)
+
+    def truncation_error(self, spheres, sensor_position, sensor_orientation):
+        """Estimation de l'erreur de troncature : contribution de la dernière couche
+
+        Returns:
+            np.array (3,) : |I(order) - I(order - 1)| sur (I_ax, I_lat, I_vert)
+        """
+        full = currents_from_K(self.compute_K(spheres, sensor_position, sensor_orientation))
+        truncated = currents_from_K(self.compute_K(spheres, sensor_position, sensor_orientation,
+                                                   shell_max=self.order - 1))
+        return np.abs(np.array(full) - np.array(truncated))
+
+    @classmethod
+    def for_tolerance(cls, spheres, poses, tol, max_order=8, **kwargs):
+        """Parois à l'ordre minimal dont l'erreur estimée est < tol sur les poses
+
+        Args:
+            poses: Liste de (sensor_position, sensor_orientation) représentatives
+            tol: Tolérance absolue sur (I_ax, I_lat, I_vert)
+        """
+        for order in range(1, max_order + 1):
+            walls = cls(order=order, **kwargs)
+            error = max(walls.truncation_error(spheres, p, t).max() for p, t in poses)
+            if error < tol:
+                return walls
+        return walls
+
+    def bounds(self, collision_margin=0.05):
+        """Demi-taille de la zone accessible au robot (argument bounds=) [m]"""
+        return self.half_size - collision_margin